@@ -0,0 +1,146 @@
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, insert, literal, or_, select
+
+from .events import queue_resync
+from .models import db, ChangeLog, Task, TaskArchive, task_assignee, task_archive_assignee
+from .sync import record_changes
+
+# Архив закрытых задач: горячая task — только то, с чем работает доска.
+#
+#   flask tasks archive            — перенести закрытые задачи, которые не
+#                                    менялись TASK_ARCHIVE_AFTER_DAYS дней
+#   GET  /tasks/archive            — читать архив отдельно от доски
+#   POST /tasks/archive/restore    — вернуть задачи на доску под теми же id
+#
+# "Закрытая" — done = true или status = 'done'. Возраст считаем от последнего
+# изменения (change_log.changed_at), а не от created_at: задачу, которую
+# только что закрыли, с доски не убираем.
+# Для /sync перенос в архив — удаление, восстановление — upsert.
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# колонки task в порядке таблицы; у task_archive те же плюс archived_at
+TASK_TABLE_COLUMNS = tuple(c.name for c in Task.__table__.columns)
+
+
+def _closed():
+    # ровно предикат ix_task_closed_id, иначе planner индекс не возьмёт
+    return or_(Task.done, Task.status == "done")
+
+
+def archive_candidates(cutoff):
+    last_change = func.coalesce(ChangeLog.changed_at, Task.created_at)
+    return (
+        select(Task.id)
+        .outerjoin(ChangeLog, and_(ChangeLog.entity == "task", ChangeLog.entity_id == Task.id))
+        .where(_closed(), last_change < cutoff)
+    )
+
+
+def _move_to_archive(ids, now):
+    table = Task.__table__
+    db.session.execute(
+        insert(TaskArchive).from_select(
+            [*TASK_TABLE_COLUMNS, "archived_at"],
+            select(*table.columns, literal(now)).where(table.c.id.in_(ids)),
+        )
+    )
+    db.session.execute(
+        insert(task_archive_assignee).from_select(
+            ["task_id", "contact_id"],
+            select(task_assignee.c.task_id, task_assignee.c.contact_id)
+            .where(task_assignee.c.task_id.in_(ids)),
+        )
+    )
+    # связи в task_assignee удалит ON DELETE CASCADE
+    db.session.execute(delete(Task).where(Task.id.in_(ids)))
+    record_changes("task", ids, "delete", notify=False)
+
+
+def archive_tasks(older_than, batch_size=ARCHIVE_BATCH_SIZE, log=None):
+    """
+    Переносит закрытые задачи пачками, commit после каждой: блокировки
+    короткие, доска продолжает работать. SKIP LOCKED — задачу, которую
+    сейчас кто-то правит, заберём в следующий раз. Возвращает число задач.
+    """
+    now = datetime.datetime.utcnow()
+    cutoff = now - older_than
+    total = 0
+    while True:
+        ids = db.session.execute(
+            archive_candidates(cutoff)
+            .order_by(Task.id)
+            .limit(batch_size)
+            .with_for_update(of=Task, skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            break
+
+        _move_to_archive(ids, now)
+        # клиенты перечитают доску один раз, а не по событию на задачу
+        queue_resync()
+        db.session.commit()
+
+        total += len(ids)
+        if log:
+            log(f"archived {total}")
+    return total
+
+
+def restore_tasks(ids):
+    """Возвращает задачи из архива на доску; результат — id, которые нашлись."""
+    found = db.session.execute(
+        select(TaskArchive.id)
+        .where(TaskArchive.id.in_(ids))
+        .order_by(TaskArchive.id)
+        .with_for_update()
+    ).scalars().all()
+    if not found:
+        return []
+
+    db.session.execute(
+        insert(Task).from_select(
+            list(TASK_TABLE_COLUMNS),
+            select(*(getattr(TaskArchive, name) for name in TASK_TABLE_COLUMNS))
+            .where(TaskArchive.id.in_(found)),
+        )
+    )
+    db.session.execute(
+        insert(task_assignee).from_select(
+            ["task_id", "contact_id"],
+            select(task_archive_assignee.c.task_id, task_archive_assignee.c.contact_id)
+            .where(task_archive_assignee.c.task_id.in_(found)),
+        )
+    )
+    db.session.execute(delete(TaskArchive).where(TaskArchive.id.in_(found)))
+    # changed_at = сейчас: архиватор не заберёт задачу обратно сразу же
+    record_changes("task", found)
+    return found
+
+
+# -----------------------------
+# CLI: flask tasks archive
+
+tasks_cli = AppGroup("tasks", help="Task maintenance.")
+
+
+@tasks_cli.command("archive")
+@click.option("--older-than-days", type=float, default=None,
+              help="Defaults to TASK_ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, show_default=True)
+def archive_command(older_than_days, batch_size):
+    """Move closed tasks that have not changed for a while to the archive."""
+    if older_than_days is None:
+        older_than_days = current_app.config["TASK_ARCHIVE_AFTER_DAYS"]
+    total = archive_tasks(
+        datetime.timedelta(days=older_than_days), batch_size=batch_size, log=click.echo
+    )
+    click.echo(f"archived {total} task(s) older than {older_than_days:g} day(s)")
+
+
+def init_app(app):
+    app.cli.add_command(tasks_cli)
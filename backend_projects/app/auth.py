@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .cache import token_cache
+
+log = logging.getLogger(__name__)
+
+# Аутентификация:
+#
+#   POST /auth/login, /auth/register  -> {"token": ..., "expiresIn": секунды}
+#   Authorization: Bearer <token>     -> user_id для всех остальных маршрутов
+#
+# Токен — подписанный SECRET_KEY {"uid": id} с временем выпуска (itsdangerous),
+# проверка без базы: HMAC и срок жизни. Проверенные токены кэшируются
+# (cache.token_cache), повторный запрос с тем же токеном — один dict lookup.
+#
+# Лента календаря (GET /tasks/calendar.ics?token=) — отдельный токен с другой
+# солью и без срока: календари не шлют Authorization и годами опрашивают одну
+# ссылку. Access-токен вместо него не подойдёт, и наоборот.
+#
+# Хэши паролей (scrypt/pbkdf2) считаются в отдельном небольшом пуле потоков
+# с лимитом ожидающих: всплеск логинов занимает не больше AUTH_KDF_WORKERS
+# ядер, а лишние запросы сразу получают 503, не отнимая потоки у /tasks и т.д.
+
+TOKEN_SALT = "access-token"
+FEED_TOKEN_SALT = "calendar-feed"
+
+
+class KdfBusy(Exception):
+    """Пул хэширования паролей занят: запрос не ставим в очередь."""
+
+
+class PasswordPool:
+    def __init__(self, workers=2, max_pending=4):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        # выполняются + ждут в очереди пула
+        self.in_flight = 0
+        self.rejected = 0
+
+    def configure(self, workers, max_pending):
+        self.shutdown()
+        self.workers = workers
+        self.max_pending = max_pending
+
+    def run(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise KdfBusy()
+            self.in_flight += 1
+            # потоки создаём лениво: в master (preload) их быть не должно
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="kdf"
+                )
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def reset(self):
+        """После fork: потоки пула остались в родителе."""
+        with self._lock:
+            self._executor = None
+            self.in_flight = 0
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+kdf_pool = PasswordPool()
+
+
+def hash_password(password):
+    return kdf_pool.run(generate_password_hash, password)
+
+
+def check_password(password_hash, password):
+    return kdf_pool.run(check_password_hash, password_hash, password)
+
+
+# -----------------------------
+# Токены
+
+def _serializer(kind="access"):
+    return current_app.extensions["auth"][kind]
+
+
+def issue_token(user_id):
+    return _serializer().dumps({"uid": user_id})
+
+
+def verify_token(token):
+    """user_id или None: подпись не сошлась, токен истёк или испорчен."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, expires_at = cached
+        return user_id if time.time() < expires_at else None
+
+    ttl = current_app.config["AUTH_TOKEN_TTL"]
+    try:
+        payload, issued_at = _serializer().loads(token, max_age=ttl, return_timestamp=True)
+        user_id = int(payload["uid"])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+    # в кэше храним и срок: TTL кэша не должен продлевать жизнь токена
+    token_cache.set(token, (user_id, issued_at.timestamp() + ttl))
+    return user_id
+
+
+def issue_feed_token(user_id):
+    return _serializer("feed").dumps({"uid": user_id})
+
+
+def verify_feed_token(token):
+    """user_id или None; только подпись — один HMAC, без кэша."""
+    try:
+        return int(_serializer("feed").loads(token)["uid"])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def init_app(app):
+    if not app.config.get("SECRET_KEY"):
+        # случайный ключ: токены и ссылки на календарь не переживут рестарт
+        # и не подойдут другим воркерам — допустимо только для отладки и тестов
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY is not set")
+        log.warning("SECRET_KEY is not set, using a random key for this process")
+        app.config["SECRET_KEY"] = os.urandom(32).hex()
+
+    app.extensions["auth"] = {
+        "access": URLSafeTimedSerializer(app.config["SECRET_KEY"], salt=TOKEN_SALT),
+        "feed": URLSafeSerializer(app.config["SECRET_KEY"], salt=FEED_TOKEN_SALT),
+    }
+    kdf_pool.configure(app.config["AUTH_KDF_WORKERS"], app.config["AUTH_KDF_MAX_PENDING"])
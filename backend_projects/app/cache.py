@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from .events import broadcaster
+from .models import db, User, Contact
+
+_MISSING = object()
+
+
+# -----------------------------
+# LRU + TTL кэш в памяти процесса
+
+class TTLCache:
+    def __init__(self, name, max_entries=1000, ttl=60.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # растёт при каждой инвалидации: set() с устаревшим поколением
+        # игнорируется, чтобы чтение "до записи" не вернуло старое в кэш
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxEntries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# (etag, payload) для GET /contacts/<id>
+contact_cache = TTLCache("contacts")
+# (etag, payload) для GET /contacts и /contacts/lookup, ключ — query string
+contact_list_cache = TTLCache("contact_lists")
+# {id, name, email, avatarColor} — блок исполнителя в задачах
+assignee_cache = TTLCache("assignees")
+# {id, name, email} — блок user во всех ответах
+user_cache = TTLCache("users")
+
+# сводка GET /tasks/summary, ключ — etag (версия задач + минута):
+# любая запись в задачи даёт новый ключ, инвалидация не нужна
+summary_cache = TTLCache("task_summary", max_entries=64)
+
+# (user_id, истекает в unix time) для уже проверенных токенов (см. auth.py);
+# от изменений данных не зависит, при resync не сбрасывается
+token_cache = TTLCache("tokens")
+
+# iCalendar-лента пользователя (см. ical.py): свежесть сверяется с change_log
+# на каждом запросе, TTL (CALENDAR_CACHE_TTL) только освобождает память
+calendar_cache = TTLCache("calendar")
+
+CACHES = (
+    contact_cache,
+    contact_list_cache,
+    assignee_cache,
+    user_cache,
+    summary_cache,
+    token_cache,
+    calendar_cache,
+)
+
+
+# -----------------------------
+# Пакетное чтение: промахи добираем одним запросом
+
+def _cached_many(cache, ids, load):
+    result, missing = {}, []
+    for key in set(ids):
+        value = cache.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            result[key] = value
+
+    if missing:
+        generation = cache.generation
+        for key, value in load(missing).items():
+            cache.set(key, value, generation)
+            result[key] = value
+    return result
+
+
+def _load_users(ids):
+    rows = db.session.execute(
+        select(User.id, User.name, User.email).where(User.id.in_(ids))
+    )
+    return {r.id: {"id": r.id, "name": r.name, "email": r.email} for r in rows}
+
+
+def _load_assignees(ids):
+    rows = db.session.execute(
+        select(Contact.id, Contact.name, Contact.email, Contact.avatar_color)
+        .where(Contact.id.in_(ids))
+    )
+    return {
+        r.id: {
+            "id": r.id,
+            "name": r.name,
+            "email": r.email,
+            "avatarColor": r.avatar_color,
+        }
+        for r in rows
+    }
+
+
+def user_summaries(ids):
+    return _cached_many(user_cache, ids, _load_users)
+
+
+def assignee_summaries(ids):
+    return _cached_many(assignee_cache, ids, _load_assignees)
+
+
+# -----------------------------
+# Инвалидация по событиям изменений (см. events.py): локальные записи
+# приходят сразу после commit, записи других воркеров — через LISTEN/NOTIFY
+
+def _on_change(evt):
+    if evt.get("type") == "resync":
+        # пропустили события — не доверяем ничему, что зависит от контактов
+        contact_cache.clear()
+        contact_list_cache.clear()
+        assignee_cache.clear()
+        return
+
+    if evt.get("entity") == "contact":
+        contact_cache.delete(evt["id"])
+        assignee_cache.delete(evt["id"])
+        contact_list_cache.clear()
+
+
+def init_app(app):
+    for cache in CACHES:
+        if cache is not summary_cache:
+            cache.max_entries = app.config["CACHE_MAX_ENTRIES"]
+        cache.ttl = app.config["CACHE_TTL"]
+    calendar_cache.ttl = app.config["CALENDAR_CACHE_TTL"]
+
+    broadcaster.add_listener(_on_change)
+
+
+def stats():
+    return {cache.name: cache.stats() for cache in CACHES}
@@ -0,0 +1,82 @@
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:  # опционально: brotli сжимает JSON заметно лучше gzip
+    import brotli
+except ImportError:  # pragma: no cover - brotli не обязателен
+    brotli = None
+
+# Сжатие ответов по Accept-Encoding (br, gzip). Перед приложением нет
+# nginx, поэтому жмём сами. Потоковые ответы (экспорт) жмутся gzip по кускам,
+# text/event-stream — никогда: буферизация сломала бы доставку событий.
+
+COMPRESSIBLE = (
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+    "text/calendar",
+)
+
+
+def _choose_encoding(streamed):
+    accepted = request.accept_encodings
+    candidates = ["gzip"] if streamed or brotli is None else ["br", "gzip"]
+    # при равном q предпочитаем br
+    best = max(candidates, key=lambda enc: (accepted[enc], enc == "br"))
+    return best if accepted[best] > 0 else None
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 — формат gzip
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _after_request(response):
+    config = current_app.config
+    if not config["COMPRESS_ENABLED"] or request.method == "HEAD":
+        return response
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE or "Content-Encoding" in response.headers:
+        return response
+
+    response.vary.add("Accept-Encoding")
+
+    streamed = response.is_streamed
+    if not streamed and (response.direct_passthrough
+                         or response.calculate_content_length() < config["COMPRESS_MIN_SIZE"]):
+        return response
+
+    encoding = _choose_encoding(streamed)
+    if encoding is None:
+        return response
+
+    if streamed:
+        response.response = _gzip_stream(response.response, config["COMPRESS_LEVEL"])
+        response.headers.pop("Content-Length", None)
+    elif encoding == "br":
+        response.set_data(brotli.compress(response.get_data(), quality=config["COMPRESS_BROTLI_QUALITY"]))
+    else:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=config["COMPRESS_LEVEL"]))
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    app.after_request(_after_request)
@@ -0,0 +1,87 @@
+import datetime
+import re
+
+from sqlalchemy import select
+
+from .models import db, Task, task_assignee
+from .serializers import task_select
+
+# Сроки задач.
+#
+# В базе due_date — наивный UTC (timestamp without time zone), как и все
+# DateTime у нас. Всё, что приходит с часовым поясом, переводим в UTC до
+# записи: Postgres при приведении к timestamp смещение просто отбрасывает.
+# Наружу отдаём с +00:00 (serializers._iso_utc).
+#
+# GET /tasks/due — просроченные и ближайшие открытые задачи; оба списка
+# читаются по partial-индексам открытых задач со сроком (без скана task).
+
+DEFAULT_WINDOW = datetime.timedelta(days=7)
+MAX_WINDOW = datetime.timedelta(days=365)
+
+_WINDOW_RE = re.compile(r"^(\d+)([hdw]?)$")
+_WINDOW_UNITS = {"h": "hours", "d": "days", "w": "weeks", "": "days"}
+
+
+def naive_utc(value):
+    """aware -> наивный UTC; наивное значение считаем уже UTC."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_due_date(value):
+    """ISO 8601 (дата, дата-время, Z или смещение) -> наивный UTC; ValueError — мусор."""
+    if not value:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return naive_utc(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def parse_window(value):
+    """?window=7d | 48h | 2w | 10 (дни) -> timedelta; ValueError — не разобрали."""
+    if not value:
+        return DEFAULT_WINDOW
+    match = _WINDOW_RE.match(value.strip().lower())
+    if not match:
+        raise ValueError(value)
+    amount, unit = match.groups()
+    window = datetime.timedelta(**{_WINDOW_UNITS[unit]: int(amount)})
+    if not window or window > MAX_WINDOW:
+        raise ValueError(value)
+    return window
+
+
+def open_with_due(query, user_id=None, contact_id=None):
+    # NOT done и due_date IS NOT NULL — ровно предикат partial-индексов
+    query = query.where(~Task.done, Task.due_date.isnot(None))
+    if contact_id is not None:
+        query = query.where(
+            Task.id.in_(
+                select(task_assignee.c.task_id).where(task_assignee.c.contact_id == contact_id)
+            )
+        )
+    else:
+        query = query.where(Task.user_id == user_id)
+    return query
+
+
+def due_tasks(now, window, limit, user_id=None, contact_id=None):
+    """
+    (overdue, upcoming) — строки task_select(): открытые задачи со сроком
+    раньше now и в [now, now + window), по сроку. Задачи пользователя
+    или, если задан contact_id, задачи этого исполнителя.
+    """
+    base = open_with_due(task_select(), user_id, contact_id)
+    overdue = db.session.execute(
+        base.where(Task.due_date < now)
+        .order_by(Task.due_date.asc(), Task.id.asc())
+        .limit(limit)
+    ).all()
+    upcoming = db.session.execute(
+        base.where(Task.due_date >= now, Task.due_date < now + window)
+        .order_by(Task.due_date.asc(), Task.id.asc())
+        .limit(limit)
+    ).all()
+    return overdue, upcoming
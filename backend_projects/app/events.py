@@ -0,0 +1,237 @@
+import json
+import queue
+import select
+import threading
+
+import psycopg2
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+from .models import db
+
+NOTIFY_CHANNEL = "app_changes"
+
+# контакты и заметки у каждого пользователя свои, задачи — общая доска
+USER_SCOPED = ("contact", "note")
+
+
+def _visible(evt, user_id):
+    # свои контакты и заметки — только владельцу; без userId — никому
+    if evt.get("entity") in USER_SCOPED:
+        return evt.get("userId") == user_id
+    return True
+
+
+# -----------------------------
+# In-process broadcaster: у каждого подписчика своя ограниченная очередь
+
+class Broadcaster:
+    def __init__(self, max_subscribers=500, queue_size=256):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers = {}  # очередь -> user_id подписчика
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self.closed or len(self._subscribers) >= self.max_subscribers:
+                return None
+            q = queue.Queue(maxsize=self.queue_size)
+            self._subscribers[q] = user_id
+            return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def add_listener(self, callback):
+        # синхронные слушатели внутри процесса (например, инвалидация кэша)
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def notify_listeners(self, evt):
+        for callback in self._listeners:
+            callback(evt)
+
+    def publish(self, evt):
+        self.notify_listeners(evt)
+
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+
+        for q, user_id in subscribers:
+            if not _visible(evt, user_id):
+                continue
+            try:
+                q.put_nowait(evt)
+            except queue.Full:
+                # медленный клиент: сбрасываем очередь и просим полный resync
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait({"type": "resync"})
+
+    def close(self):
+        # остановка воркера: завершаем все потоки, клиенты переподключатся
+        # к другому воркеру (retry из stream)
+        with self._lock:
+            self.closed = True
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            with q.mutex:
+                q.queue.clear()
+            q.put_nowait(None)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broadcaster = Broadcaster()
+
+
+# -----------------------------
+# Сбор событий в сессии и публикация только после commit
+
+_NOTIFY_MANY = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"
+)
+
+
+def queue_event(entity, entity_id, op, user_id=None):
+    queue_events(entity, [entity_id], op, user_id)
+
+
+def queue_events(entity, entity_ids, op, user_id=None):
+    """user_id — владелец (USER_SCOPED): событие получат только его подписки."""
+    evts = [{"type": "change", "entity": entity, "id": entity_id, "op": op} for entity_id in entity_ids]
+    if user_id is not None:
+        for evt in evts:
+            evt["userId"] = user_id
+    if not evts:
+        return
+    if _bridge_enabled():
+        # NOTIFY доставляется слушателям только при COMMIT транзакции;
+        # один запрос на пачку, а не по NOTIFY на каждую задачу контакта
+        db.session.execute(
+            _NOTIFY_MANY,
+            {"channel": NOTIFY_CHANNEL, "payloads": [json.dumps(evt) for evt in evts]},
+        )
+    db.session.info.setdefault("pending_events", []).extend(evts)
+
+
+def queue_resync():
+    """Массовая запись (импорт): вместо события на каждую строку — один resync."""
+    evt = {"type": "resync"}
+    if _bridge_enabled():
+        db.session.execute(
+            _NOTIFY_MANY, {"channel": NOTIFY_CHANNEL, "payloads": [json.dumps(evt)]}
+        )
+    db.session.info.setdefault("pending_events", []).append(evt)
+
+
+def _after_commit(session):
+    for evt in session.info.pop("pending_events", []):
+        if _bridge_enabled():
+            # подписчики получат событие через NOTIFY, а локальные слушатели
+            # (кэш) — сразу, чтобы этот же воркер не отдал старые данные
+            broadcaster.notify_listeners(evt)
+        else:
+            broadcaster.publish(evt)
+
+
+def _after_rollback(session):
+    session.info.pop("pending_events", None)
+
+
+_bridge = {"enabled": False, "thread": None, "stop": None}
+
+
+def _bridge_enabled():
+    return _bridge["enabled"]
+
+
+# -----------------------------
+# Postgres LISTEN/NOTIFY: события из всех воркеров попадают в локальный broadcaster
+
+def _listen_forever(dsn, stop):
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+            # после переподключения могли что-то пропустить
+            broadcaster.publish({"type": "resync"})
+
+            while not stop.is_set():
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    broadcaster.publish(json.loads(notify.payload))
+        except psycopg2.Error:
+            stop.wait(2.0)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def start_listener(app):
+    if _bridge["thread"] is not None:
+        return
+    stop = threading.Event()
+    # psycopg2 не понимает "postgresql+psycopg2://"
+    dsn = (
+        make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        .set(drivername="postgresql")
+        .render_as_string(hide_password=False)
+    )
+    thread = threading.Thread(
+        target=_listen_forever, args=(dsn, stop), name="pg-listen", daemon=True
+    )
+    thread.start()
+    _bridge["thread"] = thread
+    _bridge["stop"] = stop
+
+
+def stop_listener():
+    if _bridge["stop"] is not None:
+        _bridge["stop"].set()
+    _bridge["thread"] = None
+    _bridge["stop"] = None
+
+
+def init_app(app):
+    broadcaster.max_subscribers = app.config["EVENTS_MAX_SUBSCRIBERS"]
+    broadcaster.queue_size = app.config["EVENTS_QUEUE_SIZE"]
+
+    if not event.contains(db.session, "after_commit", _after_commit):
+        event.listen(db.session, "after_commit", _after_commit)
+        event.listen(db.session, "after_rollback", _after_rollback)
+
+    _bridge["enabled"] = app.config["EVENTS_BACKEND"] == "postgres"
+    if _bridge["enabled"]:
+        start_listener(app)
+
+
+def stream(q, heartbeat):
+    """Генератор text/event-stream для одного подписчика."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                evt = q.get(timeout=heartbeat)
+            except queue.Empty:
+                # комментарий держит соединение живым через прокси
+                yield ": ping\n\n"
+                continue
+            if evt is None:
+                return
+            yield f"event: {evt['type']}\ndata: {json.dumps(evt)}\n\n"
+    finally:
+        broadcaster.unsubscribe(q)
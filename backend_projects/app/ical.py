@@ -0,0 +1,154 @@
+import datetime
+import hashlib
+
+from sqlalchemy import select
+
+from .cache import calendar_cache
+from .duedates import open_with_due
+from .models import db, ChangeLog, Task
+from .sync import SNAPSHOT_XMIN
+
+# iCalendar-лента сроков пользователя: GET /tasks/calendar.ics?token=
+#
+# Календари опрашивают ленту каждые несколько минут, почти всегда без
+# изменений. В кэше на пользователя (cache.calendar_cache) лежат готовые
+# VEVENT по задачам и собранное тело; на запрос:
+#
+#   - xmin текущего снапшота не сдвинулся — отдаём тело, в task не ходим;
+#   - иначе берём из change_log задачи, изменённые в транзакциях между
+#     прошлым и текущим xmin (как курсор /sync), и перерисовываем только их;
+#   - кэша нет или изменений больше MAX_INCREMENTAL_CHANGES — собираем заново
+#     по ix_task_open_user_due_date_id.
+#
+# В ленте открытые задачи со сроком. Срок ровно в полночь UTC — событие
+# на весь день (фронтенд задаёт срок датой), иначе — момент в UTC.
+
+PRODID = "-//task-manager//tasks//EN"
+UID_DOMAIN = "task-manager"
+MAX_INCREMENTAL_CHANGES = 500
+
+# RFC 5545: 1 — наивысший, 9 — наименьший
+PRIORITIES = {"urgent": 1, "high": 1, "medium": 5, "low": 9}
+
+FEED_COLUMNS = (Task.id, Task.title, Task.description, Task.priority, Task.due_date)
+
+HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    f"PRODID:{PRODID}\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+    "METHOD:PUBLISH\r\n"
+    "X-WR-CALNAME:Tasks\r\n"
+)
+FOOTER = "END:VCALENDAR\r\n"
+
+
+# -----------------------------
+# Формат
+
+def _escape(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+        .replace("\r", "\\n")
+    )
+
+
+def _fold(line):
+    """Строка длиннее 75 октетов -> куски через CRLF + пробел (RFC 5545, 3.1)."""
+    raw = line.encode()
+    parts, start, limit = [], 0, 75
+    while len(raw) - start > limit:
+        end = start + limit
+        # не режем UTF-8 посередине символа
+        while (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(raw[start:end].decode())
+        # пробел в начале продолжения тоже считается
+        start, limit = end, 74
+    parts.append(raw[start:].decode())
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _dtstart(due):
+    if due.time() == datetime.time(0):
+        return f"DTSTART;VALUE=DATE:{due:%Y%m%d}"
+    return f"DTSTART:{due:%Y%m%dT%H%M%SZ}"
+
+
+def render_event(row, stamp):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:task-{row.id}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}",
+        _dtstart(row.due_date),
+        f"SUMMARY:{_escape(row.title)}",
+    ]
+    if row.description:
+        lines.append(f"DESCRIPTION:{_escape(row.description)}")
+    if row.priority in PRIORITIES:
+        lines.append(f"PRIORITY:{PRIORITIES[row.priority]}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def _assemble(events):
+    # events: {task_id: ((due_date, id), VEVENT)} — в ленте по сроку
+    body = "".join([HEADER, *(text for _, text in sorted(events.values())), FOOTER])
+    etag = "cal-" + hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+    return body, etag
+
+
+def _render(rows, stamp):
+    return {r.id: ((r.due_date, r.id), render_event(r, stamp)) for r in rows}
+
+
+# -----------------------------
+# Сборка и обновление
+
+def _changed_task_ids(since, xmin):
+    # завершённые транзакции из [since, xmin): ix_change_log_txid_revision
+    return set(db.session.execute(
+        select(ChangeLog.entity_id)
+        .where(
+            ChangeLog.txid >= since,
+            ChangeLog.txid < xmin,
+            ChangeLog.entity == "task",
+        )
+        .limit(MAX_INCREMENTAL_CHANGES + 1)
+    ).scalars())
+
+
+def calendar_feed(user_id):
+    """(тело text/calendar, etag) ленты пользователя."""
+    stamp = datetime.datetime.utcnow().replace(microsecond=0)
+    # xmin — до чтения задач: что закоммитят после, подхватим в следующий раз
+    xmin = db.session.execute(select(SNAPSHOT_XMIN)).scalar_one()
+    feed_query = open_with_due(select(*FEED_COLUMNS), user_id)
+
+    cached = calendar_cache.get(user_id)
+    if cached is not None:
+        since, events, body, etag = cached
+        if since == xmin:
+            return body, etag
+
+        changed = _changed_task_ids(since, xmin)
+        if len(changed) <= MAX_INCREMENTAL_CHANGES:
+            rows = []
+            if changed:
+                rows = db.session.execute(feed_query.where(Task.id.in_(changed))).all()
+            if rows or not changed.isdisjoint(events):
+                # копия: параллельный запрос может читать старый словарь
+                events = {k: v for k, v in events.items() if k not in changed}
+                events.update(_render(rows, stamp))
+                body, etag = _assemble(events)
+            calendar_cache.set(user_id, (xmin, events, body, etag))
+            return body, etag
+
+    events = _render(db.session.execute(feed_query).all(), stamp)
+    body, etag = _assemble(events)
+    calendar_cache.set(user_id, (xmin, events, body, etag))
+    return body, etag
@@ -0,0 +1,51 @@
+from . import auth, cache, events
+from .models import db
+
+# Хуки процесса для WSGI-сервера с preload (см. gunicorn.conf.py):
+# приложение создаётся один раз в master, воркеры получают его через fork.
+# Соединения и потоки через fork не переживают — их надо пересоздать.
+
+
+def _engines(app):
+    with app.app_context():
+        return list(db.engines.values())
+
+
+def before_fork(app):
+    """Master после загрузки приложения: воркерам не должно достаться ничего живого."""
+    events.stop_listener()
+    auth.kdf_pool.shutdown()
+    for engine in _engines(app):
+        engine.dispose()
+
+
+def after_fork(app):
+    """Воркер сразу после fork."""
+    for engine in _engines(app):
+        # close=False: сокеты, если они всё же унаследованы, принадлежат
+        # master — закрывать их из воркера нельзя, просто забываем
+        engine.dispose(close=False)
+
+    # кэш мог заполниться в master и не получит его инвалидаций
+    for c in cache.CACHES:
+        c.clear()
+
+    # потоки пула хэширования паролей через fork не переходят
+    auth.kdf_pool.reset()
+
+    if app.config["EVENTS_BACKEND"] == "postgres":
+        events.stop_listener()
+        events.start_listener(app)
+
+
+def begin_shutdown(app):
+    """Воркер получил SIGTERM: отпускаем SSE-клиентов, чтобы не ждать graceful_timeout."""
+    events.broadcaster.close()
+
+
+def shutdown(app):
+    """Воркер завершается: закрываем LISTEN, пул хэширования и соединения пула."""
+    events.stop_listener()
+    auth.kdf_pool.shutdown()
+    for engine in _engines(app):
+        engine.dispose()
@@ -0,0 +1,242 @@
+import functools
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.metrics")
+
+# границы гистограмм, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# -----------------------------
+# Статистика одного запроса (живёт в flask.g)
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.statements = Counter()
+
+
+def current_stats():
+    if has_request_context():
+        return g.get("request_stats")
+    return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_time += time.perf_counter() - started
+    stats.statements[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # запрос упал — after_cursor_execute не будет; без pop начало остаётся на
+    # соединении в пуле, и следующие запросы меряются от чужого времени
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def timed_serialization(func):
+    """Время сериализации без времени вложенных SQL-запросов."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return func(*args, **kwargs)
+        started, db_before = time.perf_counter(), stats.db_time
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.serialize_time += elapsed - (stats.db_time - db_before)
+    return wrapper
+
+
+# -----------------------------
+# Агрегаты по эндпоинтам (на процесс)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.query_count = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.serialize_seconds = defaultdict(float)
+        self.response_bytes = defaultdict(int)
+        self.responses = Counter()
+        self.slow_requests = Counter()
+        self.n_plus_one = Counter()
+
+    def observe(self, endpoint, method, status, duration, stats, size):
+        key = (endpoint, method)
+        with self._lock:
+            self.latency[key].observe(duration)
+            self.query_count[key].observe(stats.queries)
+            self.db_seconds[key] += stats.db_time
+            self.serialize_seconds[key] += stats.serialize_time
+            self.response_bytes[key] += size
+            self.responses[(endpoint, method, status)] += 1
+
+    def count_slow(self, key):
+        with self._lock:
+            self.slow_requests[key] += 1
+
+    def count_n_plus_one(self, key):
+        with self._lock:
+            self.n_plus_one[key] += 1
+
+    def render(self, extra_gauges=()):
+        lines = []
+        with self._lock:
+            _histogram(lines, "http_request_duration_seconds",
+                       "Request latency", self.latency)
+            _histogram(lines, "http_request_db_queries",
+                       "SQL statements per request", self.query_count)
+            _counter(lines, "http_request_db_seconds_total",
+                     "Time spent in SQL", self.db_seconds)
+            _counter(lines, "http_request_serialize_seconds_total",
+                     "Time spent serializing responses", self.serialize_seconds)
+            _counter(lines, "http_response_bytes_total",
+                     "Response body size", self.response_bytes)
+
+            lines.append("# HELP http_responses_total Responses by status")
+            lines.append("# TYPE http_responses_total counter")
+            for (endpoint, method, status), value in sorted(self.responses.items()):
+                lines.append(
+                    f'http_responses_total{{endpoint="{endpoint}",method="{method}",'
+                    f'status="{status}"}} {value}'
+                )
+
+            _counter(lines, "http_slow_requests_total",
+                     "Requests over METRICS_SLOW_REQUEST_MS", self.slow_requests)
+            _counter(lines, "http_n_plus_one_total",
+                     "Requests with a repeated identical statement", self.n_plus_one)
+
+        for name, help_text, samples in extra_gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key):
+    endpoint, method = key
+    return f'endpoint="{endpoint}",method="{method}"'
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, h in sorted(histograms.items()):
+        labels = _labels(key)
+        for bound, count in zip(h.buckets, h.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.total}')
+        lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+        lines.append(f"{name}_count{{{labels}}} {h.total}")
+
+
+def _counter(lines, name, help_text, values):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{{{_labels(key)}}} {value}")
+
+
+registry = Registry()
+
+
+# -----------------------------
+# Хуки Flask
+
+def _before_request():
+    g.request_stats = RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop("request_stats", None)
+    if stats is None:
+        return response
+
+    app = current_app
+    duration = time.perf_counter() - stats.started
+    endpoint = request.endpoint or "unknown"
+    method = request.method
+    size = 0 if response.is_streamed else (response.calculate_content_length() or 0)
+
+    registry.observe(endpoint, method, response.status_code, duration, stats, size)
+
+    if app.config["METRICS_SERVER_TIMING"]:
+        app_time = max(duration - stats.db_time - stats.serialize_time, 0.0)
+        response.headers["Server-Timing"] = ", ".join((
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+            f"ser;dur={stats.serialize_time * 1000:.2f}",
+            f"app;dur={app_time * 1000:.2f}",
+            f"total;dur={duration * 1000:.2f}",
+        ))
+
+    slow_ms = app.config["METRICS_SLOW_REQUEST_MS"]
+    if slow_ms and duration * 1000 >= slow_ms:
+        registry.count_slow((endpoint, method))
+        logger.warning(
+            "slow request %s %s: %.1f ms, %d queries, db %.1f ms, ser %.1f ms, %d bytes",
+            method, request.path, duration * 1000, stats.queries,
+            stats.db_time * 1000, stats.serialize_time * 1000, size,
+        )
+
+    threshold = app.config["METRICS_N_PLUS_ONE_THRESHOLD"]
+    if threshold and stats.statements:
+        statement, repeats = stats.statements.most_common(1)[0]
+        if repeats >= threshold:
+            registry.count_n_plus_one((endpoint, method))
+            logger.warning(
+                "possible N+1 in %s %s: statement repeated %d times: %s",
+                method, request.path, repeats, " ".join(statement.split())[:200],
+            )
+
+    return response
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,196 @@
+import importlib
+import pkgutil
+import re
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from . import migrations
+from .models import db
+
+# Версионные миграции схемы: app/migrations/NNNN_<name>.py
+#
+#   flask db upgrade      — применить все новые миграции
+#   flask db status       — что применено, что ждёт
+#
+# Каждая миграция — модуль с upgrade(conn). transactional = False значит,
+# что миграция выполняется в autocommit (нужно для CREATE INDEX CONCURRENTLY):
+# такая миграция обязана быть идемпотентной, её могут перезапустить после сбоя.
+
+# ключ pg_advisory_lock: два upgrade (несколько реплик при деплое)
+# не выполняются одновременно
+ADVISORY_LOCK_KEY = 7_310_214
+
+_MODULE_RE = re.compile(r"^(\d{4})_(\w+)$")
+
+_CREATE_TABLE = text("""
+    CREATE TABLE IF NOT EXISTS public.schema_migrations (
+        version integer PRIMARY KEY,
+        name varchar(200) NOT NULL,
+        applied_at timestamp without time zone NOT NULL DEFAULT (now() at time zone 'utc'),
+        duration_ms integer NOT NULL
+    )
+""")
+
+
+class Migration:
+    def __init__(self, version, name, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.transactional = getattr(module, "transactional", True)
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.name}"
+
+
+def discover():
+    found = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        match = _MODULE_RE.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{migrations.__name__}.{info.name}")
+        found.append(Migration(int(match.group(1)), match.group(2), module))
+    found.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"duplicate migration versions: {versions}")
+    return found
+
+
+def applied_versions(conn):
+    exists = conn.execute(text("SELECT to_regclass('public.schema_migrations')")).scalar()
+    if exists is None:
+        return set()
+    return set(conn.execute(text("SELECT version FROM public.schema_migrations")).scalars())
+
+
+def _prepare(conn, lock_timeout, local):
+    scope = "LOCAL " if local else ""
+    # DDL не должен висеть в очереди за долгой транзакцией и блокировать
+    # всех, кто встал за ним: лучше упасть и перезапустить
+    conn.execute(text(f"SET {scope}lock_timeout = '{lock_timeout}'"))
+    conn.execute(text(f"SET {scope}statement_timeout = 0"))
+
+
+def _record(conn, migration, duration_ms):
+    conn.execute(
+        text(
+            "INSERT INTO public.schema_migrations (version, name, duration_ms) "
+            "VALUES (:version, :name, :duration_ms)"
+        ),
+        {"version": migration.version, "name": migration.name, "duration_ms": duration_ms},
+    )
+
+
+def _acquire_lock(conn, log):
+    # не pg_advisory_lock: ждущий в нём сеанс держит открытую транзакцию,
+    # и CREATE INDEX CONCURRENTLY у владельца блокировки ждал бы его вечно
+    waiting = False
+    while not conn.execute(
+        text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+    ).scalar():
+        if not waiting:
+            log("another migration is running, waiting...")
+            waiting = True
+        time.sleep(1.0)
+
+
+def upgrade(engine, target=None, lock_timeout="10s", log=print):
+    pending_all = discover()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        _acquire_lock(lock_conn, log)
+        try:
+            lock_conn.execute(_CREATE_TABLE)
+            # список читаем уже под блокировкой: соседний upgrade мог всё сделать
+            done = applied_versions(lock_conn)
+            pending = [
+                m for m in pending_all
+                if m.version not in done and (target is None or m.version <= target)
+            ]
+            if not pending:
+                log("schema is up to date")
+                return []
+
+            for migration in pending:
+                log(f"applying {migration!r}...")
+                started = time.perf_counter()
+                if migration.transactional:
+                    with engine.begin() as conn:
+                        _prepare(conn, lock_timeout, local=True)
+                        migration.module.upgrade(conn)
+                        _record(conn, migration, int((time.perf_counter() - started) * 1000))
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        _prepare(conn, lock_timeout, local=False)
+                        migration.module.upgrade(conn)
+                        _record(conn, migration, int((time.perf_counter() - started) * 1000))
+                log(f"applied {migration!r} in {time.perf_counter() - started:.2f}s")
+            return pending
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+# -----------------------------
+# Помощники для модулей миграций
+
+def column_type(conn, table, column):
+    return conn.execute(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    ).scalar()
+
+
+def create_index_concurrently(conn, name, definition, unique=False):
+    """
+    CREATE INDEX CONCURRENTLY без блокировки записи в таблицу.
+    Прерванная попытка оставляет INVALID-индекс — его пересоздаём.
+    Вызывать только из миграции с transactional = False.
+    """
+    valid = conn.execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'public' AND c.relname = :name"
+        ),
+        {"name": name},
+    ).scalar()
+    if valid:
+        return
+    if valid is False:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS public.{name}"))
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} CONCURRENTLY {name} ON {definition}"))
+
+
+# -----------------------------
+# flask db ...
+
+db_cli = AppGroup("db", help="Schema migrations.")
+
+
+@db_cli.command("upgrade")
+@click.option("--to", "target", type=int, default=None, help="Stop after this version.")
+@click.option("--lock-timeout", default="10s", show_default=True,
+              help="Postgres lock_timeout for each migration.")
+def upgrade_command(target, lock_timeout):
+    """Apply pending migrations."""
+    upgrade(db.engine, target=target, lock_timeout=lock_timeout, log=click.echo)
+
+
+@db_cli.command("status")
+def status_command():
+    """Show applied and pending migrations."""
+    with db.engine.connect() as conn:
+        done = applied_versions(conn)
+    for migration in discover():
+        mark = "applied" if migration.version in done else "pending"
+        click.echo(f"{mark:<8} {migration!r}")
@@ -0,0 +1,71 @@
+"""Исходная схема (как её создавал db.create_all()).
+
+IF NOT EXISTS везде: базы, созданные create_all, проходят миграцию без изменений.
+"""
+from sqlalchemy import text
+
+STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS public.users (
+        id serial PRIMARY KEY,
+        name varchar(120) NOT NULL,
+        email varchar(255) NOT NULL,
+        password_hash varchar(255) NOT NULL,
+        created_at timestamp without time zone NOT NULL
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_public_users_email ON public.users (email)",
+    """
+    CREATE TABLE IF NOT EXISTS public.task (
+        id serial PRIMARY KEY,
+        user_id integer NOT NULL REFERENCES public.users (id),
+        title varchar(100) NOT NULL,
+        description varchar(255),
+        done boolean NOT NULL,
+        priority varchar(10) NOT NULL,
+        status varchar(20) NOT NULL,
+        created_at timestamp without time zone NOT NULL,
+        due_date timestamp without time zone,
+        sub_tasks json NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_public_task_user_id ON public.task (user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS public.contact (
+        id serial PRIMARY KEY,
+        user_id integer NOT NULL REFERENCES public.users (id),
+        name varchar(120) NOT NULL,
+        email varchar(255) NOT NULL,
+        phone varchar(50),
+        company varchar(255),
+        position varchar(255),
+        avatar_color varchar(50),
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_public_contact_user_id ON public.contact (user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS public.task_assignee (
+        task_id integer NOT NULL REFERENCES public.task (id) ON DELETE CASCADE,
+        contact_id integer NOT NULL REFERENCES public.contact (id) ON DELETE CASCADE,
+        PRIMARY KEY (task_id, contact_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.note (
+        id serial PRIMARY KEY,
+        user_id integer NOT NULL REFERENCES public.users (id),
+        title varchar(200) NOT NULL,
+        content text NOT NULL,
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_public_note_user_id ON public.note (user_id)",
+)
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,15 @@
+"""task.sub_tasks: json -> jsonb (точечные UPDATE подзадач, см. subtasks.py).
+
+Переписывает таблицу под ACCESS EXCLUSIVE — на больших базах запускать
+в окно обслуживания. Если колонка уже jsonb, ничего не делает.
+"""
+from sqlalchemy import text
+
+from ..migrate import column_type
+
+
+def upgrade(conn):
+    if column_type(conn, "task", "sub_tasks") == "json":
+        conn.execute(text(
+            "ALTER TABLE public.task ALTER COLUMN sub_tasks TYPE jsonb USING sub_tasks::jsonb"
+        ))
@@ -0,0 +1,12 @@
+"""Generated-колонка note.search_vector для GET /notes/search (индекс — в 0006)."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("""
+        ALTER TABLE public.note ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+        ) STORED
+    """))
@@ -0,0 +1,48 @@
+"""Журнал изменений для GET /sync и ETag + заполнение по уже существующим строкам.
+
+Без backfill клиент, который синхронизируется с нуля, не увидел бы
+записи, созданные до появления журнала.
+"""
+from sqlalchemy import text
+
+STATEMENTS = (
+    "CREATE SEQUENCE IF NOT EXISTS public.change_log_revision_seq",
+    """
+    CREATE TABLE IF NOT EXISTS public.change_log (
+        entity varchar(20) NOT NULL,
+        entity_id integer NOT NULL,
+        op varchar(10) NOT NULL,
+        revision bigint NOT NULL DEFAULT nextval('public.change_log_revision_seq'),
+        txid bigint NOT NULL,
+        changed_at timestamp without time zone NOT NULL,
+        PRIMARY KEY (entity, entity_id),
+        CONSTRAINT change_log_revision_key UNIQUE (revision)
+    )
+    """,
+    """
+    INSERT INTO public.change_log (entity, entity_id, op, txid, changed_at)
+    SELECT 'task', id, 'upsert', pg_current_xact_id()::text::bigint, now() at time zone 'utc'
+    FROM public.task ORDER BY id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO public.change_log (entity, entity_id, op, txid, changed_at)
+    SELECT 'contact', id, 'upsert', pg_current_xact_id()::text::bigint, now() at time zone 'utc'
+    FROM public.contact ORDER BY id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO public.change_log (entity, entity_id, op, txid, changed_at)
+    SELECT 'note', id, 'upsert', pg_current_xact_id()::text::bigint, now() at time zone 'utc'
+    FROM public.note ORDER BY id
+    ON CONFLICT DO NOTHING
+    """,
+    # таблица новая, её никто не читает — обычный CREATE INDEX в той же транзакции
+    "CREATE INDEX IF NOT EXISTS ix_change_log_txid_revision ON public.change_log (txid, revision)",
+    "CREATE INDEX IF NOT EXISTS ix_change_log_entity_revision ON public.change_log (entity, revision)",
+)
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,6 @@
+"""Расширение pg_trgm для trigram-индекса контактов (индекс — в 0006)."""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
@@ -0,0 +1,27 @@
+"""Индексы под списки, фильтры и поиск — CONCURRENTLY, без блокировки записи."""
+from ..migrate import create_index_concurrently
+
+transactional = False
+
+INDEXES = (
+    # keyset-пагинация GET /tasks: (фильтр, created_at, id)
+    ("ix_task_created_at_id", "public.task (created_at, id)"),
+    ("ix_task_status_created_at_id", "public.task (status, created_at, id)"),
+    ("ix_task_priority_created_at_id", "public.task (priority, created_at, id)"),
+    ("ix_task_done_created_at_id", "public.task (done, created_at, id)"),
+    ("ix_task_due_date_id", "public.task (due_date, id)"),
+    # typeahead контактов
+    ("ix_contact_lower_name_prefix", "public.contact (lower(name) text_pattern_ops)"),
+    ("ix_contact_lower_email_prefix", "public.contact (lower(email) text_pattern_ops)"),
+    # выражение то же, что models.CONTACT_SEARCH_SQL (миграция его не импортирует:
+    # она должна остаться такой, какой была применена)
+    ("ix_contact_search_trgm", "public.contact USING gin "
+     "(lower(name || ' ' || email || ' ' || coalesce(company, '')) gin_trgm_ops)"),
+    # полнотекстовый поиск заметок
+    ("ix_note_search_vector", "public.note USING gin (search_vector)"),
+)
+
+
+def upgrade(conn):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
@@ -0,0 +1,35 @@
+"""Архив закрытых задач: task_archive и связи с исполнителями (см. archive.py)."""
+from sqlalchemy import text
+
+STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS public.task_archive (
+        id integer PRIMARY KEY,
+        user_id integer NOT NULL REFERENCES public.users (id),
+        title varchar(100) NOT NULL,
+        description varchar(255),
+        done boolean NOT NULL,
+        priority varchar(10) NOT NULL,
+        status varchar(20) NOT NULL,
+        created_at timestamp without time zone NOT NULL,
+        due_date timestamp without time zone,
+        sub_tasks jsonb NOT NULL,
+        archived_at timestamp without time zone NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.task_archive_assignee (
+        task_id integer NOT NULL REFERENCES public.task_archive (id) ON DELETE CASCADE,
+        contact_id integer NOT NULL REFERENCES public.contact (id) ON DELETE CASCADE,
+        PRIMARY KEY (task_id, contact_id)
+    )
+    """,
+    # таблицы новые и пустые — обычный CREATE INDEX в той же транзакции
+    "CREATE INDEX IF NOT EXISTS ix_public_task_archive_user_id ON public.task_archive (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_task_archive_created_at_id ON public.task_archive (created_at, id)",
+)
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
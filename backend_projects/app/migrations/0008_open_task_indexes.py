@@ -0,0 +1,19 @@
+"""Partial-индексы по открытым задачам и по кандидатам в архив — CONCURRENTLY."""
+from ..migrate import create_index_concurrently
+
+transactional = False
+
+INDEXES = (
+    # доска: открытые задачи по created_at (done=false в GET /tasks)
+    ("ix_task_open_created_at_id", "public.task (created_at, id) WHERE NOT done"),
+    # просрочено / скоро срок: только открытые задачи с due_date
+    ("ix_task_open_due_date_id",
+     "public.task (due_date, id) WHERE NOT done AND due_date IS NOT NULL"),
+    # архиватор ищет закрытые задачи, не сканируя открытые
+    ("ix_task_closed_id", "public.task (id) WHERE done OR status = 'done'"),
+)
+
+
+def upgrade(conn):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
@@ -0,0 +1,23 @@
+"""Составные индексы для списков контактов и заметок пользователя — CONCURRENTLY."""
+from sqlalchemy import text
+
+from ..migrate import create_index_concurrently
+
+transactional = False
+
+INDEXES = (
+    # GET /notes: свои заметки, свежие сверху
+    ("ix_note_user_id_updated_at", "public.note (user_id, updated_at DESC)"),
+    # GET /contacts: свои контакты по имени
+    ("ix_contact_user_id_name", "public.contact (user_id, name)"),
+)
+
+# одиночные индексы по user_id — префикс составных, больше не нужны
+REDUNDANT = ("ix_public_note_user_id", "ix_public_contact_user_id")
+
+
+def upgrade(conn):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
+    for name in REDUNDANT:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS public.{name}"))
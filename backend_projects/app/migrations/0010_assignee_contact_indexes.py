@@ -0,0 +1,17 @@
+"""Обратные индексы связей задача-исполнитель (contact_id, task_id) — CONCURRENTLY."""
+from ..migrate import create_index_concurrently
+
+transactional = False
+
+# PK (task_id, contact_id) не помогает искать по contact_id: задачи исполнителя,
+# его нагрузка и каскад при удалении контакта шли сканом всей таблицы связей
+INDEXES = (
+    ("ix_task_assignee_contact_id_task_id", "public.task_assignee (contact_id, task_id)"),
+    ("ix_task_archive_assignee_contact_id_task_id",
+     "public.task_archive_assignee (contact_id, task_id)"),
+)
+
+
+def upgrade(conn):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
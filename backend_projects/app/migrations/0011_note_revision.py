@@ -0,0 +1,11 @@
+"""note.revision — версия заметки для PATCH /notes/<id> и 409 при конфликте.
+
+ADD COLUMN с константным DEFAULT в Postgres 11+ не переписывает таблицу.
+"""
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    conn.execute(text(
+        "ALTER TABLE public.note ADD COLUMN IF NOT EXISTS revision integer NOT NULL DEFAULT 1"
+    ))
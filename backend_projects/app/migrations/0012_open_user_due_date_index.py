@@ -0,0 +1,16 @@
+"""Partial-индекс сроков открытых задач по пользователю — CONCURRENTLY."""
+from ..migrate import create_index_concurrently
+
+transactional = False
+
+# ix_task_open_due_date_id общий на всю доску: для одного пользователя
+# planner читал бы чужие сроки и отбрасывал их фильтром
+INDEXES = (
+    ("ix_task_open_user_due_date_id",
+     "public.task (user_id, due_date, id) WHERE NOT done AND due_date IS NOT NULL"),
+)
+
+
+def upgrade(conn):
+    for name, definition in INDEXES:
+        create_index_concurrently(conn, name, definition)
@@ -0,0 +1,31 @@
+"""collection_version — версия коллекции для ETag списков, растёт в порядке коммитов.
+
+Раньше версией был max(change_log.revision), но revision выдаёт sequence
+при записи: транзакция с меньшей revision могла закоммититься позже, и
+список отдавал 304 по уже устаревшему ETag. Стартуем с того же max —
+ETag, выданные до миграции, остаются верными; индекс под max больше не нужен.
+"""
+from sqlalchemy import text
+
+STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS public.collection_version (
+        entity varchar(20) PRIMARY KEY,
+        version bigint NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    INSERT INTO public.collection_version (entity, version)
+    SELECT e.entity, coalesce(
+        (SELECT max(revision) FROM public.change_log c WHERE c.entity = e.entity), 0
+    )
+    FROM (VALUES ('task'), ('contact'), ('note')) AS e (entity)
+    ON CONFLICT DO NOTHING
+    """,
+    "DROP INDEX IF EXISTS public.ix_change_log_entity_revision",
+)
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1 @@
+# Версионные миграции: NNNN_<name>.py, см. app/migrate.py
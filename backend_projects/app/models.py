@@ -1,9 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 import datetime
 
 db = SQLAlchemy()
 
+# Схема в базе меняется только миграциями (app/migrations, `flask db upgrade`).
+# Индексы и колонки здесь должны совпадать с тем, что создают миграции.
+
+# Строка, по которой ищем контакт; то же выражение стоит в индексе
+CONTACT_SEARCH_SQL = "lower(name || ' ' || email || ' ' || coalesce(company, ''))"
+
 # 🔗 Ассоциативная таблица many-to-many: Task <-> Contact
 task_assignee = db.Table(
     "task_assignee",
@@ -19,6 +26,8 @@ task_assignee = db.Table(
         db.ForeignKey("public.contact.id", ondelete="CASCADE"),
         primary_key=True,
     ),
+    # обратный индекс: задачи контакта, каскад при удалении контакта, Contact.tasks
+    db.Index("ix_task_assignee_contact_id_task_id", "contact_id", "task_id"),
     schema="public",
 )
 
@@ -40,7 +49,34 @@ class User(db.Model):
 
 class Task(db.Model):
     __tablename__ = "task"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # Индексы под keyset-пагинацию GET /tasks: (фильтр, created_at, id)
+        db.Index("ix_task_created_at_id", "created_at", "id"),
+        db.Index("ix_task_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_task_priority_created_at_id", "priority", "created_at", "id"),
+        db.Index("ix_task_done_created_at_id", "done", "created_at", "id"),
+        db.Index("ix_task_due_date_id", "due_date", "id"),
+        # partial-индексы по открытым задачам: доска почти всегда про них
+        db.Index(
+            "ix_task_open_created_at_id", "created_at", "id",
+            postgresql_where=db.text("NOT done"),
+        ),
+        db.Index(
+            "ix_task_open_due_date_id", "due_date", "id",
+            postgresql_where=db.text("NOT done AND due_date IS NOT NULL"),
+        ),
+        # сроки одного пользователя: GET /tasks/due и календарь (см. duedates.py)
+        db.Index(
+            "ix_task_open_user_due_date_id", "user_id", "due_date", "id",
+            postgresql_where=db.text("NOT done AND due_date IS NOT NULL"),
+        ),
+        # кандидаты в архив (см. archive.py)
+        db.Index(
+            "ix_task_closed_id", "id",
+            postgresql_where=db.text("done OR status = 'done'"),
+        ),
+        {"schema": "public"},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -55,25 +91,39 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
     due_date = db.Column(db.DateTime, nullable=True)
 
-    # JSON с подзадачами
-    sub_tasks = db.Column(JSON, default=list, nullable=False)
+    # JSONB с подзадачами: [{"id", "title", "done"}, ...]
+    # JSONB, чтобы менять одну подзадачу на месте (см. subtasks.py)
+    sub_tasks = db.Column(JSONB, default=list, nullable=False)
 
     # 🔗 Many-to-many: Task.assignees -> список Contact
     assignees = db.relationship(
         "Contact",
         secondary=task_assignee,
         back_populates="tasks",
-        lazy="joined",  # можно убрать, если не нужен eager-load
+        # ответы API строятся из select() по колонкам (serializers.py),
+        # отношение для ORM-кода, в маршрутах не загружается
     )
 
 
 class Contact(db.Model):
     __tablename__ = "contact"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # typeahead: префикс по имени/email — btree, подстрока и опечатки — GIN trigram
+        db.Index("ix_contact_lower_name_prefix", db.text("lower(name) text_pattern_ops")),
+        db.Index("ix_contact_lower_email_prefix", db.text("lower(email) text_pattern_ops")),
+        db.Index(
+            "ix_contact_search_trgm",
+            db.text(f"{CONTACT_SEARCH_SQL} gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        # список контактов пользователя по имени; он же индекс внешнего ключа
+        db.Index("ix_contact_user_id_name", "user_id", "name"),
+        {"schema": "public"},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("public.users.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("public.users.id"), nullable=False)
     user = db.relationship("User", back_populates="contacts")
 
     name = db.Column(db.String(120), nullable=False)
@@ -102,7 +152,12 @@ class Contact(db.Model):
 
 class Note(db.Model):
     __tablename__ = "note"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        db.Index("ix_note_search_vector", "search_vector", postgresql_using="gin"),
+        # заметки пользователя, свежие сверху; он же индекс внешнего ключа
+        db.Index("ix_note_user_id_updated_at", "user_id", db.text("updated_at DESC")),
+        {"schema": "public"},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -110,13 +165,27 @@ class Note(db.Model):
         db.Integer,
         db.ForeignKey("public.users.id"),
         nullable=False,
-        index=True,
     )
     user = db.relationship("User", back_populates="notes")
 
     title = db.Column(db.String(200), nullable=False, default="")
     content = db.Column(db.Text, nullable=False, default="")
 
+    # растёт на каждое изменение; PUT/PATCH с устаревшей baseRevision — 409
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    # 🔎 Полнотекстовый поиск (GET /notes/search): generated-колонка,
+    # Postgres пересчитывает её сам при каждом INSERT/UPDATE.
+    # title весит больше, чем content. Грузим только по запросу.
+    search_vector = deferred(db.Column(
+        TSVECTOR,
+        db.Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
     created_at = db.Column(
         db.DateTime,
         default=datetime.datetime.utcnow,
@@ -129,3 +198,89 @@ class Note(db.Model):
         nullable=False,
     )
 
+
+
+# 🗄 Архив закрытых задач (см. archive.py): те же колонки, что у task,
+# плюс archived_at. id сохраняется — восстановленная задача возвращается
+# под тем же id, и клиенты /sync видят её как обычный upsert.
+task_archive_assignee = db.Table(
+    "task_archive_assignee",
+    db.Column(
+        "task_id",
+        db.Integer,
+        db.ForeignKey("public.task_archive.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column(
+        "contact_id",
+        db.Integer,
+        db.ForeignKey("public.contact.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    # каскад при удалении контакта
+    db.Index("ix_task_archive_assignee_contact_id_task_id", "contact_id", "task_id"),
+    schema="public",
+)
+
+
+class TaskArchive(db.Model):
+    __tablename__ = "task_archive"
+    __table_args__ = (
+        # GET /tasks/archive: keyset по (created_at, id), как у доски
+        db.Index("ix_task_archive_created_at_id", "created_at", "id"),
+        {"schema": "public"},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("public.users.id"), nullable=False, index=True)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(255))
+    done = db.Column(db.Boolean, nullable=False)
+    priority = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    due_date = db.Column(db.DateTime, nullable=True)
+    sub_tasks = db.Column(JSONB, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+
+# 🔄 Журнал изменений для delta-sync (GET /sync).
+# Одна строка на сущность: каждая запись в неё поднимает revision и txid,
+# удаление оставляет tombstone (op = "delete").
+change_log_revision_seq = db.Sequence("change_log_revision_seq", schema="public")
+
+
+class ChangeLog(db.Model):
+    __tablename__ = "change_log"
+    __table_args__ = (
+        db.Index("ix_change_log_txid_revision", "txid", "revision"),
+        {"schema": "public"},
+    )
+
+    entity = db.Column(db.String(20), primary_key=True)  # "task" | "contact" | "note"
+    entity_id = db.Column(db.Integer, primary_key=True)
+    op = db.Column(db.String(10), nullable=False)  # "upsert" | "delete"
+
+    revision = db.Column(
+        db.BigInteger,
+        change_log_revision_seq,
+        server_default=change_log_revision_seq.next_value(),
+        nullable=False,
+        unique=True,
+    )
+    # id транзакции Postgres: по нему курсор понимает, что запись уже закоммичена
+    txid = db.Column(db.BigInteger, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
+# 🏷️ Версия коллекции для ETag списков: одна строка на entity.
+# revision из change_log для этого не годится — sequence выдаёт её при записи,
+# а коммитятся транзакции в другом порядке. Версию поднимает сам писатель
+# перед COMMIT (sync._bump_versions): блокировка строки держится до коммита,
+# так что версии растут в порядке коммитов.
+class CollectionVersion(db.Model):
+    __tablename__ = "collection_version"
+    __table_args__ = {"schema": "public"}
+
+    entity = db.Column(db.String(20), primary_key=True)  # "task" | "contact" | "note"
+    version = db.Column(db.BigInteger, nullable=False, default=0)
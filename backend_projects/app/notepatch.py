@@ -0,0 +1,85 @@
+from sqlalchemy import func, literal, select, update
+
+from .models import db, Note
+
+# Сохранение заметки разницей (PATCH /notes/<id>):
+#
+#   {"baseRevision": 7,
+#    "patch": [{"at": 120, "delete": 5, "insert": "новый текст"}],
+#    "title": "..."}                          — title необязателен, целиком
+#
+# at/delete — в символах (code points) относительно content ревизии
+# baseRevision; правки по возрастанию at и не пересекаются. Клиенту
+# достаточно одной правки: общий префикс и суффикс старого и нового текста.
+#
+# Применяется одним UPDATE ... WHERE revision = :base: параллельное
+# сохранение дождётся блокировки строки, увидит новую revision и получит 409.
+
+MAX_PATCH_OPS = 50
+
+
+class PatchError(ValueError):
+    pass
+
+
+def parse_patch(raw):
+    """[(at, delete, insert)] из тела запроса; PatchError — неверный формат."""
+    if not isinstance(raw, list) or len(raw) > MAX_PATCH_OPS:
+        raise PatchError("patch must be a list of at most %d edits" % MAX_PATCH_OPS)
+
+    ops, end = [], 0
+    for op in raw:
+        if not isinstance(op, dict):
+            raise PatchError("Invalid edit")
+        at, length, text = op.get("at"), op.get("delete", 0), op.get("insert", "")
+        if (not isinstance(at, int) or not isinstance(length, int) or isinstance(at, bool)
+                or isinstance(length, bool) or not isinstance(text, str)):
+            raise PatchError("Invalid edit")
+        if at < end or length < 0:
+            raise PatchError("Edits must be ordered and must not overlap")
+        ops.append((at, length, text))
+        end = at + length
+    return ops
+
+
+def _patched(content, ops):
+    # куски только исходного content: SQL растёт линейно с числом правок
+    # (вложенные left/substr удваивали выражение на каждой правке)
+    at, length, text = ops[0]
+    result = func.left(content, at) + literal(text)
+    end = at + length
+    for at, length, text in ops[1:]:
+        result = result + func.substr(content, end + 1, at - end) + literal(text)
+        end = at + length
+    return result + func.substr(content, end + 1)
+
+
+def patch_note(note_id, user_id, base_revision, ops, title=None, columns=()):
+    """
+    Применяет правки к заметке пользователя, если она всё ещё в ревизии
+    base_revision. Возвращает строку RETURNING или None (нет заметки,
+    другая ревизия или правка за пределами текста — разбирается вызывающим).
+    """
+    # updated_at проставит onupdate колонки
+    values = {"revision": Note.revision + 1}
+    if ops:
+        values["content"] = _patched(Note.content, ops)
+    if title is not None:
+        values["title"] = title
+
+    stmt = update(Note).where(
+        Note.id == note_id,
+        Note.user_id == user_id,
+        Note.revision == base_revision,
+    )
+    if ops:
+        # правка за концом текста: base у клиента не совпадает с нашим
+        stmt = stmt.where(func.char_length(Note.content) >= ops[-1][0] + ops[-1][1])
+    return db.session.execute(stmt.values(**values).returning(*columns)).first()
+
+
+def note_revision(note_id, user_id):
+    """revision заметки пользователя или None."""
+    return db.session.execute(
+        select(Note.revision).where(Note.id == note_id, Note.user_id == user_id)
+    ).scalar_one_or_none()
@@ -0,0 +1,204 @@
+from operator import attrgetter
+
+from sqlalchemy import select
+
+from .cache import assignee_summaries
+from .metrics import timed_serialization
+from .models import Task, User, Contact, Note
+from .serializers import (
+    USER_COLUMNS,
+    SUB_TASK_COUNT_COLUMNS,
+    _iso,
+    _iso_utc,
+    _user_summary,
+    load_assignee_ids,
+)
+
+# Представление списков GET /tasks, /contacts, /notes:
+#
+#   ?fields=id,title,status     — только эти поля, и только их колонки в SELECT
+#   ?shape=normalized           — user и исполнители не повторяются в каждой
+#                                 строке, а приходят один раз в "users"/"contacts":
+#       {"tasks": [{..., "userId": 1, "assignedContactIds": [3]}],
+#        "users": {"1": {...}}, "contacts": {"3": {...}}}
+#
+# Без параметров ответ прежний (serializers.py).
+
+SHAPES = ("embedded", "normalized")
+
+# связанные объекты: собираются отдельно от колонок строки
+USER = "user"
+ASSIGNEES = "assignedContacts"
+
+
+class Field:
+    __slots__ = ("columns", "value")
+
+    def __init__(self, columns, value=None):
+        self.columns = columns  # что нужно в SELECT
+        self.value = value      # row -> значение; None у связанных объектов
+
+
+def _column(column, attr, fmt=None):
+    get = attrgetter(attr)
+    return Field((column,), get if fmt is None else lambda r: fmt(get(r)))
+
+
+TASK_FIELDS = {
+    "id": _column(Task.id, "id"),
+    "title": _column(Task.title, "title"),
+    "description": _column(Task.description, "description"),
+    "done": _column(Task.done, "done"),
+    "priority": _column(Task.priority, "priority"),
+    "status": _column(Task.status, "status"),
+    "createdAt": _column(Task.created_at, "created_at", _iso),
+    "dueDate": _column(Task.due_date, "due_date", _iso_utc),
+    "subTasks": _column(Task.sub_tasks, "sub_tasks", lambda v: v or []),
+    "subTasksTotal": _column(SUB_TASK_COUNT_COLUMNS[0], "sub_tasks_total"),
+    "subTasksDone": _column(SUB_TASK_COUNT_COLUMNS[1], "sub_tasks_done"),
+    "userId": _column(Task.user_id, "user_id"),
+    USER: Field((Task.user_id, *USER_COLUMNS)),
+    ASSIGNEES: Field((Task.id,)),
+}
+
+CONTACT_FIELDS = {
+    "id": _column(Contact.id, "id"),
+    "name": _column(Contact.name, "name"),
+    "email": _column(Contact.email, "email"),
+    "phone": _column(Contact.phone, "phone"),
+    "company": _column(Contact.company, "company"),
+    "position": _column(Contact.position, "position"),
+    "avatarColor": _column(Contact.avatar_color, "avatar_color"),
+    "createdAt": _column(Contact.created_at, "created_at", _iso),
+    "updatedAt": _column(Contact.updated_at, "updated_at", _iso),
+    "userId": _column(Contact.user_id, "user_id"),
+    USER: Field((Contact.user_id, *USER_COLUMNS)),
+}
+
+NOTE_FIELDS = {
+    "id": _column(Note.id, "id"),
+    "title": _column(Note.title, "title"),
+    "content": _column(Note.content, "content"),
+    "revision": _column(Note.revision, "revision"),
+    "createdAt": _column(Note.created_at, "created_at", _iso_utc),
+    "updatedAt": _column(Note.updated_at, "updated_at", _iso_utc),
+    "userId": _column(Note.user_id, "user_id"),
+    USER: Field((Note.user_id, *USER_COLUMNS)),
+}
+
+ENTITIES = {
+    # entity -> (модель, поля, ключ списка в normalized-ответе)
+    "task": (Task, TASK_FIELDS, "tasks"),
+    "contact": (Contact, CONTACT_FIELDS, "contacts"),
+    "note": (Note, NOTE_FIELDS, "notes"),
+}
+
+
+class View:
+    def __init__(self, entity, fields, shape):
+        self.entity = entity
+        self.model, self.specs, self.key = ENTITIES[entity]
+        self.fields = fields
+        self.shape = shape
+
+    @property
+    def default(self):
+        # без ?fields и ?shape — прежний путь через serializers.py
+        return self.fields is None and self.shape == "embedded"
+
+    @property
+    def normalized(self):
+        return self.shape == "normalized"
+
+    def names(self):
+        return self.fields if self.fields is not None else list(self.specs)
+
+    def select(self, *required):
+        """
+        SELECT только нужных колонок. required — колонки, без которых не
+        работает сам маршрут (сортировка, курсор), в ответ они не попадают.
+        users join-им, только если запрошен user.
+        """
+        columns = []
+        wanted = [c for name in self.names() for c in self.specs[name].columns]
+        for column in (*wanted, *required):
+            # по identity: == у колонок строит SQL-выражение
+            if not any(column is c for c in columns):
+                columns.append(column)
+
+        query = select(*columns).select_from(self.model)
+        if USER in self.names():
+            query = query.outerjoin(User, User.id == self.model.user_id)
+        return query
+
+    @timed_serialization
+    def serialize(self, rows):
+        names = self.names()
+        values = [(name, self.specs[name].value) for name in names if self.specs[name].value]
+        with_user = USER in names
+        with_assignees = ASSIGNEES in names
+
+        if with_assignees:
+            assignee_ids = load_assignee_ids([r.id for r in rows])
+            contacts = assignee_summaries(
+                [cid for cids in assignee_ids.values() for cid in cids]
+            )
+
+        items, users, related_contacts = [], {}, {}
+        for r in rows:
+            item = {name: value(r) for name, value in values}
+
+            if with_user:
+                user = _user_summary(r.user_id, r.user_name, r.user_email)
+                if self.normalized:
+                    item["userId"] = r.user_id
+                    if user is not None:
+                        users[r.user_id] = user
+                else:
+                    item[USER] = user
+
+            if with_assignees:
+                cids = [cid for cid in assignee_ids[r.id] if cid in contacts]
+                if self.normalized:
+                    item["assignedContactIds"] = cids
+                    for cid in cids:
+                        related_contacts[cid] = contacts[cid]
+                else:
+                    item[ASSIGNEES] = [contacts[cid] for cid in cids]
+
+            items.append(item)
+
+        if not self.normalized:
+            return items
+
+        payload = {self.key: items}
+        if with_user:
+            payload["users"] = users
+        if with_assignees:
+            payload["contacts"] = related_contacts
+        return payload
+
+
+def parse_view(entity, args):
+    """View из query string; ValueError — неизвестное поле или shape."""
+    specs = ENTITIES[entity][1]
+
+    shape = (args.get("shape") or "embedded").strip().lower()
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape: {shape}")
+
+    fields = None
+    raw = args.get("fields")
+    if raw is not None:
+        fields = []
+        for name in (v.strip() for v in raw.split(",")):
+            if not name:
+                continue
+            if name not in specs:
+                raise ValueError(f"Unknown field: {name}")
+            if name not in fields:
+                fields.append(name)
+        if not fields:
+            raise ValueError("Empty fields")
+
+    return View(entity, fields, shape)
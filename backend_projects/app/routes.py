@@ -1,127 +1,392 @@
 import os
+import io
+import csv
+import json
+import hashlib
+import base64
 import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, request, jsonify, stream_with_context, url_for
 from dotenv import load_dotenv
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from .models import db, Task, User, Contact, Note
-from datetime import timezone
+from sqlalchemy import delete, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+from .models import db, Task, TaskArchive, User, Contact, Note, task_assignee
+from .serializers import (
+    FastJSONProvider,
+    TASK_RETURNING,
+    CONTACT_COLUMNS,
+    NOTE_COLUMNS,
+    NOTE_REVISION_COLUMNS,
+    task_select,
+    archived_task_select,
+    contact_select,
+    note_select,
+    serialize_contact as _serialize_contact,
+    serialize_task_row,
+    serialize_contact_row,
+    serialize_note_row,
+    serialize_task_rows,
+    serialize_archived_task_rows,
+    serialize_contact_rows,
+    serialize_note_rows,
+    serialize_note_search_rows,
+    serialize_note_revision,
+)
+from .sync import (
+    record_change,
+    record_changes,
+    record_contact_tasks,
+    changes_since,
+    collection_version,
+    entity_version,
+)
+from . import events
+from . import sync
+from . import cache
+from . import metrics
+from . import compression
+from . import migrate
+from . import transfer
+from . import projection
+from . import archive
+from . import auth
+from . import ical
+from .duedates import due_tasks, parse_due_date, parse_window
+from .notepatch import PatchError, parse_patch, patch_note, note_revision
+from .search import search_notes, lookup_contacts
+from .summary import board_summary, contact_workload
+from .subtasks import add_sub_task, update_sub_task, remove_sub_task, reorder_sub_tasks
 
 load_dotenv()
 
+BATCH_MAX_OPERATIONS = 500
+
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # -----------------------------
     # CORS — разрешаем Angular
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(
+        app,
+        resources={r"/*": {"origins": "*"}},
+        expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
+    )
 
     # -----------------------------
     # PostgreSQL
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-    db.init_app(app)
+    # пул на процесс: WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    # должно помещаться в max_connections Postgres
+    engine_options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if statement_timeout:
+        engine_options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+
+    # -----------------------------
+    # Server-Sent Events и инвалидация кэшей (cache.py): "postgres" —
+    # LISTEN/NOTIFY между воркерами, "local" — только для одного процесса,
+    # иначе другие воркеры отдают устаревшие контакты до CACHE_TTL
+    app.config["EVENTS_BACKEND"] = os.getenv("EVENTS_BACKEND", "postgres")
+    # отдаёт ли этот процесс /events. В production поток держит отдельный
+    # gevent-процесс (gunicorn_events.conf.py), API на gthread его выключает
+    # (gunicorn.conf.py): подписчик занимал бы поток воркера всё подключение
+    app.config["EVENTS_STREAM"] = os.getenv("EVENTS_STREAM", "true").lower() == "true"
+    app.config["EVENTS_MAX_SUBSCRIBERS"] = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "500"))
+    app.config["EVENTS_QUEUE_SIZE"] = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+    app.config["EVENTS_HEARTBEAT"] = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+
+    # -----------------------------
+    # In-process кэш контактов и карточек user/исполнителей
+    app.config["CACHE_TTL"] = float(os.getenv("CACHE_TTL", "60"))
+    app.config["CACHE_MAX_ENTRIES"] = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+    # лента календаря проверяется по change_log на каждый запрос, TTL — только память
+    app.config["CALENDAR_CACHE_TTL"] = float(os.getenv("CALENDAR_CACHE_TTL", "3600"))
 
-    with app.app_context():
-        print("CREATING TABLES...")
-        db.create_all()
-        print("TABLES CREATED")
+    # -----------------------------
+    # Метрики: Server-Timing, /metrics, лог медленных запросов и N+1
+    app.config["METRICS_SERVER_TIMING"] = os.getenv("METRICS_SERVER_TIMING", "true").lower() == "true"
+    app.config["METRICS_SLOW_REQUEST_MS"] = float(os.getenv("METRICS_SLOW_REQUEST_MS", "500"))
+    app.config["METRICS_N_PLUS_ONE_THRESHOLD"] = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "10"))
+
+    # -----------------------------
+    # Архив: закрытые задачи, не менявшиеся столько дней, уходят из task
+    # (`flask tasks archive`, по cron)
+    app.config["TASK_ARCHIVE_AFTER_DAYS"] = float(os.getenv("TASK_ARCHIVE_AFTER_DAYS", "30"))
+
+    # -----------------------------
+    # Аутентификация: подписанные токены (SECRET_KEY) и пул хэширования паролей.
+    # Без SECRET_KEY стартуем только с FLASK_DEBUG=1 или TESTING=true (см. auth.py)
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    app.config["TESTING"] = os.getenv("TESTING", "false").lower() == "true"
+    app.config["AUTH_TOKEN_TTL"] = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 3600)))
+    app.config["AUTH_KDF_WORKERS"] = int(os.getenv("AUTH_KDF_WORKERS", "2"))
+    app.config["AUTH_KDF_MAX_PENDING"] = int(os.getenv("AUTH_KDF_MAX_PENDING", "4"))
+
+    # -----------------------------
+    # Сжатие ответов (gzip, brotli — если установлен)
+    app.config["COMPRESS_ENABLED"] = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    app.config["COMPRESS_LEVEL"] = int(os.getenv("COMPRESS_LEVEL", "6"))
+    app.config["COMPRESS_BROTLI_QUALITY"] = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+    db.init_app(app)
+    events.init_app(app)
+    sync.init_app(app)
+    cache.init_app(app)
+    auth.init_app(app)
+    metrics.init_app(app)
+    # после metrics: after_request идут в обратном порядке, так метрики
+    # видят уже сжатый размер и учитывают время сжатия
+    compression.init_app(app)
+
+    # схема — только через `flask db upgrade`; при старте в базу не ходим
+    app.cli.add_command(migrate.db_cli)
+    archive.init_app(app)
 
     # -----------------------------
     # Helpers
 
     def _get_user_id():
         """
-        Учебный режим: берем пользователя из заголовка.
-        На фронте ты ставишь X-User-Id после логина.
+        Пользователь из Authorization: Bearer <token> (выдают /auth/login
+        и /auth/register). Проверка без базы, см. auth.py.
         """
-        uid = request.headers.get("X-User-Id")
-        if not uid:
-            return None
-        try:
-            return int(uid)
-        except ValueError:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
             return None
+        return auth.verify_token(token.strip())
+
+    def _kdf_busy():
+        # пул хэширования занят: пусть клиент повторит, а не ждёт в очереди
+        response = jsonify({"message": "Too many login attempts, try again"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
 
-    def _serialize_task(t: Task):
+    def _auth_payload(user):
         return {
-            "id": t.id,
-            "title": t.title,
-            "description": t.description,
-            "done": t.done,
-            "priority": t.priority,
-            "status": t.status,
-            "createdAt": t.created_at.isoformat() if t.created_at else None,
-            "dueDate": t.due_date.isoformat() if t.due_date else None,
-            "subTasks": t.sub_tasks or [],
-            "userId": t.user_id,
-            "user": {
-                "id": t.user.id,
-                "name": t.user.name,
-                "email": t.user.email,
-            } if t.user else None,
-            # many-to-many: список исполнителей
-            "assignedContacts": [
-                {
-                    "id": c.id,
-                    "name": c.name,
-                    "email": c.email,
-                    "avatarColor": c.avatar_color,
-                }
-                for c in (t.assignees or [])
-            ],
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "token": auth.issue_token(user.id),
+            "expiresIn": app.config["AUTH_TOKEN_TTL"],
         }
 
-    def _serialize_contact(c: Contact):
+    # -----------------------------
+    # Правила полей задачи: общие для POST/PUT /tasks и /tasks/batch.
+    # Возвращают (values, None) или (None, "сообщение об ошибке").
+
+    def _task_create_values(data):
+        title = (data.get("title") or "").strip()
+        if not title:
+            return None, "Missing title"
+
+        try:
+            due_date = parse_due_date(data.get("dueDate"))
+        except ValueError:
+            return None, "Invalid dueDate"
+
         return {
-            "id": c.id,
-            "name": c.name,
-            "email": c.email,
-            "phone": c.phone,
-            "company": c.company,
-            "position": c.position,
-            "avatarColor": c.avatar_color,
-            "createdAt": c.created_at.isoformat() if c.created_at else None,
-            "updatedAt": c.updated_at.isoformat() if c.updated_at else None,
-            "userId": c.user_id,
-            "user": {
-                "id": c.user.id,
-                "name": c.user.name,
-                "email": c.user.email,
-            } if c.user else None,
-        }
+            "title": title,
+            "description": (data.get("description") or "").strip(),
+            "done": bool(data.get("done", False)),
+            "priority": data.get("priority", "low"),
+            "status": data.get("status", "todo"),
+            "due_date": due_date,
+            "sub_tasks": data.get("subTasks") or [],
+        }, None
+
+    def _task_update_values(data):
+        values = {}
+
+        if "title" in data:
+            title = (data["title"] or "").strip()
+            if not title:
+                return None, "Title cannot be empty"
+            values["title"] = title
+
+        if "description" in data:
+            values["description"] = (data["description"] or "").strip()
+
+        if "done" in data:
+            values["done"] = bool(data["done"])
+
+        if "priority" in data:
+            values["priority"] = data["priority"] or "low"
+
+        if "status" in data:
+            values["status"] = data["status"] or "todo"
+
+        if "dueDate" in data:
+            try:
+                values["due_date"] = parse_due_date(data.get("dueDate"))
+            except ValueError:
+                return None, "Invalid dueDate"
+
+        if "subTasks" in data:
+            values["sub_tasks"] = data.get("subTasks") or []
+
+        return values, None
+
+    def _contact_create_values(data):
+        name = (data.get("name") or "").strip()
+        email = (data.get("email") or "").strip()
+
+        if not name or not email:
+            return None, "Name and email are required"
 
-    def _serialize_note(n: Note):
         return {
-            "id": n.id,
-            "title": n.title,
-            "content": n.content,
-            "createdAt": n.created_at.replace(tzinfo=timezone.utc).isoformat() if n.created_at else None,
-            "updatedAt": n.updated_at.replace(tzinfo=timezone.utc).isoformat() if n.updated_at else None,
-            "userId": n.user_id,
-            "user": {
-                "id": n.user.id,
-                "name": n.user.name,
-                "email": n.user.email,
-            } if n.user else None,
-        }
+            "name": name,
+            "email": email,
+            "phone": (data.get("phone") or "").strip() or None,
+            "company": (data.get("company") or "").strip() or None,
+            "position": (data.get("position") or "").strip() or None,
+            "avatar_color": data.get("avatarColor") or None,
+        }, None
+
+    def _note_create_values(data):
+        title = (data.get("title") or "").strip()
+        content = (data.get("content") or "").strip()
 
+        # Разрешим пустой title, но не разрешим оба поля пустыми
+        if not title and not content:
+            return None, "Title or content is required"
+
+        return {"title": title, "content": content}, None
 
-    def _parse_due_date(value):
+    def _parse_contact_ids(data):
+        # None — поле не передано, [] — снять всех исполнителей
+        if "assignedContactIds" not in data:
+            return None
+        contact_ids = data.get("assignedContactIds") or []
+        if not isinstance(contact_ids, list):
+            raise ValueError(contact_ids)
+        return [int(cid) for cid in contact_ids]
+
+    def _link_assignees(task_id, contact_ids, user_id):
+        """
+        Связи задача-исполнители одним INSERT ... SELECT: несуществующие
+        и чужие контакты отсекает сам Postgres. Возвращает реально привязанные id.
+        """
+        if not contact_ids:
+            return []
+        return db.session.execute(
+            insert(task_assignee)
+            .from_select(
+                ["task_id", "contact_id"],
+                select(literal(task_id), Contact.id)
+                .where(Contact.id.in_(contact_ids), Contact.user_id == user_id),
+            )
+            .returning(task_assignee.c.contact_id)
+        ).scalars().all()
+
+    def _update_returning(model, where, values, columns):
+        """UPDATE ... RETURNING; без изменений — обычный select. None — строки нет."""
+        if values:
+            stmt = update(model).where(where).values(**values).returning(*columns)
+        else:
+            stmt = select(*columns).where(where)
+        return db.session.execute(stmt).first()
+
+    def _parse_bool(value):
+        if value is None:
+            return None
+        value = value.strip().lower()
+        if value in ("1", "true", "yes"):
+            return True
+        if value in ("0", "false", "no"):
+            return False
+        raise ValueError(value)
+
+    def _parse_list(value):
+        # "todo,in-progress" -> ["todo", "in-progress"]
         if not value:
+            return []
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    def _parse_limit(value, default=None, maximum=200):
+        if value is None or value == "":
+            return default
+        limit = int(value)
+        if limit < 1:
+            raise ValueError(value)
+        return min(limit, maximum)
+
+    def _encode_cursor(created_at, row_id):
+        raw = json.dumps([created_at.isoformat(), row_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _decode_cursor(cursor):
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+
+    # -----------------------------
+    # ETag / If-None-Match: версия из collection_version / change_log, при совпадении — 304
+    # до основного запроса и сериализации
+
+    def _collection_etag(entity, user_id=None):
+        # разные фильтры/страницы — разные представления одной коллекции;
+        # у контактов и заметок ещё и свои у каждого пользователя
+        key = request.query_string
+        if user_id is not None:
+            key += f"|user={user_id}".encode()
+        digest = hashlib.blake2b(key, digest_size=6).hexdigest()
+        return f"{entity}s-{collection_version(entity)}-{digest}"
+
+    def _entity_etag(entity, entity_id):
+        version = entity_version(entity, entity_id)
+        return None if version is None else f"{entity}-{entity_id}-{version}"
+
+    def _not_modified(etag):
+        if etag is None or not request.if_none_match.contains_weak(etag):
             return None
-        try:
-            return datetime.datetime.fromisoformat(value)
-        except ValueError:
-            if value.endswith("Z"):
-                return (
-                    datetime.datetime
-                    .fromisoformat(value.replace("Z", "+00:00"))
-                    .replace(tzinfo=None)
-                )
-            raise
+        return _with_etag(app.response_class(status=304), etag)
+
+    def _with_etag(response, etag):
+        if etag is not None:
+            response.set_etag(etag, weak=True)
+            # кэшировать можно, но каждый раз переспрашивать сервер
+            response.headers["Cache-Control"] = "no-cache"
+            # контакты и заметки у каждого свои: кэш не должен отдать чужой ответ
+            response.vary.add("Authorization")
+        return response
+
+    def _cached_response(response_cache, key, make_etag, build, visible=None):
+        """
+        Отдаём (etag, payload) из кэша без обращения к БД.
+        При промахе считаем etag и payload и кладём в кэш; запись
+        в контакты сбрасывает ключ через события (см. cache.py).
+        visible(payload) — можно ли отдать закэшированное этому пользователю.
+        """
+        cached = response_cache.get(key)
+        if cached is not None:
+            etag, payload = cached
+            if visible is not None and not visible(payload):
+                abort(404)
+            return _not_modified(etag) or _with_etag(jsonify(payload), etag)
+
+        generation = response_cache.generation
+        etag = make_etag()
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        payload = build()
+        if etag is not None:
+            response_cache.set(key, (etag, payload), generation)
+        return _with_etag(jsonify(payload), etag)
 
     # -----------------------------
     # HEALTH CHECK (для CI / Docker)
@@ -129,6 +394,36 @@ def create_app():
     def health():
         return jsonify({"status": "ok"}), 200
 
+    # -----------------------------
+    # METRICS: Prometheus text format (счётчики этого воркера)
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        cache_stats = cache.stats()
+        gauges = (
+            ("app_cache_entries", "Entries in in-process cache",
+             [({"cache": name}, s["size"]) for name, s in cache_stats.items()]),
+            ("app_cache_hits", "Cache hits since start",
+             [({"cache": name}, s["hits"]) for name, s in cache_stats.items()]),
+            ("app_cache_misses", "Cache misses since start",
+             [({"cache": name}, s["misses"]) for name, s in cache_stats.items()]),
+            ("app_sse_subscribers", "Open /events streams",
+             [({}, events.broadcaster.subscriber_count)]),
+            ("app_auth_kdf_in_flight", "Password hashes running or queued",
+             [({}, auth.kdf_pool.in_flight)]),
+            ("app_auth_kdf_rejected", "Logins rejected with 503, pool full",
+             [({}, auth.kdf_pool.rejected)]),
+        )
+        return Response(
+            metrics.registry.render(gauges),
+            mimetype="text/plain; version=0.0.4",
+        )
+
+    # -----------------------------
+    # CACHE: статистика hit/miss in-process кэшей этого воркера
+    @app.route("/cache/stats", methods=["GET"])
+    def cache_stats():
+        return jsonify(cache.stats()), 200
+
     # -----------------------------
     # AUTH: REGISTER
     @app.route("/auth/register", methods=["POST"])
@@ -142,23 +437,28 @@ def create_app():
         if not name or not email or not password:
             return jsonify({"message": "Missing fields"}), 400
 
-        if User.query.filter_by(email=email).first():
+        try:
+            password_hash = auth.hash_password(password)
+        except auth.KdfBusy:
+            return _kdf_busy()
+
+        # проверка занятости и вставка — один запрос по уникальному индексу email
+        user = db.session.execute(
+            pg_insert(User)
+            .values(
+                name=name,
+                email=email,
+                password_hash=password_hash,
+            )
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id, User.name, User.email)
+        ).first()
+        if user is None:
+            db.session.rollback()
             return jsonify({"message": "Email already exists"}), 409
-
-        user = User(
-            name=name,
-            email=email,
-            password_hash=generate_password_hash(password),
-        )
-
-        db.session.add(user)
         db.session.commit()
 
-        return jsonify({
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-        }), 201
+        return jsonify(_auth_payload(user)), 201
 
     # -----------------------------
     # AUTH: LOGIN
@@ -172,63 +472,227 @@ def create_app():
         if not email or not password:
             return jsonify({"message": "Missing fields"}), 400
 
-        user = User.query.filter_by(email=email).first()
-        if not user or not check_password_hash(user.password_hash, password):
-            return jsonify({"message": "Invalid credentials"}), 401
+        user = db.session.execute(
+            select(User.id, User.name, User.email, User.password_hash).where(User.email == email)
+        ).first()
+        # соединение не держим, пока считается хэш
+        db.session.rollback()
+        try:
+            if not user or not auth.check_password(user.password_hash, password):
+                return jsonify({"message": "Invalid credentials"}), 401
+        except auth.KdfBusy:
+            return _kdf_busy()
 
-        return jsonify({
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-        }), 200
+        return jsonify(_auth_payload(user)), 200
 
     # -----------------------------
-    # TASKS: GET — все задачи (пока общая доска)
+    # TASKS: GET — задачи (пока общая доска)
+    # Фильтры: ?status=todo,in-progress &priority= &done=true|false
+    #          &assigneeId= &dueFrom= &dueTo=
+    # Пагинация (keyset по created_at, id): ?limit=50&cursor=<X-Next-Cursor>
+    # Без limit отдаём весь список, как раньше.
+    # Представление: ?fields=id,title,status &shape=normalized (см. projection.py)
     @app.route("/tasks", methods=["GET"])
     def get_tasks():
-        tasks = Task.query.order_by(Task.created_at.desc()).all()
-        return jsonify([_serialize_task(t) for t in tasks]), 200
+        etag = _collection_etag("task")
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        args = request.args
+        try:
+            view = projection.parse_view("task", args)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        # created_at и id нужны для сортировки и курсора при любом ?fields
+        query = task_select() if view.default else view.select(Task.created_at, Task.id)
+        serialize = serialize_task_rows if view.default else view.serialize
+
+        try:
+            statuses = _parse_list(args.get("status"))
+            priorities = _parse_list(args.get("priority"))
+            done = _parse_bool(args.get("done"))
+            assignee_id = int(args["assigneeId"]) if args.get("assigneeId") else None
+            due_from = parse_due_date(args.get("dueFrom"))
+            due_to = parse_due_date(args.get("dueTo"))
+            limit = _parse_limit(args.get("limit"))
+            cursor = _decode_cursor(args["cursor"]) if args.get("cursor") else None
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        if statuses:
+            query = query.where(Task.status.in_(statuses))
+        if priorities:
+            query = query.where(Task.priority.in_(priorities))
+        if done is not None:
+            # NOT done, а не IS false: так подходит ix_task_open_created_at_id
+            query = query.where(Task.done if done else ~Task.done)
+        if assignee_id is not None:
+            query = query.where(
+                select(task_assignee.c.task_id)
+                .where(
+                    task_assignee.c.task_id == Task.id,
+                    task_assignee.c.contact_id == assignee_id,
+                )
+                .exists()
+            )
+        if due_from is not None:
+            query = query.where(Task.due_date >= due_from)
+        if due_to is not None:
+            query = query.where(Task.due_date < due_to)
+        if cursor is not None:
+            query = query.where(tuple_(Task.created_at, Task.id) < cursor)
+
+        query = query.order_by(Task.created_at.desc(), Task.id.desc())
+
+        if limit is None:
+            rows = db.session.execute(query).all()
+            return _with_etag(jsonify(serialize(rows)), etag), 200
+
+        # берём на одну строку больше, чтобы понять, есть ли следующая страница
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        response = jsonify(serialize(rows))
+        if has_more:
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+        return _with_etag(response, etag), 200
+
+    # -----------------------------
+    # TASKS: GET — сводка по доске: счётчики без строк задач
+    # ?dueSoonDays=3 — окно для dueSoon (открытые задачи со сроком в ближайшие N дней)
+    @app.route("/tasks/summary", methods=["GET"])
+    def tasks_summary():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            due_soon_days = _parse_limit(request.args.get("dueSoonDays"), default=3, maximum=90)
+        except ValueError:
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        # overdue/dueSoon зависят от времени: в etag и версия задач, и текущая минута;
+        # byAssignee — свои контакты: пользователь и версия контактов
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        etag = (
+            f"{_collection_etag('task', user_id)}-{collection_version('contact')}"
+            f"-{now:%Y%m%d%H%M}"
+        )
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        payload = cache.summary_cache.get(etag)
+        if payload is None:
+            payload = board_summary(now, due_soon_days, user_id)
+            cache.summary_cache.set(etag, payload)
+        return _with_etag(jsonify(payload), etag), 200
+
+    # -----------------------------
+    # TASKS: GET — сроки открытых задач: просроченные и в ближайшие ?window=
+    # (7d по умолчанию, 48h, 2w; не больше 365d), по limit в каждом списке.
+    # Свои задачи или ?assigneeId= — задачи своего контакта.
+    @app.route("/tasks/due", methods=["GET"])
+    def get_due_tasks():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        args = request.args
+        try:
+            window = parse_window(args.get("window"))
+            assignee_id = int(args["assigneeId"]) if args.get("assigneeId") else None
+            limit = _parse_limit(args.get("limit"), default=50)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        # граница "просрочено" сдвигается со временем: в etag и текущая минута
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        etag = f"{_collection_etag('task', user_id)}-{now:%Y%m%d%H%M}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        if assignee_id is not None:
+            owned = db.session.execute(
+                select(Contact.id).where(Contact.id == assignee_id, Contact.user_id == user_id)
+            ).first()
+            if owned is None:
+                return jsonify({"message": "Contact not found"}), 404
+            overdue, upcoming = due_tasks(now, window, limit, contact_id=assignee_id)
+        else:
+            overdue, upcoming = due_tasks(now, window, limit, user_id=user_id)
+
+        return _with_etag(jsonify({
+            "overdue": serialize_task_rows(overdue),
+            "upcoming": serialize_task_rows(upcoming),
+            "asOf": now.replace(tzinfo=datetime.timezone.utc).isoformat(),
+            "until": (now + window).replace(tzinfo=datetime.timezone.utc).isoformat(),
+        }), etag), 200
+
+    # -----------------------------
+    # TASKS: GET — ссылка на iCalendar-ленту своих сроков (нужен токен).
+    # Календари не шлют Authorization: токен ленты в самой ссылке.
+    @app.route("/tasks/calendar", methods=["GET"])
+    def get_calendar_link():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        token = auth.issue_feed_token(user_id)
+        return jsonify({
+            "url": url_for("get_calendar_feed", token=token, _external=True),
+            "token": token,
+        }), 200
+
+    # -----------------------------
+    # TASKS: GET — сама лента text/calendar (см. ical.py)
+    @app.route("/tasks/calendar.ics", methods=["GET"])
+    def get_calendar_feed():
+        user_id = auth.verify_feed_token(request.args.get("token", ""))
+        if not user_id:
+            return jsonify({"message": "Missing or invalid feed token"}), 401
+
+        body, etag = ical.calendar_feed(user_id)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+        return _with_etag(app.response_class(body, mimetype="text/calendar"), etag), 200
 
     # -----------------------------
-    # TASKS: POST — создать задачу (нужен X-User-Id)
+    # TASKS: POST — создать задачу (нужен токен)
     @app.route("/tasks", methods=["POST"])
     def add_task():
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
         data = request.get_json() or {}
 
-        title = (data.get("title") or "").strip()
-        if not title:
-            return jsonify({"message": "Missing title"}), 400
-
-        task = Task(
-            user_id=user_id,
-            title=title,
-            description=(data.get("description") or "").strip(),
-            done=bool(data.get("done", False)),
-            priority=data.get("priority", "low"),
-            status=data.get("status", "todo"),
-            due_date=_parse_due_date(data.get("dueDate")),
-            sub_tasks=data.get("subTasks") or [],
-        )
+        values, error = _task_create_values(data)
+        if error:
+            return jsonify({"message": error}), 400
+        try:
+            contact_ids = _parse_contact_ids(data) or []
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid assignedContactIds"}), 400
 
-        db.session.add(task)
-        db.session.flush()  # чтобы получить task.id до коммита
+        # ответ строим из RETURNING — без повторного чтения после commit
+        row = db.session.execute(
+            insert(Task).values(user_id=user_id, **values).returning(*TASK_RETURNING)
+        ).one()
 
-        # many-to-many: привязка исполнителей (без фильтра по user_id)
-        contact_ids = data.get("assignedContactIds") or []
-        if isinstance(contact_ids, list) and contact_ids:
-            contacts = Contact.query.filter(
-                Contact.id.in_(contact_ids)
-            ).all()
-            task.assignees = contacts
+        # many-to-many: исполнителями могут быть только свои контакты
+        linked = _link_assignees(row.id, contact_ids, user_id)
 
+        record_change("task", row.id)
         db.session.commit()
 
-        task = Task.query.get(task.id)
-        return jsonify(_serialize_task(task)), 201
+        return jsonify(serialize_task_row(row, linked)), 201
 
     # -----------------------------
     # TASKS: PUT — обновить задачу
@@ -236,111 +700,582 @@ def create_app():
     def update_task(task_id):
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
         data = request.get_json() or {}
-        task = Task.query.get_or_404(task_id)
+
+        values, error = _task_update_values(data)
+        if error:
+            return jsonify({"message": error}), 400
+        try:
+            contact_ids = _parse_contact_ids(data)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid assignedContactIds"}), 400
+
+        row = _update_returning(Task, Task.id == task_id, values, TASK_RETURNING)
+        if row is None:
+            return jsonify({"message": "Task not found"}), 404
+
+        # обновление исполнителей: только из своих контактов
+        linked = None
+        if contact_ids is not None:
+            db.session.execute(
+                delete(task_assignee).where(task_assignee.c.task_id == task_id)
+            )
+            linked = _link_assignees(task_id, contact_ids, user_id)
+
+        record_change("task", task_id)
+        db.session.commit()
+
+        return jsonify(serialize_task_row(row, linked)), 200
+
+    # -----------------------------
+    # TASKS: DELETE — удалить задачу
+    @app.route("/tasks/<int:task_id>", methods=["DELETE"])
+    def delete_task(task_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        # связи task_assignee удалит ON DELETE CASCADE
+        deleted = db.session.execute(
+            delete(Task).where(Task.id == task_id).returning(Task.id)
+        ).first()
+        if deleted is None:
+            return jsonify({"message": "Task not found"}), 404
+        record_change("task", task_id, "delete")
+        db.session.commit()
+
+        return jsonify({"message": "Task deleted"}), 200
+
+    # -----------------------------
+    # TASKS: POST — пакет изменений за один запрос и одну транзакцию
+    # {"operations": [
+    #     {"op": "create", "data": {...как в POST /tasks}},
+    #     {"op": "update", "id": 1, "data": {...как в PUT /tasks/<id>}},
+    #     {"op": "delete", "id": 2}
+    # ]}
+    # Ответ: {"results": [{"index": 0, "status": 201, "task": {...}}, ...]}
+    @app.route("/tasks/batch", methods=["POST"])
+    def batch_tasks():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        operations = (request.get_json() or {}).get("operations")
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"message": "Missing operations"}), 400
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            return jsonify({"message": "Too many operations"}), 400
+
+        results = [None] * len(operations)
+        creates = []   # [(index, values, contact_ids)]
+        updates = {}   # task_id -> {"indexes", "values", "contact_ids"}
+        deletes = {}   # task_id -> [index]
+
+        # 1) валидация — без обращений к БД
+        for index, item in enumerate(operations):
+            if not isinstance(item, dict):
+                results[index] = {"index": index, "status": 400, "message": "Invalid operation"}
+                continue
+
+            op = item.get("op")
+            data = item.get("data") or {}
+            try:
+                task_id = int(item["id"]) if op in ("update", "delete") else None
+                contact_ids = _parse_contact_ids(data)
+            except (KeyError, ValueError, TypeError):
+                results[index] = {"index": index, "status": 400, "message": "Invalid id"}
+                continue
+
+            if op == "create":
+                values, error = _task_create_values(data)
+            elif op == "update":
+                values, error = _task_update_values(data)
+            elif op == "delete":
+                values, error = None, None
+            else:
+                values, error = None, "Unknown op"
+
+            if error:
+                results[index] = {"index": index, "status": 400, "message": error}
+            elif op == "create":
+                creates.append((index, values, contact_ids))
+            elif op == "update":
+                entry = updates.setdefault(
+                    task_id, {"indexes": [], "values": {}, "contact_ids": None}
+                )
+                entry["indexes"].append(index)
+                entry["values"].update(values)
+                if contact_ids is not None:
+                    entry["contact_ids"] = contact_ids
+            else:
+                deletes.setdefault(task_id, []).append(index)
+
+        # 2) какие задачи существуют и какие контакты можно назначить — 2 запроса
+        known_ids = set(updates) | set(deletes)
+        existing = set()
+        if known_ids:
+            existing = set(db.session.execute(
+                select(Task.id).where(Task.id.in_(known_ids))
+            ).scalars())
+
+        for task_id in known_ids - existing:
+            for index in updates.pop(task_id, {"indexes": []})["indexes"] + deletes.pop(task_id, []):
+                results[index] = {"index": index, "status": 404, "message": "Task not found"}
+
+        # задача и обновляется, и удаляется в одном пакете — побеждает удаление
+        for task_id in set(updates) & set(deletes):
+            for index in updates.pop(task_id)["indexes"]:
+                results[index] = {"index": index, "status": 409, "message": "Task is deleted in this batch"}
+
+        wanted_contacts = {
+            cid
+            for _, _, contact_ids in creates
+            for cid in (contact_ids or [])
+        } | {
+            cid
+            for entry in updates.values()
+            for cid in (entry["contact_ids"] or [])
+        }
+        valid_contacts = set()
+        if wanted_contacts:
+            valid_contacts = set(db.session.execute(
+                select(Contact.id).where(Contact.id.in_(wanted_contacts), Contact.user_id == user_id)
+            ).scalars())
+
+        # 3) пакетные INSERT / UPDATE / DELETE в одной транзакции
+        try:
+            created_ids = []
+            if creates:
+                created_ids = db.session.execute(
+                    insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                    [dict(values, user_id=user_id) for _, values, _ in creates],
+                ).scalars().all()
+
+            update_rows = [
+                dict(entry["values"], id=task_id)
+                for task_id, entry in updates.items()
+                if entry["values"]
+            ]
+            if update_rows:
+                db.session.execute(update(Task), update_rows)
+
+            # исполнители: старые связи убираем, новые вставляем одним INSERT
+            relinked = [
+                task_id for task_id, entry in updates.items()
+                if entry["contact_ids"] is not None
+            ]
+            if relinked:
+                db.session.execute(
+                    delete(task_assignee).where(task_assignee.c.task_id.in_(relinked))
+                )
+
+            links = {
+                (task_id, cid)
+                for task_id, (_, _, contact_ids) in zip(created_ids, creates)
+                for cid in (contact_ids or [])
+                if cid in valid_contacts
+            } | {
+                (task_id, cid)
+                for task_id in relinked
+                for cid in updates[task_id]["contact_ids"]
+                if cid in valid_contacts
+            }
+            if links:
+                db.session.execute(
+                    insert(task_assignee),
+                    [{"task_id": task_id, "contact_id": cid} for task_id, cid in links],
+                )
+
+            if deletes:
+                db.session.execute(
+                    delete(Task).where(Task.id.in_(deletes)),
+                    execution_options={"synchronize_session": False},
+                )
+
+            record_changes("task", list(created_ids) + list(updates))
+            record_changes("task", deletes, "delete")
+            db.session.commit()
+        except (DataError, IntegrityError):
+            db.session.rollback()
+            return jsonify({"message": "Batch rejected, nothing was applied"}), 400
+
+        # 4) ответ: все изменённые задачи одним select + исполнители
+        changed_ids = list(created_ids) + list(updates)
+        serialized = {}
+        if changed_ids:
+            rows = db.session.execute(task_select().where(Task.id.in_(changed_ids))).all()
+            serialized = {t["id"]: t for t in serialize_task_rows(rows)}
+
+        for task_id, (index, _, _) in zip(created_ids, creates):
+            results[index] = {"index": index, "status": 201, "task": serialized.get(task_id)}
+        for task_id, entry in updates.items():
+            for index in entry["indexes"]:
+                results[index] = {"index": index, "status": 200, "task": serialized.get(task_id)}
+        for task_id, indexes in deletes.items():
+            for index in indexes:
+                results[index] = {"index": index, "status": 200, "id": task_id}
+
+        return jsonify({"results": results}), 200
+
+    # -----------------------------
+    # SUBTASKS: точечные изменения одной подзадачи вместо PUT всего subTasks
+    # Ответ: {"subTask": {...}, "subTasksTotal": n, "subTasksDone": m}
+
+    def _sub_task_response(task_id, result, status=200):
+        if result is None:
+            db.session.rollback()
+            if db.session.get(Task, task_id) is None:
+                return jsonify({"message": "Task not found"}), 404
+            return jsonify({"message": "Sub-task not found"}), 404
+
+        record_change("task", task_id)
+        db.session.commit()
+        return jsonify(result), status
+
+    # SUBTASKS: POST — добавить подзадачу {"title": "...", "done": false}
+    @app.route("/tasks/<int:task_id>/subtasks", methods=["POST"])
+    def add_subtask(task_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        data = request.get_json() or {}
+        title = (data.get("title") or "").strip()
+        if not title:
+            return jsonify({"message": "Missing title"}), 400
+
+        result = add_sub_task(task_id, title, bool(data.get("done", False)))
+        return _sub_task_response(task_id, result, 201)
+
+    # SUBTASKS: PATCH — переключить / переименовать {"done": true} / {"title": "..."}
+    @app.route("/tasks/<int:task_id>/subtasks/<int:sub_id>", methods=["PATCH"])
+    def update_subtask(task_id, sub_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        data = request.get_json() or {}
+        changes = {}
 
         if "title" in data:
-            title = (data["title"] or "").strip()
+            title = (data.get("title") or "").strip()
             if not title:
                 return jsonify({"message": "Title cannot be empty"}), 400
-            task.title = title
-
-        if "description" in data:
-            task.description = (data["description"] or "").strip()
+            changes["title"] = title
 
         if "done" in data:
-            task.done = bool(data["done"])
+            changes["done"] = bool(data["done"])
 
-        if "priority" in data:
-            task.priority = data["priority"] or "low"
+        if not changes:
+            return jsonify({"message": "Nothing to update"}), 400
 
-        if "status" in data:
-            task.status = data["status"] or "todo"
+        result = update_sub_task(task_id, sub_id, changes)
+        return _sub_task_response(task_id, result)
 
-        if "dueDate" in data:
-            task.due_date = _parse_due_date(data.get("dueDate"))
+    # SUBTASKS: DELETE — удалить подзадачу
+    @app.route("/tasks/<int:task_id>/subtasks/<int:sub_id>", methods=["DELETE"])
+    def delete_subtask(task_id, sub_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
-        if "subTasks" in data:
-            task.sub_tasks = data.get("subTasks") or []
-
-        # обновление исполнителей (без фильтра по user_id)
-        if "assignedContactIds" in data:
-            contact_ids = data.get("assignedContactIds") or []
-            if contact_ids:
-                contacts = Contact.query.filter(
-                    Contact.id.in_(contact_ids)
-                ).all()
-                task.assignees = contacts
-            else:
-                task.assignees = []
+        result = remove_sub_task(task_id, sub_id)
+        return _sub_task_response(task_id, result)
 
-        db.session.commit()
+    # SUBTASKS: PUT — новый порядок {"ids": [3, 1, 2]}, ответ содержит весь subTasks
+    @app.route("/tasks/<int:task_id>/subtasks/order", methods=["PUT"])
+    def reorder_subtasks(task_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        ids = (request.get_json() or {}).get("ids")
+        if not isinstance(ids, list):
+            return jsonify({"message": "Invalid ids"}), 400
+        try:
+            ids = [int(sub_id) for sub_id in ids]
+        except (TypeError, ValueError):
+            return jsonify({"message": "Invalid ids"}), 400
 
-        task = Task.query.get(task.id)
-        return jsonify(_serialize_task(task)), 200
+        result = reorder_sub_tasks(task_id, ids)
+        return _sub_task_response(task_id, result)
 
     # -----------------------------
-    # TASKS: DELETE — удалить задачу
-    @app.route("/tasks/<int:task_id>", methods=["DELETE"])
-    def delete_task(task_id):
+    # TASKS: GET — архив закрытых задач (см. archive.py), доска его не читает
+    # Всегда постранично: ?limit=50&cursor=<X-Next-Cursor>, новые сверху
+    @app.route("/tasks/archive", methods=["GET"])
+    def get_archived_tasks():
+        # архив меняется только вместе с журналом задач
+        etag = f"archive-{_collection_etag('task')}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        try:
+            limit = _parse_limit(request.args.get("limit"), default=50)
+            cursor = _decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        query = archived_task_select()
+        if cursor is not None:
+            query = query.where(tuple_(TaskArchive.created_at, TaskArchive.id) < cursor)
+        rows = db.session.execute(
+            query.order_by(TaskArchive.created_at.desc(), TaskArchive.id.desc()).limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        response = jsonify(serialize_archived_task_rows(rows))
+        if has_more:
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+        return _with_etag(response, etag), 200
+
+    # -----------------------------
+    # TASKS: POST — вернуть задачи из архива на доску {"ids": [1, 2]}
+    # Задачи возвращаются под теми же id, с исполнителями
+    @app.route("/tasks/archive/restore", methods=["POST"])
+    def restore_archived_tasks():
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
-        task = Task.query.get_or_404(task_id)
-        db.session.delete(task)
+        ids = (request.get_json() or {}).get("ids")
+        try:
+            if not isinstance(ids, list) or not ids:
+                raise ValueError(ids)
+            ids = sorted({int(task_id) for task_id in ids})
+        except (ValueError, TypeError):
+            return jsonify({"message": "Missing or invalid ids"}), 400
+        if len(ids) > BATCH_MAX_OPERATIONS:
+            return jsonify({"message": "Too many ids"}), 400
+
+        restored = archive.restore_tasks(ids)
         db.session.commit()
 
-        return jsonify({"message": "Task deleted"}), 200
+        return jsonify({
+            "restored": restored,
+            "notFound": sorted(set(ids) - set(restored)),
+        }), 200
 
     # -----------------------------
-    # CONTACTS: GET — список контактов
+    # CONTACTS: GET — список контактов пользователя (?fields= &shape= как у /tasks)
     @app.route("/contacts", methods=["GET"])
     def get_contacts():
-        # пока без фильтра по пользователю, общая адресная книга
-        contacts = Contact.query.order_by(Contact.name.asc()).all()
-        return jsonify([_serialize_contact(c) for c in contacts]), 200
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            view = projection.parse_view("contact", request.args)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        def build():
+            # индекс ix_contact_user_id_name: и фильтр, и порядок
+            if view.default:
+                rows = db.session.execute(
+                    contact_select()
+                    .where(Contact.user_id == user_id)
+                    .order_by(Contact.name.asc())
+                ).all()
+                return serialize_contact_rows(rows)
+
+            rows = db.session.execute(
+                view.select(Contact.name)
+                .where(Contact.user_id == user_id)
+                .order_by(Contact.name.asc())
+            ).all()
+            return view.serialize(rows)
+
+        return _cached_response(
+            cache.contact_list_cache,
+            (user_id, request.path, request.query_string),
+            lambda: _collection_etag("contact", user_id),
+            build,
+        )
 
     # -----------------------------
-    # CONTACTS: GET — один контакт по id
+    # CONTACTS: GET — typeahead для выбора исполнителей ?q=an&limit=10
+    # Лёгкая проекция: id, name, email, avatarColor
+    @app.route("/contacts/lookup", methods=["GET"])
+    def lookup_contacts_route():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        q = (request.args.get("q") or "").strip()
+        try:
+            limit = _parse_limit(request.args.get("limit"), default=10, maximum=50)
+        except ValueError:
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        if not q:
+            return jsonify([]), 200
+
+        def build():
+            return [
+                {
+                    "id": r.id,
+                    "name": r.name,
+                    "email": r.email,
+                    "avatarColor": r.avatar_color,
+                }
+                for r in lookup_contacts(q, limit, user_id)
+            ]
+
+        return _cached_response(
+            cache.contact_list_cache,
+            (user_id, request.path, request.query_string),
+            lambda: _collection_etag("contact", user_id),
+            build,
+        )
+
+    # -----------------------------
+    # CONTACTS: GET — один контакт по id (чужой — 404)
     @app.route("/contacts/<int:contact_id>", methods=["GET"])
     def get_contact(contact_id):
-        contact = Contact.query.get_or_404(contact_id)
-        return jsonify(_serialize_contact(contact)), 200
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        def build():
+            contact = db.first_or_404(
+                select(Contact)
+                .where(Contact.id == contact_id, Contact.user_id == user_id)
+            )
+            return _serialize_contact(contact)
+
+        def make_etag():
+            # владельца — до 304: чужой If-None-Match не должен подтверждать,
+            # что контакт существует (без etag build ответит 404)
+            owned = db.session.execute(
+                select(Contact.id).where(Contact.id == contact_id, Contact.user_id == user_id)
+            ).first()
+            return _entity_etag("contact", contact_id) if owned else None
+
+        # кэш общий по id: владельца проверяем по закэшированному ответу
+        return _cached_response(
+            cache.contact_cache,
+            contact_id,
+            make_etag,
+            build,
+            visible=lambda payload: payload["userId"] == user_id,
+        )
+
+    # -----------------------------
+    # CONTACTS: GET — задачи исполнителя и его нагрузка
+    # ?limit=50&cursor=<X-Next-Cursor>&done=false
+    # {"contactId", "total", "open", "overdue", "tasks": [...]} — счётчики по всем
+    # задачам контакта, tasks — страница, новые сверху
+    @app.route("/contacts/<int:contact_id>/tasks", methods=["GET"])
+    def get_contact_tasks(contact_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            done = _parse_bool(request.args.get("done"))
+            limit = _parse_limit(request.args.get("limit"), default=50)
+            cursor = _decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        # overdue зависит от времени: в etag и версия задач, и текущая минута
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        etag = f"{_collection_etag('task', user_id)}-{contact_id}-{now:%Y%m%d%H%M}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        # чужой или несуществующий контакт — пустой результат, то есть 404
+        counts = contact_workload(
+            (Contact.id == contact_id) & (Contact.user_id == user_id), now
+        ).get(contact_id)
+        if counts is None:
+            return jsonify({"message": "Contact not found"}), 404
+
+        query = task_select().where(
+            Task.id.in_(
+                select(task_assignee.c.task_id).where(task_assignee.c.contact_id == contact_id)
+            )
+        )
+        if done is not None:
+            query = query.where(Task.done if done else ~Task.done)
+        if cursor is not None:
+            query = query.where(tuple_(Task.created_at, Task.id) < cursor)
+
+        rows = db.session.execute(
+            query.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        response = jsonify({
+            "contactId": contact_id,
+            **counts,
+            "tasks": serialize_task_rows(rows),
+        })
+        if has_more:
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+        return _with_etag(response, etag), 200
+
+    # -----------------------------
+    # CONTACTS: GET — нагрузка всех своих контактов одним запросом
+    # ?ids=1,2,3 — только эти. [{"contactId", "total", "open", "overdue"}]
+    @app.route("/contacts/workload", methods=["GET"])
+    def get_contacts_workload():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            ids = [int(v) for v in _parse_list(request.args.get("ids"))]
+        except ValueError:
+            return jsonify({"message": "Invalid query parameters"}), 400
+        if len(ids) > BATCH_MAX_OPERATIONS:
+            return jsonify({"message": "Too many ids"}), 400
+
+        now = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        etag = f"{_collection_etag('task', user_id)}-{collection_version('contact')}-{now:%Y%m%d%H%M}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        contact_filter = Contact.user_id == user_id
+        if ids:
+            contact_filter &= Contact.id.in_(ids)
+        workload = contact_workload(contact_filter, now)
+
+        return _with_etag(jsonify([
+            {"contactId": contact_id, **counts}
+            for contact_id, counts in workload.items()
+        ]), etag), 200
 
     # -----------------------------
-    # CONTACTS: POST — создать контакт (нужен X-User-Id)
+    # CONTACTS: POST — создать контакт (нужен токен)
     @app.route("/contacts", methods=["POST"])
     def create_contact():
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
-        data = request.get_json() or {}
+        values, error = _contact_create_values(request.get_json() or {})
+        if error:
+            return jsonify({"message": error}), 400
 
-        name = (data.get("name") or "").strip()
-        email = (data.get("email") or "").strip()
+        row = db.session.execute(
+            insert(Contact).values(user_id=user_id, **values).returning(*CONTACT_COLUMNS)
+        ).one()
 
-        if not name or not email:
-            return jsonify({"message": "Name and email are required"}), 400
-
-        contact = Contact(
-            user_id=user_id,
-            name=name,
-            email=email,
-            phone=(data.get("phone") or "").strip() or None,
-            company=(data.get("company") or "").strip() or None,
-            position=(data.get("position") or "").strip() or None,
-            avatar_color=data.get("avatarColor") or None,
-        )
-
-        db.session.add(contact)
+        record_change("contact", row.id, user_id=user_id)
         db.session.commit()
 
-        contact = Contact.query.get(contact.id)
-        return jsonify(_serialize_contact(contact)), 201
+        return jsonify(serialize_contact_row(row)), 201
 
     # -----------------------------
     # CONTACTS: PUT — обновить контакт
@@ -348,39 +1283,47 @@ def create_app():
     def update_contact(contact_id):
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
-        contact = Contact.query.get_or_404(contact_id)
         data = request.get_json() or {}
+        values = {}
 
         if "name" in data:
             new_name = (data.get("name") or "").strip()
             if not new_name:
                 return jsonify({"message": "Name cannot be empty"}), 400
-            contact.name = new_name
+            values["name"] = new_name
 
         if "email" in data:
             new_email = (data.get("email") or "").strip()
             if not new_email:
                 return jsonify({"message": "Email cannot be empty"}), 400
-            contact.email = new_email
+            values["email"] = new_email
 
         if "phone" in data:
-            contact.phone = (data.get("phone") or "").strip() or None
+            values["phone"] = (data.get("phone") or "").strip() or None
 
         if "company" in data:
-            contact.company = (data.get("company") or "").strip() or None
+            values["company"] = (data.get("company") or "").strip() or None
 
         if "position" in data:
-            contact.position = (data.get("position") or "").strip() or None
+            values["position"] = (data.get("position") or "").strip() or None
 
         if "avatarColor" in data:
-            contact.avatar_color = data.get("avatarColor") or None
+            values["avatar_color"] = data.get("avatarColor") or None
+
+        # чужой контакт — тоже 404: владельца проверяет сам UPDATE
+        row = _update_returning(
+            Contact, (Contact.id == contact_id) & (Contact.user_id == user_id), values, CONTACT_COLUMNS
+        )
+        if row is None:
+            return jsonify({"message": "Contact not found"}), 404
 
+        record_change("contact", contact_id, user_id=user_id)
+        record_contact_tasks(contact_id)
         db.session.commit()
 
-        contact = Contact.query.get(contact.id)
-        return jsonify(_serialize_contact(contact)), 200
+        return jsonify(serialize_contact_row(row)), 200
 
     # -----------------------------
     # CONTACTS: DELETE — удалить контакт
@@ -388,80 +1331,223 @@ def create_app():
     def delete_contact(contact_id):
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
-
-        contact = Contact.query.get_or_404(contact_id)
-        db.session.delete(contact)
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        # до удаления: каскад уберёт связи task_assignee
+        record_contact_tasks(contact_id)
+        deleted = db.session.execute(
+            delete(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user_id)
+            .returning(Contact.id)
+        ).first()
+        if deleted is None:
+            db.session.rollback()
+            return jsonify({"message": "Contact not found"}), 404
+        record_change("contact", contact_id, "delete", user_id=user_id)
         db.session.commit()
 
         return jsonify({"message": "Contact deleted"}), 200
 
 
     # -----------------------------
-    # NOTES: GET — список заметок текущего пользователя
+    # NOTES: GET — список заметок текущего пользователя (?fields= &shape= как у /tasks)
     @app.route("/notes", methods=["GET"])
     def get_notes():
-       
-        notes = (
-            Note.query
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            view = projection.parse_view("note", request.args)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        etag = _collection_etag("note", user_id)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        # индекс ix_note_user_id_updated_at: и фильтр, и порядок
+        if view.default:
+            rows = db.session.execute(
+                note_select()
+                .where(Note.user_id == user_id)
+                .order_by(Note.updated_at.desc())
+            ).all()
+            return _with_etag(jsonify(serialize_note_rows(rows)), etag), 200
+
+        rows = db.session.execute(
+            view.select(Note.updated_at)
+            .where(Note.user_id == user_id)
             .order_by(Note.updated_at.desc())
-            .all()
-        )
-        return jsonify([_serialize_note(n) for n in notes]), 200
+        ).all()
+        return _with_etag(jsonify(view.serialize(rows)), etag), 200
 
     # -----------------------------
-    # NOTES: POST — создать заметку (нужен X-User-Id)
+    # NOTES: GET — полнотекстовый поиск по своим заметкам ?q=...&limit=20&offset=0
+    # Результаты по рангу, с подсветкой <mark>...</mark> в titleHighlight/snippet
+    @app.route("/notes/search", methods=["GET"])
+    def search_notes_route():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        q = (request.args.get("q") or "").strip()
+        if not q:
+            return jsonify({"message": "Missing q"}), 400
+
+        try:
+            limit = _parse_limit(request.args.get("limit"), default=20, maximum=100)
+            offset = int(request.args.get("offset") or 0)
+            if offset < 0:
+                raise ValueError(offset)
+        except ValueError:
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        rows, has_more = search_notes(q, limit, offset, user_id)
+        return jsonify({
+            "results": serialize_note_search_rows(rows),
+            "hasMore": has_more,
+        }), 200
+
+    # -----------------------------
+    # NOTES: POST — создать заметку (нужен токен)
     @app.route("/notes", methods=["POST"])
     def create_note():
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
-        data = request.get_json() or {}
+        values, error = _note_create_values(request.get_json() or {})
+        if error:
+            return jsonify({"message": error}), 400
 
-        title = (data.get("title") or "").strip()
-        content = (data.get("content") or "").strip()
+        row = db.session.execute(
+            insert(Note).values(user_id=user_id, **values).returning(*NOTE_COLUMNS)
+        ).one()
 
-        # Разрешим пустой title, но не разрешим оба поля пустыми
-        if not title and not content:
-            return jsonify({"message": "Title or content is required"}), 400
+        record_change("note", row.id, user_id=user_id)
+        db.session.commit()
 
-        note = Note(
-            user_id=user_id,
-            title=title,
-            content=content,
-        )
+        return jsonify(serialize_note_row(row)), 201
 
-        db.session.add(note)
-        db.session.commit()
+    # -----------------------------
+    # NOTES: GET — одна своя заметка (чужая — 404)
+    @app.route("/notes/<int:note_id>", methods=["GET"])
+    def get_note(note_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        # владельца — до 304: чужой If-None-Match не должен подтверждать,
+        # что заметка существует
+        owned = db.session.execute(
+            select(Note.id).where(Note.id == note_id, Note.user_id == user_id)
+        ).first()
+        if owned is None:
+            return jsonify({"message": "Note not found"}), 404
+
+        # без записи в журнале версии нет — ответ без etag, а не "None-..."
+        etag = _entity_etag("note", note_id)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
 
-        note = Note.query.get(note.id)
-        return jsonify(_serialize_note(note)), 201
+        row = db.session.execute(
+            note_select().where(Note.id == note_id, Note.user_id == user_id)
+        ).first()
+        if row is None:
+            return jsonify({"message": "Note not found"}), 404
+        return _with_etag(jsonify(serialize_note_rows([row])[0]), etag), 200
+
+    def _note_conflict(note_id, user_id):
+        # 409 с текущей версией: клиент сам решает, как свести правки
+        db.session.rollback()
+        row = db.session.execute(
+            note_select().where(Note.id == note_id, Note.user_id == user_id)
+        ).first()
+        if row is None:
+            return jsonify({"message": "Note not found"}), 404
+        return jsonify({
+            "message": "Note was changed",
+            "note": serialize_note_rows([row])[0],
+        }), 409
 
     # -----------------------------
-    # NOTES: PUT — обновить заметку
+    # NOTES: PUT — обновить заметку целиком
+    # {"baseRevision": n} — необязательно: если заметка уже не в ревизии n, 409
     @app.route("/notes/<int:note_id>", methods=["PUT"])
     def update_note(note_id):
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
-
-        note = Note.query.get_or_404(note_id)
-        if note.user_id != user_id:
-            return jsonify({"message": "Note not found"}), 404
+            return jsonify({"message": "Missing or invalid access token"}), 401
 
         data = request.get_json() or {}
+        values = {}
 
         if "title" in data:
-            note.title = (data.get("title") or "").strip()
+            values["title"] = (data.get("title") or "").strip()
 
         if "content" in data:
-            note.content = (data.get("content") or "").strip()
+            values["content"] = (data.get("content") or "").strip()
+
+        if values:
+            values["revision"] = Note.revision + 1
+
+        # чужая заметка — тоже 404: владельца проверяет сам UPDATE
+        where = (Note.id == note_id) & (Note.user_id == user_id)
+        base_revision = data.get("baseRevision")
+        if base_revision is not None:
+            if not isinstance(base_revision, int) or isinstance(base_revision, bool):
+                return jsonify({"message": "Invalid baseRevision"}), 400
+            where &= Note.revision == base_revision
+
+        row = _update_returning(Note, where, values, NOTE_COLUMNS)
+        if row is None:
+            if base_revision is not None:
+                return _note_conflict(note_id, user_id)
+            return jsonify({"message": "Note not found"}), 404
 
+        record_change("note", note_id, user_id=user_id)
         db.session.commit()
 
-        note = Note.query.get(note.id)
-        return jsonify(_serialize_note(note)), 200
+        return jsonify(serialize_note_row(row)), 200
+
+    # -----------------------------
+    # NOTES: PATCH — сохранить разницу против baseRevision (см. notepatch.py)
+    # {"baseRevision": 7, "patch": [{"at", "delete", "insert"}], "title"?: "..."}
+    # Ответ без content: {"id", "title", "revision", "updatedAt"}; устаревшая
+    # baseRevision — 409 {"message", "note": текущая версия целиком}
+    @app.route("/notes/<int:note_id>", methods=["PATCH"])
+    def patch_note_route(note_id):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        data = request.get_json() or {}
+        base_revision = data.get("baseRevision")
+        if not isinstance(base_revision, int) or isinstance(base_revision, bool):
+            return jsonify({"message": "Missing or invalid baseRevision"}), 400
+        try:
+            ops = parse_patch(data.get("patch", []))
+        except PatchError as e:
+            return jsonify({"message": str(e)}), 400
+        title = (data.get("title") or "").strip() if "title" in data else None
+
+        row = patch_note(note_id, user_id, base_revision, ops, title, NOTE_REVISION_COLUMNS)
+        if row is None:
+            revision = note_revision(note_id, user_id)
+            if revision is None:
+                return jsonify({"message": "Note not found"}), 404
+            if revision != base_revision:
+                return _note_conflict(note_id, user_id)
+            db.session.rollback()
+            return jsonify({"message": "Patch does not match the note"}), 400
+
+        record_change("note", note_id, user_id=user_id)
+        db.session.commit()
+
+        return jsonify(serialize_note_revision(row)), 200
 
     # -----------------------------
     # NOTES: DELETE — удалить заметку
@@ -469,18 +1555,149 @@ def create_app():
     def delete_note(note_id):
         user_id = _get_user_id()
         if not user_id:
-            return jsonify({"message": "Missing or invalid X-User-Id header"}), 401
-
-        note = Note.query.get_or_404(note_id)
-        if note.user_id != user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        deleted = db.session.execute(
+            delete(Note)
+            .where(Note.id == note_id, Note.user_id == user_id)
+            .returning(Note.id)
+        ).first()
+        if deleted is None:
             return jsonify({"message": "Note not found"}), 404
 
-        db.session.delete(note)
+        record_change("note", note_id, "delete", user_id=user_id)
         db.session.commit()
 
         return jsonify({"message": "Note deleted"}), 200
 
 
+    # -----------------------------
+    # SYNC: GET — изменения задач/контактов/заметок после курсора
+    # ?since=<cursor из прошлого ответа>&limit=500
+    # Без since — весь журнал с начала. Удалённые приходят в "deleted".
+    # Контакты и заметки — только свои (нужен токен), задачи — все.
+    @app.route("/sync", methods=["GET"])
+    def sync_changes():
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            limit = _parse_limit(request.args.get("limit"), default=500, maximum=1000)
+            payload = changes_since(request.args.get("since"), limit, user_id)
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid query parameters"}), 400
+
+        return jsonify(payload), 200
+
+    # -----------------------------
+    # EXPORT / IMPORT: массовая выгрузка и загрузка (см. transfer.py)
+    # правила полей — те же, что у POST /tasks, /contacts, /notes
+    transfer.init_app(app, {
+        "task": _task_create_values,
+        "contact": _contact_create_values,
+        "note": _note_create_values,
+    })
+
+    # GET /tasks/export?format=ndjson|csv — поток, память не растёт с числом строк
+    # контакты и заметки — только свои, задачи — вся доска
+    @app.route("/<any(tasks, contacts, notes):collection>/export", methods=["GET"])
+    def export_collection(collection):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            fmt = transfer.parse_format(request.args.get("format"))
+        except transfer.TransferError as e:
+            return jsonify({"message": str(e)}), 400
+
+        ext = "csv" if fmt == "csv" else "ndjson"
+        return Response(
+            stream_with_context(transfer.export_chunks(collection[:-1], fmt, user_id)),
+            mimetype=transfer.FORMATS[fmt],
+            headers={
+                "Content-Disposition": f'attachment; filename="{collection}.{ext}"',
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    # POST /tasks/import?format=ndjson|csv — тело: NDJSON или CSV с заголовком.
+    # Ответ: {"imported", "rejected", "skippedAssignees", "errors": [{"line", "message"}]}
+    @app.route("/<any(tasks, contacts, notes):collection>/import", methods=["POST"])
+    def import_collection(collection):
+        user_id = _get_user_id()
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        try:
+            fmt = transfer.parse_format(
+                request.args.get("format"),
+                default="csv" if request.mimetype == "text/csv" else "ndjson",
+            )
+        except transfer.TransferError as e:
+            return jsonify({"message": str(e)}), 400
+
+        # тело читаем потоком, не целиком в память
+        stream = io.TextIOWrapper(
+            io.BufferedReader(request.stream), encoding="utf-8-sig", newline=""
+        )
+        try:
+            summary = transfer.import_records(
+                collection[:-1], transfer.read_records(stream, fmt), fmt, user_id
+            )
+            db.session.commit()
+        except UnicodeDecodeError:
+            db.session.rollback()
+            return jsonify({"message": "Body must be UTF-8"}), 400
+        except csv.Error:
+            db.session.rollback()
+            return jsonify({"message": "Invalid CSV"}), 400
+        except DBAPIError as e:
+            # партию отклонила сама база (COPY): откатывается весь импорт
+            db.session.rollback()
+            if e.connection_invalidated:
+                raise
+            return jsonify({"message": transfer.rejected_message(e)}), 400
+
+        if collection != "tasks":
+            summary.pop("skippedAssignees")
+        return jsonify(summary), 200
+
+    # -----------------------------
+    # EVENTS: GET — поток изменений (text/event-stream)
+    # event: change  data: {"entity": "task", "id": 1, "op": "upsert"}
+    # event: resync  — клиент пропустил события, нужно сходить в /sync
+    # Нужен токен; EventSource не умеет слать заголовки — можно ?token=.
+    # События контактов и заметок получает только их владелец.
+    @app.route("/events", methods=["GET"])
+    def stream_events():
+        if not app.config["EVENTS_STREAM"]:
+            return jsonify({"message": "Event stream is served by the events process"}), 404
+
+        user_id = _get_user_id() or auth.verify_token(request.args.get("token", ""))
+        if not user_id:
+            return jsonify({"message": "Missing or invalid access token"}), 401
+
+        q = events.broadcaster.subscribe(user_id)
+        if q is None:
+            # лимит подписчиков процесса: клиент повторит
+            response = jsonify({"message": "Too many subscribers"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+
+        # соединение с БД подписчику не нужно — отдаём его в пул сразу
+        db.session.remove()
+
+        return Response(
+            stream_with_context(events.stream(q, app.config["EVENTS_HEARTBEAT"])),
+            mimetype="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            },
+        )
+
     return app
 
 
@@ -0,0 +1,110 @@
+from sqlalchemy import func, literal, literal_column, or_, select
+
+from .models import db, Contact, Note, User, CONTACT_SEARCH_SQL
+
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+HEADLINE_OPTIONS = (
+    "StartSel=<mark>, StopSel=</mark>, "
+    "MaxWords=25, MinWords=8, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+
+def search_notes(q, limit, offset, user_id):
+    """
+    Ранжированный поиск по заметкам пользователя через GIN-индекс по search_vector.
+    Сначала выбираем страницу по рангу, и только для неё строим
+    ts_headline — он дорогой и читает весь content.
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Note.search_vector, query)
+
+    page = (
+        select(Note.id.label("note_id"), rank.label("rank"))
+        .where(Note.user_id == user_id, Note.search_vector.op("@@")(query))
+        .order_by(rank.desc(), Note.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+
+    rows = db.session.execute(
+        select(
+            Note.id,
+            Note.title,
+            Note.created_at,
+            Note.updated_at,
+            Note.user_id,
+            User.name.label("user_name"),
+            User.email.label("user_email"),
+            page.c.rank,
+            func.ts_headline(SEARCH_CONFIG, Note.title, query, HEADLINE_OPTIONS).label("title_highlight"),
+            func.ts_headline(SEARCH_CONFIG, Note.content, query, HEADLINE_OPTIONS).label("snippet"),
+        )
+        .select_from(page)
+        .join(Note, Note.id == page.c.note_id)
+        .outerjoin(User, User.id == Note.user_id)
+        .order_by(page.c.rank.desc(), Note.id.desc())
+    ).all()
+
+    has_more = len(rows) > limit
+    return rows[:limit], has_more
+
+
+# -----------------------------
+# Typeahead по контактам (выбор исполнителей)
+
+# подстрочный/нечёткий поиск имеет смысл только с 3 символов (триграммы)
+FUZZY_MIN_LENGTH = 3
+
+CONTACT_LOOKUP_COLUMNS = (
+    Contact.id,
+    Contact.name,
+    Contact.email,
+    Contact.avatar_color,
+)
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def lookup_contacts(q, limit, user_id):
+    """
+    1) префикс по имени или email — btree text_pattern_ops, самый частый случай;
+    2) если не хватило — подстрока и опечатки по name/email/company
+       через GIN trigram (ILIKE и word_similarity <%).
+    """
+    q = q.strip().lower()
+    prefix = _escape_like(q) + "%"
+
+    rows = db.session.execute(
+        select(*CONTACT_LOOKUP_COLUMNS)
+        .where(Contact.user_id == user_id)
+        .where(or_(
+            func.lower(Contact.name).like(prefix, escape="\\"),
+            func.lower(Contact.email).like(prefix, escape="\\"),
+        ))
+        .order_by(Contact.name.asc(), Contact.id.asc())
+        .limit(limit)
+    ).all()
+
+    if len(rows) >= limit or len(q) < FUZZY_MIN_LENGTH:
+        return rows
+
+    haystack = literal_column(CONTACT_SEARCH_SQL)
+    found = [r.id for r in rows]
+    fuzzy = (
+        select(*CONTACT_LOOKUP_COLUMNS)
+        .where(Contact.user_id == user_id)
+        .where(or_(
+            haystack.like("%" + _escape_like(q) + "%", escape="\\"),
+            literal(q).op("<%")(haystack),
+        ))
+        .order_by(func.word_similarity(q, haystack).desc(), Contact.name.asc())
+        .limit(limit - len(rows))
+    )
+    if found:
+        fuzzy = fuzzy.where(Contact.id.not_in(found))
+
+    return rows + db.session.execute(fuzzy).all()
@@ -0,0 +1,366 @@
+from datetime import timezone
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func, literal_column, select
+
+from .cache import assignee_summaries, user_summaries
+from .metrics import timed_serialization
+from .models import db, Task, TaskArchive, User, Contact, Note, task_assignee, task_archive_assignee
+
+try:  # опционально: быстрый JSON-энкодер
+    import orjson
+except ImportError:  # pragma: no cover - orjson не обязателен
+    orjson = None
+
+
+# -----------------------------
+# JSON provider: orjson, если установлен, иначе стандартный json
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # типы, которые знает только DefaultJSONProvider (Decimal, UUID и т.п.)
+            return super().dumps(obj, **kwargs)
+
+    @timed_serialization
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(obj)
+        return self._app.response_class(self.dumps(obj), mimetype=self.mimetype)
+
+
+# -----------------------------
+# Колонки для списков: строим ответ прямо из кортежей, без ORM-объектов
+
+USER_COLUMNS = (
+    User.name.label("user_name"),
+    User.email.label("user_email"),
+)
+
+TASK_COLUMNS = (
+    Task.id,
+    Task.title,
+    Task.description,
+    Task.done,
+    Task.priority,
+    Task.status,
+    Task.created_at,
+    Task.due_date,
+    Task.sub_tasks,
+    Task.user_id,
+)
+
+# прогресс подзадач считается в SQL, без разбора массива в Python
+def sub_task_count_columns(sub_tasks):
+    return (
+        func.jsonb_array_length(sub_tasks).label("sub_tasks_total"),
+        func.jsonb_array_length(
+            func.jsonb_path_query_array(
+                sub_tasks, literal_column("'$[*] ? (@.done == true)'::jsonpath")
+            )
+        ).label("sub_tasks_done"),
+    )
+
+
+SUB_TASK_COUNT_COLUMNS = sub_task_count_columns(Task.sub_tasks)
+
+CONTACT_COLUMNS = (
+    Contact.id,
+    Contact.name,
+    Contact.email,
+    Contact.phone,
+    Contact.company,
+    Contact.position,
+    Contact.avatar_color,
+    Contact.created_at,
+    Contact.updated_at,
+    Contact.user_id,
+)
+
+NOTE_COLUMNS = (
+    Note.id,
+    Note.title,
+    Note.content,
+    Note.revision,
+    Note.created_at,
+    Note.updated_at,
+    Note.user_id,
+)
+
+
+# RETURNING для INSERT/UPDATE задачи: те же поля, что в списке, кроме user
+TASK_RETURNING = (*TASK_COLUMNS, *SUB_TASK_COUNT_COLUMNS)
+
+
+def task_select():
+    return (
+        select(*TASK_COLUMNS, *SUB_TASK_COUNT_COLUMNS, *USER_COLUMNS)
+        .select_from(Task)
+        .outerjoin(User, User.id == Task.user_id)
+    )
+
+
+def contact_select():
+    return (
+        select(*CONTACT_COLUMNS, *USER_COLUMNS)
+        .select_from(Contact)
+        .outerjoin(User, User.id == Contact.user_id)
+    )
+
+
+def archived_task_select():
+    # те же имена колонок, что у task_select: строки идут в тот же _task_dict
+    return (
+        select(
+            *(getattr(TaskArchive, c.key) for c in TASK_COLUMNS),
+            TaskArchive.archived_at,
+            *sub_task_count_columns(TaskArchive.sub_tasks),
+            *USER_COLUMNS,
+        )
+        .select_from(TaskArchive)
+        .outerjoin(User, User.id == TaskArchive.user_id)
+    )
+
+
+def note_select():
+    return (
+        select(*NOTE_COLUMNS, *USER_COLUMNS)
+        .select_from(Note)
+        .outerjoin(User, User.id == Note.user_id)
+    )
+
+
+# -----------------------------
+# Общие кусочки ответа
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _iso_utc(value):
+    return value.replace(tzinfo=timezone.utc).isoformat() if value else None
+
+
+def _user_summary(user_id, name, email):
+    if user_id is None or name is None:
+        return None
+    return {"id": user_id, "name": name, "email": email}
+
+
+def _assignee_summary(contact_id, name, email, avatar_color):
+    return {
+        "id": contact_id,
+        "name": name,
+        "email": email,
+        "avatarColor": avatar_color,
+    }
+
+
+def _task_dict(t, user, assignees, sub_tasks_total, sub_tasks_done):
+    return {
+        "id": t.id,
+        "title": t.title,
+        "description": t.description,
+        "done": t.done,
+        "priority": t.priority,
+        "status": t.status,
+        "createdAt": _iso(t.created_at),
+        "dueDate": _iso_utc(t.due_date),
+        "subTasks": t.sub_tasks or [],
+        "subTasksTotal": sub_tasks_total,
+        "subTasksDone": sub_tasks_done,
+        "userId": t.user_id,
+        "user": user,
+        # many-to-many: список исполнителей
+        "assignedContacts": assignees,
+    }
+
+
+def _contact_dict(c, user):
+    return {
+        "id": c.id,
+        "name": c.name,
+        "email": c.email,
+        "phone": c.phone,
+        "company": c.company,
+        "position": c.position,
+        "avatarColor": c.avatar_color,
+        "createdAt": _iso(c.created_at),
+        "updatedAt": _iso(c.updated_at),
+        "userId": c.user_id,
+        "user": user,
+    }
+
+
+def _note_dict(n, user):
+    return {
+        "id": n.id,
+        "title": n.title,
+        "content": n.content,
+        "revision": n.revision,
+        "createdAt": _iso_utc(n.created_at),
+        "updatedAt": _iso_utc(n.updated_at),
+        "userId": n.user_id,
+        "user": user,
+    }
+
+
+# -----------------------------
+# ORM-объект -> dict (одиночные объекты после записи)
+
+def _orm_user(user_id):
+    return user_summaries([user_id]).get(user_id) if user_id is not None else None
+
+
+@timed_serialization
+def serialize_contact(c: Contact):
+    return _contact_dict(c, _orm_user(c.user_id))
+
+
+# -----------------------------
+# Строки select() -> dict (списки: фиксированное число запросов)
+
+def load_assignee_ids(task_ids, links_table=task_assignee):
+    """id исполнителей всех задач одним запросом: {task_id: [contact_id, ...]}."""
+    result = {task_id: [] for task_id in task_ids}
+    if not task_ids:
+        return result
+
+    links = db.session.execute(
+        select(links_table.c.task_id, links_table.c.contact_id)
+        .where(links_table.c.task_id.in_(task_ids))
+        .order_by(links_table.c.task_id, links_table.c.contact_id)
+    ).all()
+
+    for task_id, contact_id in links:
+        result[task_id].append(contact_id)
+    return result
+
+
+def load_assignees(task_ids, links_table=task_assignee):
+    """
+    Исполнители всех задач: {task_id: [contact, ...]}.
+    Один запрос за связями + карточки контактов из assignee_cache
+    (промахи добираются ещё одним запросом).
+    """
+    ids = load_assignee_ids(task_ids, links_table)
+    contacts = assignee_summaries([cid for cids in ids.values() for cid in cids])
+    return {
+        task_id: [contacts[cid] for cid in cids if cid in contacts]
+        for task_id, cids in ids.items()
+    }
+
+
+@timed_serialization
+def serialize_task_rows(rows):
+    assignees = load_assignees([r.id for r in rows])
+    return [
+        _task_dict(
+            r,
+            _user_summary(r.user_id, r.user_name, r.user_email),
+            assignees[r.id],
+            r.sub_tasks_total,
+            r.sub_tasks_done,
+        )
+        for r in rows
+    ]
+
+
+@timed_serialization
+def serialize_archived_task_rows(rows):
+    assignees = load_assignees([r.id for r in rows], task_archive_assignee)
+    return [
+        {
+            **_task_dict(
+                r,
+                _user_summary(r.user_id, r.user_name, r.user_email),
+                assignees[r.id],
+                r.sub_tasks_total,
+                r.sub_tasks_done,
+            ),
+            "archivedAt": _iso(r.archived_at),
+        }
+        for r in rows
+    ]
+
+
+@timed_serialization
+def serialize_contact_rows(rows):
+    return [
+        _contact_dict(r, _user_summary(r.user_id, r.user_name, r.user_email))
+        for r in rows
+    ]
+
+
+@timed_serialization
+def serialize_note_search_rows(rows):
+    # без полного content: только подсвеченный фрагмент
+    return [
+        {
+            "id": r.id,
+            "title": r.title,
+            "titleHighlight": r.title_highlight,
+            "snippet": r.snippet,
+            "rank": r.rank,
+            "createdAt": _iso_utc(r.created_at),
+            "updatedAt": _iso_utc(r.updated_at),
+            "userId": r.user_id,
+            "user": _user_summary(r.user_id, r.user_name, r.user_email),
+        }
+        for r in rows
+    ]
+
+
+@timed_serialization
+def serialize_note_rows(rows):
+    return [
+        _note_dict(r, _user_summary(r.user_id, r.user_name, r.user_email))
+        for r in rows
+    ]
+
+
+# -----------------------------
+# Строки RETURNING -> dict (записи: ответ без повторного чтения)
+
+@timed_serialization
+def serialize_task_row(row, contact_ids=None):
+    """
+    contact_ids — исполнители, только что записанные в этом запросе;
+    None — не менялись, читаем текущие связи.
+    """
+    if contact_ids is None:
+        assignees = load_assignees([row.id])[row.id]
+    else:
+        contacts = assignee_summaries(contact_ids)
+        assignees = [contacts[cid] for cid in sorted(set(contact_ids)) if cid in contacts]
+    return _task_dict(
+        row, _orm_user(row.user_id), assignees, row.sub_tasks_total, row.sub_tasks_done
+    )
+
+
+@timed_serialization
+def serialize_contact_row(row):
+    return _contact_dict(row, _orm_user(row.user_id))
+
+
+@timed_serialization
+def serialize_note_row(row):
+    return _note_dict(row, _orm_user(row.user_id))
+
+
+# ответ PATCH /notes/<id>: content у клиента уже есть, обратно его не шлём
+NOTE_REVISION_COLUMNS = (Note.id, Note.title, Note.revision, Note.updated_at)
+
+
+def serialize_note_revision(row):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "revision": row.revision,
+        "updatedAt": _iso_utc(row.updated_at),
+    }
@@ -0,0 +1,123 @@
+import json
+
+from sqlalchemy import text
+
+from .models import db
+
+# Точечные операции над task.sub_tasks (JSONB).
+# Каждая операция — один UPDATE: Postgres берёт блокировку строки и
+# перечитывает свежую версию, поэтому два одновременных переключения
+# разных подзадач не затирают друг друга.
+
+# прогресс считаем прямо в SQL
+_COUNTS = """
+    jsonb_array_length(t.sub_tasks) AS total,
+    jsonb_array_length(
+        jsonb_path_query_array(t.sub_tasks, '$[*] ? (@.done == true)')
+    ) AS done
+"""
+
+_ADD = text(f"""
+    UPDATE public.task AS t
+    SET sub_tasks = t.sub_tasks || jsonb_build_array(jsonb_build_object(
+        'id', (
+            SELECT coalesce(max((e->>'id')::numeric), 0) + 1
+            FROM jsonb_array_elements(t.sub_tasks) AS e
+            WHERE jsonb_typeof(e->'id') = 'number'
+        ),
+        'title', CAST(:title AS text),
+        'done', CAST(:done AS boolean)
+    ))
+    WHERE t.id = :task_id
+    RETURNING t.sub_tasks -> -1 AS sub_task, {_COUNTS}
+""")
+
+_PATCH = text(f"""
+    UPDATE public.task AS t
+    SET sub_tasks = (
+        SELECT jsonb_agg(
+            CASE WHEN e.elem @> CAST(:match AS jsonb)
+                 THEN e.elem || CAST(:patch AS jsonb)
+                 ELSE e.elem END
+            ORDER BY e.ord
+        )
+        FROM jsonb_array_elements(t.sub_tasks) WITH ORDINALITY AS e(elem, ord)
+    )
+    WHERE t.id = :task_id
+      AND t.sub_tasks @> jsonb_build_array(CAST(:match AS jsonb))
+    RETURNING (
+        SELECT e FROM jsonb_array_elements(t.sub_tasks) AS e
+        WHERE e @> CAST(:match AS jsonb) LIMIT 1
+    ) AS sub_task, {_COUNTS}
+""")
+
+_REMOVE = text(f"""
+    UPDATE public.task AS t
+    SET sub_tasks = coalesce((
+        SELECT jsonb_agg(e.elem ORDER BY e.ord)
+        FROM jsonb_array_elements(t.sub_tasks) WITH ORDINALITY AS e(elem, ord)
+        WHERE NOT e.elem @> CAST(:match AS jsonb)
+    ), '[]'::jsonb)
+    WHERE t.id = :task_id
+      AND t.sub_tasks @> jsonb_build_array(CAST(:match AS jsonb))
+    RETURNING NULL AS sub_task, {_COUNTS}
+""")
+
+# подзадачи, которых нет в списке (добавлены параллельно), остаются в конце
+_REORDER = text(f"""
+    UPDATE public.task AS t
+    SET sub_tasks = coalesce((
+        SELECT jsonb_agg(e.elem ORDER BY array_position(
+            CAST(:ids AS numeric[]),
+            CASE WHEN jsonb_typeof(e.elem->'id') = 'number'
+                 THEN (e.elem->>'id')::numeric END
+        ) NULLS LAST, e.ord)
+        FROM jsonb_array_elements(t.sub_tasks) WITH ORDINALITY AS e(elem, ord)
+    ), '[]'::jsonb)
+    WHERE t.id = :task_id
+    RETURNING t.sub_tasks AS sub_task, {_COUNTS}
+""")
+
+
+def _match(sub_id):
+    return json.dumps({"id": sub_id})
+
+
+def _result(row):
+    if row is None:
+        return None
+    return {
+        "subTask": row.sub_task,
+        "subTasksTotal": row.total,
+        "subTasksDone": row.done,
+    }
+
+
+def add_sub_task(task_id, title, done=False):
+    row = db.session.execute(
+        _ADD, {"task_id": task_id, "title": title, "done": done}
+    ).first()
+    return _result(row)
+
+
+def update_sub_task(task_id, sub_id, changes):
+    row = db.session.execute(
+        _PATCH,
+        {"task_id": task_id, "match": _match(sub_id), "patch": json.dumps(changes)},
+    ).first()
+    return _result(row)
+
+
+def remove_sub_task(task_id, sub_id):
+    row = db.session.execute(
+        _REMOVE, {"task_id": task_id, "match": _match(sub_id)}
+    ).first()
+    return _result(row)
+
+
+def reorder_sub_tasks(task_id, ids):
+    row = db.session.execute(_REORDER, {"task_id": task_id, "ids": ids}).first()
+    result = _result(row)
+    if result is not None:
+        result["subTasks"] = result.pop("subTask")
+    return result
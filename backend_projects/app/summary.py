@@ -0,0 +1,141 @@
+import datetime
+
+from sqlalchemy import func, literal_column, select, tuple_
+
+from .cache import assignee_summaries
+from .models import db, Contact, Task, task_assignee
+
+# Сводка по доске (GET /tasks/summary): только агрегаты, без строк задач.
+# Счётчики — по всей доске (она общая), byAssignee — только свои контакты
+# пользователя: имя и email чужих контактов наружу не отдаём.
+
+
+def _count_if(condition):
+    return func.count().filter(condition)
+
+
+def board_summary(now, due_soon_days, user_id):
+    """
+    Два запроса:
+      1) GROUPING SETS по status / priority + общий итог — один проход по task;
+      2) число задач на исполнителя (и сколько задач вообще назначено).
+    now — наивный UTC, как due_date в базе; user_id — чьи контакты в byAssignee.
+    """
+    soon = now + datetime.timedelta(days=due_soon_days)
+    # NOT done, а не IS false: так подходят partial-индексы по открытым задачам
+    open_ = ~Task.done
+
+    rows = db.session.execute(
+        select(
+            Task.status,
+            Task.priority,
+            func.grouping(Task.status, Task.priority).label("grouping"),
+            func.count().label("total"),
+            _count_if(Task.done.is_(True)).label("done"),
+            _count_if(open_ & (Task.due_date < now)).label("overdue"),
+            _count_if(open_ & (Task.due_date >= now) & (Task.due_date < soon)).label("due_soon"),
+            _count_if(Task.due_date.is_(None)).label("no_due_date"),
+            func.coalesce(func.sum(func.jsonb_array_length(Task.sub_tasks)), 0).label("sub_tasks_total"),
+            func.coalesce(func.sum(func.jsonb_array_length(
+                func.jsonb_path_query_array(
+                    Task.sub_tasks, literal_column("'$[*] ? (@.done == true)'::jsonpath")
+                )
+            )), 0).label("sub_tasks_done"),
+        ).group_by(
+            func.grouping_sets(
+                tuple_(Task.status), tuple_(Task.priority), tuple_()
+            )
+        )
+    ).all()
+
+    # grouping(): бит 1 — priority свёрнут, бит 2 — status свёрнут
+    by_status, by_priority, totals = {}, {}, None
+    for r in rows:
+        if r.grouping == 1:
+            by_status[r.status] = r.total
+        elif r.grouping == 2:
+            by_priority[r.priority] = r.total
+        else:
+            totals = r
+
+    links = db.session.execute(
+        select(
+            task_assignee.c.contact_id,
+            func.grouping(task_assignee.c.contact_id).label("grouping"),
+            func.count().label("total"),
+            _count_if(open_).label("open"),
+            func.count(task_assignee.c.task_id.distinct()).label("tasks"),
+            # владелец контакта; в строке итога не нужен
+            func.max(Contact.user_id).label("owner_id"),
+        )
+        .select_from(task_assignee)
+        .join(Task, Task.id == task_assignee.c.task_id)
+        .join(Contact, Contact.id == task_assignee.c.contact_id)
+        .group_by(func.grouping_sets(tuple_(task_assignee.c.contact_id), tuple_()))
+    ).all()
+
+    assigned_tasks = 0
+    per_contact = []
+    for r in links:
+        if r.grouping:
+            assigned_tasks = r.tasks
+        elif r.owner_id == user_id:
+            per_contact.append(r)
+
+    contacts = assignee_summaries([r.contact_id for r in per_contact])
+    by_assignee = [
+        {"contact": contacts.get(r.contact_id), "total": r.total, "open": r.open}
+        for r in sorted(per_contact, key=lambda r: (-r.total, r.contact_id))
+    ]
+
+    total = totals.total if totals else 0
+    done = totals.done if totals else 0
+    return {
+        "total": total,
+        "done": done,
+        "open": total - done,
+        "byStatus": by_status,
+        "byPriority": by_priority,
+        "overdue": totals.overdue if totals else 0,
+        "dueSoon": totals.due_soon if totals else 0,
+        "dueSoonDays": due_soon_days,
+        "noDueDate": totals.no_due_date if totals else 0,
+        "byAssignee": by_assignee,
+        "unassigned": total - assigned_tasks,
+        "subTasks": {
+            "total": int(totals.sub_tasks_total) if totals else 0,
+            "done": int(totals.sub_tasks_done) if totals else 0,
+        },
+        "asOf": now.replace(tzinfo=datetime.timezone.utc).isoformat(),
+    }
+
+
+# -----------------------------
+# Нагрузка исполнителей (GET /contacts/<id>/tasks, /contacts/workload)
+
+def contact_workload(contact_filter, now):
+    """
+    {contact_id: {"total", "open", "overdue"}} одним GROUP BY.
+    contact_filter — условие на Contact (свои контакты, конкретные id);
+    контакт без задач тоже попадает в ответ, с нулями.
+    Связи читаются по ix_task_assignee_contact_id_task_id.
+    """
+    open_ = ~Task.done
+    rows = db.session.execute(
+        select(
+            Contact.id,
+            func.count(Task.id).label("total"),
+            _count_if(open_).label("open"),
+            _count_if(open_ & (Task.due_date < now)).label("overdue"),
+        )
+        .select_from(Contact)
+        .outerjoin(task_assignee, task_assignee.c.contact_id == Contact.id)
+        .outerjoin(Task, Task.id == task_assignee.c.task_id)
+        .where(contact_filter)
+        .group_by(Contact.id)
+        .order_by(Contact.id)
+    ).all()
+    return {
+        r.id: {"total": r.total, "open": r.open, "overdue": r.overdue}
+        for r in rows
+    }
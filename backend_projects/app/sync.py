@@ -0,0 +1,247 @@
+import json
+import base64
+import datetime
+
+from sqlalchemy import Integer, event, func, literal, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+from .models import (
+    db,
+    ChangeLog,
+    CollectionVersion,
+    Task,
+    Contact,
+    Note,
+    task_assignee,
+    change_log_revision_seq,
+)
+from .events import USER_SCOPED, queue_event, queue_events
+from .serializers import (
+    task_select,
+    contact_select,
+    note_select,
+    serialize_task_rows,
+    serialize_contact_rows,
+    serialize_note_rows,
+)
+
+# txid текущей транзакции и граница "всё, что ниже, уже закоммичено"
+CURRENT_TXID = literal_column("pg_current_xact_id()::text::bigint")
+SNAPSHOT_XMIN = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+ENTITIES = {
+    # entity -> (ключ в ответе, модель, select, сериализатор)
+    "task": ("tasks", Task, task_select, serialize_task_rows),
+    "contact": ("contacts", Contact, contact_select, serialize_contact_rows),
+    "note": ("notes", Note, note_select, serialize_note_rows),
+}
+
+
+# -----------------------------
+# Запись в журнал (вызывается до db.session.commit())
+
+def _touch(entity):
+    # версию коллекции поднимем перед коммитом, см. _bump_versions
+    db.session.info.setdefault("changed_collections", set()).add(entity)
+
+
+def _upsert(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[ChangeLog.entity, ChangeLog.entity_id],
+        set_={
+            "op": stmt.excluded.op,
+            "revision": change_log_revision_seq.next_value(),
+            "txid": CURRENT_TXID,
+            "changed_at": stmt.excluded.changed_at,
+        },
+    )
+
+
+def record_change(entity, entity_id, op="upsert", user_id=None):
+    """user_id — владелец контакта/заметки, для события подписчикам /events."""
+    db.session.execute(
+        _upsert(
+            pg_insert(ChangeLog).values(
+                entity=entity,
+                entity_id=entity_id,
+                op=op,
+                txid=CURRENT_TXID,
+                changed_at=datetime.datetime.utcnow(),
+            )
+        )
+    )
+    _touch(entity)
+    queue_event(entity, entity_id, op, user_id)
+
+
+def record_changes(entity, entity_ids, op="upsert", notify=True):
+    """
+    Пакетная версия record_change: один INSERT ... ON CONFLICT на все id.
+    notify=False — без события на каждую строку (массовый импорт шлёт один resync).
+    """
+    entity_ids = sorted(set(entity_ids))
+    if not entity_ids:
+        return
+
+    # id одним массивом через unnest: SQL не зависит от их числа, компилируется
+    # один раз (многострочный VALUES на тысячах id компилировался дольше, чем выполнялся)
+    db.session.execute(
+        _upsert(
+            pg_insert(ChangeLog).from_select(
+                ["entity", "entity_id", "op", "txid", "changed_at"],
+                select(
+                    literal(entity),
+                    func.unnest(literal(entity_ids, ARRAY(Integer))),
+                    literal(op),
+                    CURRENT_TXID,
+                    literal(datetime.datetime.utcnow()),
+                ),
+            )
+        )
+    )
+    _touch(entity)
+    if notify:
+        queue_events(entity, entity_ids, op)
+
+
+def record_contact_tasks(contact_id):
+    """Задачи, в которых контакт исполнитель, тоже изменились (имя/цвет/удаление)."""
+    tasks = select(
+        literal("task"),
+        task_assignee.c.task_id,
+        literal("upsert"),
+        CURRENT_TXID,
+        literal(datetime.datetime.utcnow()),
+    ).where(task_assignee.c.contact_id == contact_id)
+
+    task_ids = db.session.execute(
+        _upsert(
+            pg_insert(ChangeLog).from_select(
+                ["entity", "entity_id", "op", "txid", "changed_at"], tasks
+            )
+        ).returning(ChangeLog.entity_id)
+    ).scalars().all()
+
+    if task_ids:
+        _touch("task")
+    queue_events("task", task_ids, "upsert")
+
+
+# -----------------------------
+# Версии для ETag
+#
+# Версия коллекции — строка collection_version, её поднимает транзакция,
+# которая писала в журнал, последним запросом перед COMMIT. Версия строки —
+# её revision в change_log: строку меняют только закоммиченные записи.
+
+def _bump_versions(session):
+    entities = session.info.pop("changed_collections", None)
+    if not entities:
+        return
+    # в одном порядке: два писателя не возьмут строки крест-накрест
+    for entity in sorted(entities):
+        stmt = pg_insert(CollectionVersion).values(entity=entity, version=1)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CollectionVersion.entity],
+                set_={"version": CollectionVersion.version + 1},
+            )
+        )
+
+
+def _discard_versions(session):
+    session.info.pop("changed_collections", None)
+
+
+def collection_version(entity):
+    """Версия коллекции (0, если изменений ещё не было)."""
+    version = db.session.execute(
+        select(CollectionVersion.version).where(CollectionVersion.entity == entity)
+    ).scalar_one_or_none()
+    return version or 0
+
+
+def entity_version(entity, entity_id):
+    """revision одной строки или None, если её нет в журнале."""
+    return db.session.execute(
+        select(ChangeLog.revision).where(
+            ChangeLog.entity == entity,
+            ChangeLog.entity_id == entity_id,
+            ChangeLog.op == "upsert",
+        )
+    ).scalar_one_or_none()
+
+
+# -----------------------------
+# Курсор: (txid, revision) последней отданной записи
+
+def encode_cursor(txid, revision):
+    raw = json.dumps([txid, revision]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0, 0
+    padded = cursor + "=" * (-len(cursor) % 4)
+    txid, revision = json.loads(base64.urlsafe_b64decode(padded))
+    return int(txid), int(revision)
+
+
+def changes_since(cursor, limit, user_id):
+    """
+    Изменения после курсора. Отдаём только транзакции ниже xmin текущего
+    снапшота — они гарантированно завершены, поэтому запись с меньшим txid
+    уже не появится "задним числом" и курсор ничего не пропустит.
+    Контакты и заметки — только свои (user_id); в change_log владельца нет,
+    поэтому id удалённых отдаём как есть: по чужому id клиенту удалять нечего.
+    """
+    since = decode_cursor(cursor)
+
+    xmin = db.session.execute(select(SNAPSHOT_XMIN)).scalar_one()
+    rows = db.session.execute(
+        select(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op, ChangeLog.txid, ChangeLog.revision)
+        .where(tuple_(ChangeLog.txid, ChangeLog.revision) > since)
+        .where(ChangeLog.txid < xmin)
+        .order_by(ChangeLog.txid, ChangeLog.revision)
+        .limit(limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    payload = {key: [] for key, *_ in ENTITIES.values()}
+    payload["deleted"] = {key: [] for key, *_ in ENTITIES.values()}
+
+    for entity, (key, model, make_select, serialize) in ENTITIES.items():
+        upserted = [r.entity_id for r in rows if r.entity == entity and r.op == "upsert"]
+        deleted = [r.entity_id for r in rows if r.entity == entity and r.op == "delete"]
+
+        if upserted:
+            query = make_select().where(model.id.in_(upserted))
+            if entity in USER_SCOPED:
+                query = query.where(model.user_id == user_id)
+            found = db.session.execute(query).all()
+            payload[key] = serialize(found)
+            # строка могла исчезнуть без tombstone (каскад) — считаем удалённой;
+            # у своих-чужих так не угадать: не нашлась — значит, не наша
+            if entity not in USER_SCOPED:
+                missing = set(upserted) - {r.id for r in found}
+                deleted.extend(sorted(missing))
+
+        payload["deleted"][key] = deleted
+
+    if has_more:
+        last = rows[-1]
+        payload["cursor"] = encode_cursor(last.txid, last.revision)
+    else:
+        # все транзакции ниже xmin уже отданы
+        payload["cursor"] = encode_cursor(xmin, 0)
+    payload["hasMore"] = has_more
+    return payload
+
+
+def init_app(app):
+    if not event.contains(db.session, "before_commit", _bump_versions):
+        event.listen(db.session, "before_commit", _bump_versions)
+        event.listen(db.session, "after_rollback", _discard_versions)
@@ -0,0 +1,488 @@
+import csv
+import datetime
+import io
+import json
+import sys
+
+import click
+import psycopg2
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+
+from .duedates import naive_utc
+from .events import queue_resync
+from .models import db, Task, Contact, Note, task_assignee
+from .serializers import (
+    task_select,
+    contact_select,
+    note_select,
+    serialize_task_rows,
+    serialize_contact_rows,
+    serialize_note_rows,
+)
+from .sync import USER_SCOPED, record_changes
+
+# Массовый экспорт/импорт задач, контактов и заметок.
+#
+#   GET  /<collection>/export?format=ndjson|csv   — потоковая выгрузка
+#   POST /<collection>/import?format=ndjson|csv   — загрузка через COPY
+#   (collection — tasks, contacts или notes)
+#   flask data export|import ...              — то же из командной строки
+#
+# Экспорт читает server-side курсором (yield_per) и отдаёт генератором:
+# в памяти одна пачка строк, сколько бы их ни было в таблице.
+# Импорт валидирует пачками теми же правилами, что POST /tasks и т.д.,
+# и грузит каждую пачку одним COPY.
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+# в ответе не больше стольких ошибок, остальные только считаются
+MAX_ERRORS = 1000
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+ENTITIES = {
+    # entity -> (модель, select, сериализатор)
+    "task": (Task, task_select, serialize_task_rows),
+    "contact": (Contact, contact_select, serialize_contact_rows),
+    "note": (Note, note_select, serialize_note_rows),
+}
+
+# колонки CSV: плоские поля ответа API, вложенные объекты — только id
+CSV_FIELDS = {
+    "task": (
+        "id", "title", "description", "done", "priority", "status",
+        "createdAt", "dueDate", "subTasks", "assignedContactIds", "userId",
+    ),
+    "contact": (
+        "id", "name", "email", "phone", "company", "position",
+        "avatarColor", "createdAt", "updatedAt", "userId",
+    ),
+    "note": ("id", "title", "content", "createdAt", "updatedAt", "userId"),
+}
+
+# колонки COPY: id выдаём заранее из sequence, чтобы связать задачи с исполнителями
+COPY_COLUMNS = {
+    "task": (
+        "id", "user_id", "title", "description", "done", "priority", "status",
+        "created_at", "due_date", "sub_tasks",
+    ),
+    "contact": (
+        "id", "user_id", "name", "email", "phone", "company", "position",
+        "avatar_color", "created_at", "updated_at",
+    ),
+    "note": ("id", "user_id", "title", "content", "created_at", "updated_at"),
+}
+
+
+class TransferError(ValueError):
+    pass
+
+
+def rejected_message(error):
+    """DBAPIError из COPY/INSERT (запись не пропустила сама база) -> текст ответа."""
+    diag = getattr(error.orig, "diag", None)
+    reason = diag.message_primary if diag is not None else None
+    return f"Import rejected, nothing was applied: {reason or 'database error'}"
+
+
+def parse_format(value, default="ndjson"):
+    fmt = (value or default).lower()
+    if fmt not in FORMATS:
+        raise TransferError(f"Unknown format: {value}")
+    return fmt
+
+
+# -----------------------------
+# Экспорт
+
+def export_batches(entity, user_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Пачки dict в формате API, по id. Курсор закрывается и при обрыве клиента.
+    user_id — только строки этого пользователя (контакты, заметки).
+    """
+    model, make_select, serialize = ENTITIES[entity]
+    query = make_select()
+    if user_id is not None and entity in USER_SCOPED:
+        query = query.where(model.user_id == user_id)
+    result = db.session.execute(
+        query.order_by(model.id),
+        execution_options={"yield_per": batch_size},
+    )
+    try:
+        for rows in result.partitions():
+            yield serialize(rows)
+    finally:
+        result.close()
+
+
+def _csv_value(field, value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if field == "subTasks":
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _csv_record(entity, item):
+    if entity == "task":
+        item = dict(item, assignedContactIds=";".join(
+            str(c["id"]) for c in item["assignedContacts"]
+        ))
+    return [_csv_value(field, item.get(field)) for field in CSV_FIELDS[entity]]
+
+
+def export_chunks(entity, fmt, user_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """Генератор текста для ответа: одна строка-кусок на пачку."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_FIELDS[entity])
+        for items in export_batches(entity, user_id, batch_size):
+            for item in items:
+                writer.writerow(_csv_record(entity, item))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    dumps = current_app.json.dumps
+    for items in export_batches(entity, user_id, batch_size):
+        yield "".join(dumps(item) + "\n" for item in items)
+
+
+# -----------------------------
+# Импорт: разбор записей
+
+def read_records(stream, fmt):
+    """(номер строки, сырая запись) из текстового потока; разбор — в import_records."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_no, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_no, line
+
+
+def _from_csv(entity, record):
+    data = {}
+    for field, value in record.items():
+        if field is None or value is None or value == "":
+            continue
+        if field == "done":
+            value = value.strip().lower()
+            if value not in ("true", "false", "1", "0"):
+                raise ValueError("Invalid done")
+            value = value in ("true", "1")
+        elif field == "subTasks":
+            value = json.loads(value)
+        elif field == "assignedContactIds":
+            value = [v for v in value.split(";") if v.strip()]
+        data[field] = value
+    return data
+
+
+def _decode(entity, fmt, raw):
+    if fmt == "csv":
+        return _from_csv(entity, raw)
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("Record must be an object")
+    # null как отсутствующее поле: сработают значения по умолчанию
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    return naive_utc(datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00")))
+
+
+def _source_contact_ids(data):
+    # экспорт NDJSON отдаёт assignedContacts, CSV — assignedContactIds
+    if "assignedContactIds" in data:
+        contact_ids = data["assignedContactIds"]
+    else:
+        contact_ids = [c.get("id") for c in data.get("assignedContacts") or []]
+    if not isinstance(contact_ids, list):
+        raise ValueError(contact_ids)
+    return [int(cid) for cid in contact_ids]
+
+
+def _check_lengths(model, values):
+    for column, value in values.items():
+        length = getattr(model.__table__.c[column].type, "length", None)
+        if length and isinstance(value, str) and len(value) > length:
+            return f"{column} is longer than {length}"
+    return None
+
+
+def _prepare(entity, data, user_id, validate, now):
+    """Запись -> (значения для COPY, исполнители, исходный id) или ошибка."""
+    values, error = validate(data)
+    if error:
+        return None, error
+
+    model = ENTITIES[entity][0]
+    error = _check_lengths(model, values)
+    if error:
+        return None, error
+
+    try:
+        created_at = _parse_timestamp(data.get("createdAt")) or now
+        updated_at = _parse_timestamp(data.get("updatedAt")) or created_at
+    except ValueError:
+        return None, "Invalid createdAt/updatedAt"
+
+    contact_ids = []
+    if entity == "task":
+        if not isinstance(values["sub_tasks"], list):
+            return None, "Invalid subTasks"
+        values["due_date"] = naive_utc(values["due_date"])
+        try:
+            contact_ids = _source_contact_ids(data)
+        except (TypeError, ValueError):
+            return None, "Invalid assignedContactIds"
+
+    values["user_id"] = user_id
+    values["created_at"] = created_at
+    if entity != "task":
+        values["updated_at"] = updated_at
+    return (values, contact_ids, data.get("id")), None
+
+
+# -----------------------------
+# Импорт: COPY
+
+def _copy_value(value):
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    # текстовый формат COPY: экранируем разделители и обратный слэш
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy(table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(v) for v in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    # COPY идёт мимо SQLAlchemy, но в той же транзакции сессии
+    statement = f"COPY {table.schema}.{table.name} ({', '.join(columns)}) FROM STDIN"
+    dbapi_conn = db.session.connection().connection
+    try:
+        with dbapi_conn.cursor() as cur:
+            cur.copy_expert(statement, buffer)
+    except psycopg2.Error as e:
+        # в те же исключения, что и у запросов через SQLAlchemy (DataError, ...)
+        raise DBAPIError.instance(statement, None, e, psycopg2.Error) from e
+
+
+def _allocate_ids(model, count):
+    table = model.__table__
+    return db.session.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+        {"table": f"{table.schema}.{table.name}", "n": count},
+    ).scalars().all()
+
+
+def _load_batch(entity, prepared, user_id, contact_map, summary):
+    model = ENTITIES[entity][0]
+    ids = _allocate_ids(model, len(prepared))
+    columns = COPY_COLUMNS[entity]
+
+    _copy(model.__table__, columns, (
+        (new_id, *(values[c] for c in columns[1:]))
+        for new_id, (values, _, _) in zip(ids, prepared)
+    ))
+
+    if entity == "task":
+        wanted = {}
+        for new_id, (_, contact_ids, _) in zip(ids, prepared):
+            for cid in contact_ids:
+                if contact_map is not None:
+                    cid = contact_map.get(str(cid))
+                if cid is not None:
+                    wanted.setdefault(new_id, set()).add(int(cid))
+
+        all_contacts = set().union(*wanted.values()) if wanted else set()
+        existing = set()
+        if all_contacts:
+            existing = set(db.session.execute(
+                select(Contact.id)
+                .where(Contact.id.in_(all_contacts), Contact.user_id == user_id)
+            ).scalars())
+
+        links = [
+            (task_id, cid)
+            for task_id, contact_ids in wanted.items()
+            for cid in sorted(contact_ids)
+            if cid in existing
+        ]
+        summary["skippedAssignees"] += (
+            sum(len(c) for _, c, _ in prepared) - len(links)
+        )
+        if links:
+            _copy(task_assignee, ("task_id", "contact_id"), links)
+
+    record_changes(entity, ids, notify=False)
+
+    if "idMap" in summary:
+        for new_id, (_, _, source_id) in zip(ids, prepared):
+            if source_id is not None:
+                summary["idMap"][str(source_id)] = new_id
+    summary["imported"] += len(ids)
+
+
+def import_records(entity, records, fmt, user_id, contact_map=None,
+                   batch_size=IMPORT_BATCH_SIZE, id_map=False):
+    """
+    records — (номер строки, сырая запись) из read_records.
+    Невалидные записи пропускаются и попадают в errors, остальные
+    грузятся в одной транзакции (commit — на вызывающем).
+    contact_map — {старый id контакта: новый} для assignedContactIds,
+    например idMap из импорта контактов; без него id берутся как есть.
+    id_map=True — собрать в summary["idMap"] {исходный id: новый}; растёт
+    на строку, поэтому только по запросу (--id-map в CLI).
+    Исполнителями становятся только контакты user_id, как в POST /tasks.
+    """
+    validate = current_app.extensions["transfer"][entity]
+    now = datetime.datetime.utcnow()
+    summary = {
+        "imported": 0,
+        "rejected": 0,
+        "skippedAssignees": 0,
+        "errors": [],
+    }
+    if id_map:
+        summary["idMap"] = {}
+
+    def reject(line, message):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_ERRORS:
+            summary["errors"].append({"line": line, "message": message})
+
+    prepared = []
+    for line, raw in records:
+        try:
+            data = _decode(entity, fmt, raw)
+            item, error = _prepare(entity, data, user_id, validate, now)
+        except (AttributeError, TypeError, ValueError):
+            item, error = None, "Invalid record"
+        if error:
+            reject(line, error)
+            continue
+
+        prepared.append(item)
+        if len(prepared) >= batch_size:
+            _load_batch(entity, prepared, user_id, contact_map, summary)
+            prepared = []
+
+    if prepared:
+        _load_batch(entity, prepared, user_id, contact_map, summary)
+
+    if summary["imported"]:
+        # клиенты перечитают данные целиком; кэши сбросятся тем же событием
+        queue_resync()
+    return summary
+
+
+# -----------------------------
+# CLI: flask data export|import
+
+data_cli = AppGroup("data", help="Bulk export and import.")
+
+
+def _format_for(path, value):
+    if value:
+        return parse_format(value)
+    return "csv" if str(path).lower().endswith(".csv") else "ndjson"
+
+
+@data_cli.command("export")
+@click.argument("entity", type=click.Choice(sorted(ENTITIES)))
+@click.option("--format", "fmt", default=None, help="ndjson (default) or csv.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default=None,
+              help="File to write, stdout by default.")
+@click.option("--user-id", type=int, default=None,
+              help="Only contacts/notes of this user; all users by default.")
+def export_command(entity, fmt, output, user_id):
+    """Stream all rows of ENTITY."""
+    fmt = _format_for(output or "", fmt)
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        for chunk in export_chunks(entity, fmt, user_id):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
+@data_cli.command("import")
+@click.argument("entity", type=click.Choice(sorted(ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user-id", type=int, required=True, help="Owner of imported rows.")
+@click.option("--format", "fmt", default=None, help="ndjson or csv, by extension if omitted.")
+@click.option("--contact-map", type=click.File("r"), default=None,
+              help="JSON {old contact id: new id}, e.g. --id-map of a contact import.")
+@click.option("--id-map", type=click.File("w"), default=None,
+              help="Write JSON {source id: new id} here.")
+@click.option("--batch-size", type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+def import_command(entity, path, user_id, fmt, contact_map, id_map, batch_size):
+    """Load PATH into ENTITY through COPY."""
+    fmt = _format_for(path, fmt)
+    mapping = json.load(contact_map) if contact_map else None
+
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            summary = import_records(
+                entity, read_records(stream, fmt), fmt, user_id,
+                contact_map=mapping, batch_size=batch_size, id_map=id_map is not None,
+            )
+        db.session.commit()
+    except DBAPIError as e:
+        db.session.rollback()
+        if e.connection_invalidated:
+            raise
+        raise click.ClickException(rejected_message(e))
+
+    if id_map:
+        json.dump(summary["idMap"], id_map)
+    for error in summary["errors"]:
+        click.echo(f"line {error['line']}: {error['message']}", err=True)
+    click.echo(
+        f"imported {summary['imported']}, rejected {summary['rejected']}"
+        + (f", skipped assignees {summary['skippedAssignees']}" if entity == "task" else "")
+    )
+
+
+def init_app(app, validators):
+    """validators: entity -> правила полей из routes (те же, что у POST)."""
+    app.extensions["transfer"] = validators
+    app.cli.add_command(data_cli)
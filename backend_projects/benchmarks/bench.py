@@ -0,0 +1,540 @@
+"""
+Нагрузочный прогон всех маршрутов create_app().
+
+    # in-process, через Flask test client
+    python -m benchmarks.bench --requests 200 --output results.json
+
+    # живой сервер с несколькими воркерами
+    python -m benchmarks.bench --url http://localhost:5000 --concurrency 16
+
+    # сравнение с сохранённым baseline: exit 1 при регрессии
+    python -m benchmarks.bench --baseline baseline.json --tolerance 0.2
+
+Число SQL-запросов берётся из заголовка Server-Timing (app/metrics.py),
+поэтому METRICS_SERVER_TIMING должен быть включён (по умолчанию включён).
+"""
+import argparse
+import datetime
+import fnmatch
+import itertools
+import json
+import math
+import platform
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .seed import BENCH_EMAIL_DOMAIN, BENCH_PASSWORD
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+# эти маршруты не меряются запрос-ответом
+SKIPPED_ROUTES = {("/events", "GET")}
+
+
+# -----------------------------
+# Драйверы: test client или HTTP
+
+class Result:
+    __slots__ = ("status", "headers", "body", "elapsed", "queries")
+
+    def __init__(self, status, headers, body, elapsed):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+        match = QUERIES_RE.search(headers.get("Server-Timing") or "")
+        self.queries = int(match.group(1)) if match else None
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class InProcessDriver:
+    name = "in-process"
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, body=None, headers=None):
+        client = self.app.test_client()
+        started = time.perf_counter()
+        if isinstance(body, bytes):
+            # сырое тело (NDJSON для /import)
+            response = client.open(path, method=method, data=body, headers=headers or {})
+        else:
+            response = client.open(path, method=method, json=body, headers=headers or {})
+        data = response.get_data()
+        elapsed = time.perf_counter() - started
+        return Result(response.status_code, response.headers, data, elapsed)
+
+
+class HttpDriver:
+    name = "http"
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if isinstance(body, bytes):
+            data = body
+            headers["Content-Type"] = "application/x-ndjson"
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                payload = response.read()
+                status, response_headers = response.status, response.headers
+        except urllib.error.HTTPError as exc:  # 4xx/5xx и 304
+            payload = exc.read()
+            status, response_headers = exc.code, exc.headers
+        elapsed = time.perf_counter() - started
+        return Result(status, response_headers, payload, elapsed)
+
+
+# -----------------------------
+# Общее состояние прогона: пользователь, id из базы, пулы своих объектов
+# (заметки правит и удаляет только владелец)
+
+class Context:
+    def __init__(self, driver):
+        self.driver = driver
+        self.run_id = uuid.uuid4().hex[:8]
+        self.email = f"bench-{self.run_id}@{BENCH_EMAIL_DOMAIN}"
+        self.user_id = None
+        self.token = None
+        self.task_ids = []
+        self.contact_ids = []
+        self.pools = {}
+        self.extra = {}
+        self._counter = itertools.count()
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def next(self):
+        return next(self._counter)
+
+    def call(self, method, path, body=None, expect=(200, 201)):
+        result = self.driver.request(method, path, body, self.headers if self.token else None)
+        if result.status not in expect:
+            raise RuntimeError(f"setup {method} {path}: HTTP {result.status} {result.body[:200]!r}")
+        return result.json()
+
+    def take(self, pool):
+        # list.pop атомарен — пул безопасно делить между потоками
+        return self.pools[pool].pop()
+
+    def pick(self, ids, i):
+        return ids[i % len(ids)]
+
+
+def _setup(ctx):
+    user = ctx.call("POST", "/auth/register", {
+        "name": "Bench Runner", "email": ctx.email, "password": BENCH_PASSWORD,
+    })
+    ctx.user_id = user["id"]
+    ctx.token = user["token"]
+
+    ctx.task_ids = [t["id"] for t in ctx.call("GET", "/tasks?limit=200")]
+    ctx.contact_ids = [c["id"] for c in ctx.call("GET", "/contacts")][:200]
+
+    # пустая база: минимальный набор, чтобы сценарии было на чём гонять
+    if not ctx.contact_ids:
+        ctx.contact_ids = [_create_contact(ctx)["id"] for _ in range(5)]
+    if not ctx.task_ids:
+        ctx.task_ids = [_create_task(ctx)["id"] for _ in range(20)]
+
+
+def _create_task(ctx, sub_tasks=3):
+    i = ctx.next()
+    return ctx.call("POST", "/tasks", {
+        "title": f"bench task {ctx.run_id} {i}",
+        "description": "created by benchmarks.bench",
+        "priority": ("low", "medium", "urgent")[i % 3],
+        "status": ("todo", "in-progress", "done")[i % 3],
+        "subTasks": [{"id": j + 1, "title": f"step {j + 1}", "done": False} for j in range(sub_tasks)],
+        "assignedContactIds": ctx.contact_ids[i % max(len(ctx.contact_ids), 1):][:2],
+        # сроки вокруг сегодня: есть и просроченные, и ближайшие (GET /tasks/due, календарь)
+        "dueDate": (datetime.date.today() + datetime.timedelta(days=i % 30 - 5)).isoformat(),
+    })
+
+
+def _create_contact(ctx):
+    i = ctx.next()
+    return ctx.call("POST", "/contacts", {
+        "name": f"Bench Contact {ctx.run_id} {i}",
+        "email": f"contact-{ctx.run_id}-{i}@{BENCH_EMAIL_DOMAIN}",
+        "company": "Bench GmbH",
+    })
+
+
+def _create_note(ctx):
+    i = ctx.next()
+    return ctx.call("POST", "/notes", {
+        "title": f"bench note {ctx.run_id} {i}",
+        "content": "release planning review\n" * 20,
+    })
+
+
+# -----------------------------
+# Сценарии: один на маршрут (иногда несколько вариантов запроса)
+
+class Scenario:
+    def __init__(self, name, method, rule, build, setup=None, headers=None):
+        self.name = name
+        self.method = method
+        self.rule = rule
+        self.build = build      # (ctx, i) -> (path, body)
+        self.setup = setup      # (ctx, n) -> None, вне замера
+        self.headers = headers  # (ctx) -> dict, поверх Authorization
+
+
+def _pool(name, create):
+    def setup(ctx, n):
+        ctx.pools[name] = [create(ctx)["id"] for _ in range(n)]
+    return setup
+
+
+def _subtask_task(ctx, n):
+    # своя задача с n подзадачами: удаления по одной не упираются в пустой список
+    task = _create_task(ctx, sub_tasks=n)
+    ctx.extra["subtask_task"] = task["id"]
+    ctx.pools["subtask_ids"] = [s["id"] for s in task["subTasks"]]
+
+
+def _archived_ids(ctx, n):
+    # архив наполняет `flask tasks archive`; пустой архив — restore отвечает notFound
+    ids = [t["id"] for t in ctx.call("GET", f"/tasks/archive?limit={min(n * 5, 200)}")]
+    ctx.pools["archived"] = [ids[k:k + 5] for k in range(0, len(ids), 5)]
+
+
+def _calendar(ctx, n):
+    # свои задачи со сроками, чтобы лента была не пустой, и токен ленты
+    for _ in range(20):
+        _create_task(ctx, sub_tasks=0)
+    ctx.extra["feed_token"] = ctx.call("GET", "/tasks/calendar")["token"]
+
+
+def _many_edits(ctx, i):
+    from app.notepatch import MAX_PATCH_OPS
+
+    # заметка из _create_note — 480 символов, правки через каждые 9
+    return f"/notes/{ctx.take('patch_many_notes')}", {
+        "baseRevision": 1,
+        "patch": [{"at": k * 9, "delete": 1, "insert": str(k)} for k in range(MAX_PATCH_OPS)],
+    }
+
+
+def _tasks_etag(ctx):
+    result = ctx.driver.request("GET", "/tasks?limit=50", headers=ctx.headers)
+    return {"If-None-Match": result.headers.get("ETag") or ""}
+
+
+SCENARIOS = [
+    Scenario("health", "GET", "/health", lambda ctx, i: ("/health", None)),
+    Scenario("cache.stats", "GET", "/cache/stats", lambda ctx, i: ("/cache/stats", None)),
+
+    Scenario("auth.register", "POST", "/auth/register", lambda ctx, i: ("/auth/register", {
+        "name": "Bench", "password": BENCH_PASSWORD,
+        "email": f"register-{ctx.run_id}-{i}@{BENCH_EMAIL_DOMAIN}",
+    })),
+    Scenario("auth.login", "POST", "/auth/login", lambda ctx, i: ("/auth/login", {
+        "email": ctx.email, "password": BENCH_PASSWORD,
+    })),
+
+    Scenario("tasks.list", "GET", "/tasks", lambda ctx, i: ("/tasks", None)),
+    Scenario("tasks.list.normalized", "GET", "/tasks", lambda ctx, i: ("/tasks?shape=normalized", None)),
+    Scenario("tasks.list.gzip", "GET", "/tasks", lambda ctx, i: ("/tasks?shape=normalized", None),
+             headers=lambda ctx: {"Accept-Encoding": "gzip"}),
+    Scenario("tasks.list.fields", "GET", "/tasks", lambda ctx, i: (
+        "/tasks?fields=id,title,status,priority,dueDate", None)),
+    Scenario("tasks.page", "GET", "/tasks", lambda ctx, i: ("/tasks?limit=50", None)),
+    Scenario("tasks.page.not_modified", "GET", "/tasks",
+             lambda ctx, i: ("/tasks?limit=50", None), headers=_tasks_etag),
+    Scenario("tasks.filtered", "GET", "/tasks", lambda ctx, i: (
+        f"/tasks?status=todo,in-progress&priority=urgent&limit=50"
+        f"&assigneeId={ctx.pick(ctx.contact_ids, i)}", None)),
+    Scenario("tasks.summary", "GET", "/tasks/summary", lambda ctx, i: ("/tasks/summary", None)),
+    Scenario("tasks.summary.cold", "GET", "/tasks/summary", lambda ctx, i: (
+        f"/tasks/summary?dueSoonDays={i % 90 + 1}", None)),
+    Scenario("tasks.due", "GET", "/tasks/due", lambda ctx, i: ("/tasks/due?window=7d", None)),
+    Scenario("tasks.due.assignee", "GET", "/tasks/due", lambda ctx, i: (
+        f"/tasks/due?window=30d&assigneeId={ctx.pick(ctx.contact_ids, i)}", None)),
+    Scenario("tasks.calendar", "GET", "/tasks/calendar", lambda ctx, i: ("/tasks/calendar", None)),
+    # опрос календарём: без изменений задач — тело из кэша, task не читается
+    Scenario("tasks.calendar.ics", "GET", "/tasks/calendar.ics", lambda ctx, i: (
+        f"/tasks/calendar.ics?token={ctx.extra['feed_token']}", None), setup=_calendar),
+    Scenario("tasks.archive", "GET", "/tasks/archive", lambda ctx, i: ("/tasks/archive?limit=50", None)),
+    Scenario("tasks.archive.restore", "POST", "/tasks/archive/restore", lambda ctx, i: (
+        "/tasks/archive/restore",
+        {"ids": ctx.take("archived") if ctx.pools["archived"] else [-(i + 1)]},
+    ), setup=_archived_ids),
+    Scenario("tasks.create", "POST", "/tasks", lambda ctx, i: ("/tasks", {
+        "title": f"bench create {i}", "priority": "medium",
+        "subTasks": [{"id": 1, "title": "a", "done": False}],
+        "assignedContactIds": [ctx.pick(ctx.contact_ids, i)],
+    })),
+    Scenario("tasks.update", "PUT", "/tasks/<int:task_id>", lambda ctx, i: (
+        f"/tasks/{ctx.pick(ctx.task_ids, i)}",
+        {"status": ("todo", "in-progress")[i % 2], "assignedContactIds": [ctx.pick(ctx.contact_ids, i)]},
+    )),
+    Scenario("tasks.batch", "POST", "/tasks/batch", lambda ctx, i: ("/tasks/batch", {
+        "operations": [
+            {"op": "update", "id": ctx.pick(ctx.task_ids, i + k), "data": {"priority": "low"}}
+            for k in range(20)
+        ] + [{"op": "create", "data": {"title": f"bench batch {i}"}}],
+    })),
+
+    Scenario("subtasks.add", "POST", "/tasks/<int:task_id>/subtasks", lambda ctx, i: (
+        f"/tasks/{ctx.pick(ctx.task_ids, i)}/subtasks", {"title": f"bench step {i}"})),
+    Scenario("subtasks.toggle", "PATCH", "/tasks/<int:task_id>/subtasks/<int:sub_id>", lambda ctx, i: (
+        f"/tasks/{ctx.extra['subtask_task']}/subtasks/{ctx.pick(ctx.pools['subtask_ids'], i)}",
+        {"done": i % 2 == 0},
+    ), setup=_subtask_task),
+    Scenario("subtasks.reorder", "PUT", "/tasks/<int:task_id>/subtasks/order", lambda ctx, i: (
+        f"/tasks/{ctx.extra['subtask_task']}/subtasks/order",
+        {"ids": ctx.pools["subtask_ids"][::-1] if i % 2 else ctx.pools["subtask_ids"]},
+    ), setup=_subtask_task),
+    Scenario("subtasks.delete", "DELETE", "/tasks/<int:task_id>/subtasks/<int:sub_id>", lambda ctx, i: (
+        f"/tasks/{ctx.extra['subtask_task']}/subtasks/{ctx.take('subtask_ids')}", None), setup=_subtask_task),
+
+    Scenario("contacts.list", "GET", "/contacts", lambda ctx, i: ("/contacts", None)),
+    Scenario("contacts.lookup", "GET", "/contacts/lookup", lambda ctx, i: (
+        "/contacts/lookup?q=" + ("al", "rev", "bud", "dep", "zzz")[i % 5] + "&limit=10", None)),
+    Scenario("contacts.get", "GET", "/contacts/<int:contact_id>", lambda ctx, i: (
+        f"/contacts/{ctx.pick(ctx.contact_ids, i)}", None)),
+    Scenario("contacts.create", "POST", "/contacts", lambda ctx, i: ("/contacts", {
+        "name": f"Bench Create {i}", "email": f"create-{ctx.run_id}-{i}@{BENCH_EMAIL_DOMAIN}",
+    })),
+    Scenario("contacts.update", "PUT", "/contacts/<int:contact_id>", lambda ctx, i: (
+        f"/contacts/{ctx.pick(ctx.contact_ids, i)}", {"position": f"Bench {i % 7}"})),
+    Scenario("contacts.delete", "DELETE", "/contacts/<int:contact_id>", lambda ctx, i: (
+        f"/contacts/{ctx.take('contacts')}", None), setup=_pool("contacts", _create_contact)),
+    Scenario("contacts.tasks", "GET", "/contacts/<int:contact_id>/tasks", lambda ctx, i: (
+        f"/contacts/{ctx.pick(ctx.contact_ids, i)}/tasks?limit=50", None)),
+    Scenario("contacts.workload", "GET", "/contacts/workload", lambda ctx, i: ("/contacts/workload", None)),
+
+    Scenario("notes.list", "GET", "/notes", lambda ctx, i: ("/notes", None)),
+    Scenario("notes.search", "GET", "/notes/search", lambda ctx, i: (
+        "/notes/search?q=" + ("release", "budget review", "deploy -bugfix", "roadmap OR sprint")[i % 4]
+        + "&limit=20", None)),
+    Scenario("notes.create", "POST", "/notes", lambda ctx, i: ("/notes", {
+        "title": f"bench note {i}", "content": "meeting notes " * 50})),
+    Scenario("notes.update", "PUT", "/notes/<int:note_id>", lambda ctx, i: (
+        f"/notes/{ctx.pick(ctx.pools['own_notes'], i)}", {"content": f"updated {i} " * 40},
+    ), setup=_pool("own_notes", _create_note)),
+    Scenario("notes.get", "GET", "/notes/<int:note_id>", lambda ctx, i: (
+        f"/notes/{ctx.pick(ctx.pools['own_notes'], i)}", None), setup=_pool("own_notes", _create_note)),
+    # каждая заметка правится один раз: baseRevision 1 без 409
+    Scenario("notes.patch", "PATCH", "/notes/<int:note_id>", lambda ctx, i: (
+        f"/notes/{ctx.take('patch_notes')}",
+        {"baseRevision": 1, "patch": [{"at": 0, "delete": 0, "insert": f"edit {i} "}]},
+    ), setup=_pool("patch_notes", _create_note)),
+    # максимум правок за раз: размер SQL и время компиляции растут линейно
+    Scenario("notes.patch.many", "PATCH", "/notes/<int:note_id>", _many_edits,
+             setup=_pool("patch_many_notes", _create_note)),
+    Scenario("notes.delete", "DELETE", "/notes/<int:note_id>", lambda ctx, i: (
+        f"/notes/{ctx.take('notes')}", None), setup=_pool("notes", _create_note)),
+
+    Scenario("tasks.delete", "DELETE", "/tasks/<int:task_id>", lambda ctx, i: (
+        f"/tasks/{ctx.take('tasks')}", None), setup=_pool("tasks", _create_task)),
+
+    Scenario("sync.full", "GET", "/sync", lambda ctx, i: ("/sync?limit=500", None)),
+    Scenario("tasks.export", "GET", "/<any(tasks, contacts, notes):collection>/export", lambda ctx, i: (
+        "/tasks/export", None)),
+    Scenario("contacts.export.csv", "GET", "/<any(tasks, contacts, notes):collection>/export", lambda ctx, i: (
+        "/contacts/export?format=csv", None)),
+    Scenario("tasks.import", "POST", "/<any(tasks, contacts, notes):collection>/import", lambda ctx, i: (
+        "/tasks/import", "".join(
+            json.dumps({
+                "title": f"bench import {i}-{k}",
+                "priority": ("low", "medium", "urgent")[k % 3],
+                "assignedContactIds": [ctx.pick(ctx.contact_ids, i + k)],
+            }) + "\n"
+            for k in range(200)
+        ).encode())),
+    Scenario("metrics", "GET", "/metrics", lambda ctx, i: ("/metrics", None)),
+]
+
+
+def uncovered_routes(app, scenarios):
+    covered = {(s.rule, s.method) for s in scenarios}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            key = (rule.rule, method)
+            if key not in covered and key not in SKIPPED_ROUTES:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+# -----------------------------
+# Прогон и агрегаты
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(ctx, scenario, requests, warmup, concurrency):
+    if scenario.setup:
+        scenario.setup(ctx, requests + warmup)
+    headers = dict(ctx.headers)
+    if scenario.headers:
+        headers.update(scenario.headers(ctx))
+
+    def one(i):
+        path, body = scenario.build(ctx, i)
+        return ctx.driver.request(scenario.method, path, body, headers)
+
+    for i in range(warmup):
+        one(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(warmup, warmup + requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r.elapsed * 1000 for r in results)
+    queries = [r.queries for r in results if r.queries is not None]
+    statuses = {}
+    for r in results:
+        statuses[str(r.status)] = statuses.get(str(r.status), 0) + 1
+
+    return {
+        "method": scenario.method,
+        "route": scenario.rule,
+        "requests": len(results),
+        "errors": sum(1 for r in results if r.status >= 400),
+        "statuses": statuses,
+        "throughput": round(len(results) / wall, 2) if wall else None,
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "queries": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+        "responseBytes": sum(len(r.body) for r in results) // len(results),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Регрессии относительно baseline: p95 хуже на tolerance или больше SQL-запросов."""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        cur = current["scenarios"].get(name)
+        if cur is None:
+            continue
+
+        base_p95, cur_p95 = base["latencyMs"]["p95"], cur["latencyMs"]["p95"]
+        if base_p95 and cur_p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base_p95:.2f} -> {cur_p95:.2f} ms")
+
+        # число запросов детерминировано — тут допуск не нужен
+        base_q, cur_q = base["queries"]["max"], cur["queries"]["max"]
+        if base_q is not None and cur_q is not None and cur_q > base_q:
+            regressions.append(f"{name}: queries {base_q} -> {cur_q}")
+
+        if cur["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {cur['errors']}")
+    return regressions
+
+
+def _print_table(report):
+    print(f"{'scenario':<26}{'req':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'sql':>6}")
+    for name, s in report["scenarios"].items():
+        lat = s["latencyMs"]
+        sql = s["queries"]["max"]
+        print(
+            f"{name:<26}{s['requests']:>6}{s['errors']:>5}"
+            f"{lat['p50']:>9.2f}{lat['p95']:>9.2f}{lat['p99']:>9.2f}"
+            f"{s['throughput'] or 0:>9.1f}{'-' if sql is None else sql:>6}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every backend route")
+    parser.add_argument("--url", help="живой сервер; без него — in-process test client")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", action="append", help="glob по имени сценария, можно несколько")
+    parser.add_argument("--output", help="куда сохранить JSON с результатами")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допуск по p95, доля")
+    args = parser.parse_args(argv)
+
+    scenarios = SCENARIOS
+    if args.only:
+        scenarios = [s for s in SCENARIOS if any(fnmatch.fnmatch(s.name, p) for p in args.only)]
+
+    if args.url:
+        driver = HttpDriver(args.url)
+    else:
+        from app.routes import create_app
+
+        app = create_app()
+        driver = InProcessDriver(app)
+        for route in uncovered_routes(app, SCENARIOS):
+            print(f"warning: no scenario for {route}", file=sys.stderr)
+
+    ctx = Context(driver)
+    _setup(ctx)
+
+    report = {
+        "meta": {
+            "driver": driver.name,
+            "url": args.url,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        report["scenarios"][scenario.name] = run_scenario(
+            ctx, scenario, args.requests, args.warmup, args.concurrency
+        )
+
+    _print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Генератор синтетических данных для бенчмарков.
+
+    python -m benchmarks.seed --users 50 --contacts 2000 --tasks 20000 --notes 5000
+
+Пишет прямо в DATABASE_URL (docker-compose `db` или локальный Postgres),
+схема должна быть накатана: `flask --app wsgi db upgrade`.
+Данные детерминированы через --seed, так что прогоны сравнимы с baseline.
+"""
+import argparse
+import datetime
+import random
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+BENCH_PASSWORD = "bench-password"
+BENCH_EMAIL_DOMAIN = "bench.local"
+
+STATUSES = ("todo", "in-progress", "done")
+PRIORITIES = ("low", "medium", "urgent")
+WORDS = (
+    "alpha beta gamma delta report review budget deploy release invoice "
+    "meeting design backend frontend database migration index cache queue "
+    "customer contract roadmap sprint planning testing bugfix feature"
+).split()
+COLORS = ("#ff7a00", "#9327ff", "#6e52ff", "#fc71ff", "#ffbb2b", "#1fd7c1", "#462f8a")
+
+# журнал изменений, как после записи через API: без него /sync не отдаёт
+# сиженные строки, а архив не видит их возраст. Время изменения — время
+# строки; уже записанные в журнал (прошлые прогоны, API) не трогаем
+CHANGE_LOG = {
+    "task": "created_at",
+    "contact": "updated_at",
+    "note": "updated_at",
+}
+CHANGE_LOG_INSERT = """
+    INSERT INTO public.change_log (entity, entity_id, op, txid, changed_at)
+    SELECT '{entity}', id, 'upsert', pg_current_xact_id()::text::bigint, {changed_at}
+    FROM public.{entity} ORDER BY id
+    ON CONFLICT DO NOTHING
+"""
+# ETag списков (collection_version) должен смениться, как после записи
+COLLECTION_VERSION_BUMP = text("""
+    INSERT INTO public.collection_version (entity, version) VALUES (:entity, 1)
+    ON CONFLICT (entity) DO UPDATE SET version = public.collection_version.version + 1
+""")
+
+
+def _sentence(rng, lo, hi):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def _batched(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def seed(users, contacts, tasks, notes, seed=42, batch_size=5000, truncate=False, log=print):
+    from app.models import db, User, Task, Contact, Note, task_assignee
+
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+
+    if truncate:
+        db.session.execute(text(
+            "TRUNCATE public.task_assignee, public.task, public.task_archive_assignee, "
+            "public.task_archive, public.contact, public.note, public.change_log, "
+            "public.users RESTART IDENTITY CASCADE"
+        ))
+
+    # один хэш на всех: KDF на каждого пользователя сидинг не меряет
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    user_rows = [
+        {
+            "name": f"Bench User {i}",
+            "email": f"user{i}-{seed}@{BENCH_EMAIL_DOMAIN}",
+            "password_hash": password_hash,
+            "created_at": now,
+        }
+        for i in range(users)
+    ]
+    user_ids = db.session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True), user_rows
+    ).scalars().all()
+    log(f"users: {len(user_ids)}")
+
+    contact_ids = []
+    for chunk in _batched([
+        {
+            "user_id": rng.choice(user_ids),
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            "email": f"contact{i}-{seed}@{BENCH_EMAIL_DOMAIN}",
+            "phone": f"+49 {rng.randint(100000000, 999999999)}",
+            "company": rng.choice(WORDS).title() + " GmbH" if rng.random() < 0.7 else None,
+            "position": rng.choice(WORDS).title() if rng.random() < 0.5 else None,
+            "avatar_color": rng.choice(COLORS),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(contacts)
+    ], batch_size):
+        contact_ids += db.session.execute(
+            insert(Contact).returning(Contact.id, sort_by_parameter_order=True), chunk
+        ).scalars().all()
+    log(f"contacts: {len(contact_ids)}")
+
+    task_count = 0
+    for chunk in _batched(list(range(tasks)), batch_size):
+        rows = []
+        for i in chunk:
+            status = rng.choice(STATUSES)
+            created = now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            due = created + datetime.timedelta(days=rng.randint(-10, 60)) if rng.random() < 0.6 else None
+            rows.append({
+                "user_id": rng.choice(user_ids),
+                "title": _sentence(rng, 2, 6)[:100],
+                "description": _sentence(rng, 5, 25)[:255],
+                "done": status == "done",
+                "priority": rng.choice(PRIORITIES),
+                "status": status,
+                "created_at": created,
+                "due_date": due,
+                "sub_tasks": [
+                    {"id": j + 1, "title": _sentence(rng, 1, 4), "done": rng.random() < 0.5}
+                    for j in range(rng.randint(0, 8))
+                ],
+            })
+        task_ids = db.session.execute(
+            insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+
+        links = {
+            (task_id, contact_id)
+            for task_id in task_ids
+            for contact_id in rng.sample(contact_ids, k=min(len(contact_ids), rng.randint(0, 3)))
+        }
+        if links:
+            db.session.execute(
+                insert(task_assignee),
+                [{"task_id": t, "contact_id": c} for t, c in links],
+            )
+        task_count += len(task_ids)
+    log(f"tasks: {task_count}")
+
+    note_count = 0
+    for chunk in _batched(list(range(notes)), batch_size):
+        rows = []
+        for _ in chunk:
+            created = now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            rows.append({
+                "user_id": rng.choice(user_ids),
+                "title": _sentence(rng, 1, 5),
+                "content": "\n".join(_sentence(rng, 8, 20) for _ in range(rng.randint(1, 40))),
+                "created_at": created,
+                "updated_at": created,
+            })
+        db.session.execute(insert(Note), rows)
+        note_count += len(rows)
+    log(f"notes: {note_count}")
+
+    for entity, changed_at in CHANGE_LOG.items():
+        logged = db.session.execute(
+            text(CHANGE_LOG_INSERT.format(entity=entity, changed_at=changed_at))
+        ).rowcount
+        db.session.execute(COLLECTION_VERSION_BUMP, {"entity": entity})
+        log(f"change_log {entity}: {logged}")
+
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+    return {
+        "users": len(user_ids),
+        "contacts": len(contact_ids),
+        "tasks": task_count,
+        "notes": note_count,
+        "seed": seed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed Postgres with synthetic data")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--contacts", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы перед сидингом")
+    args = parser.parse_args(argv)
+
+    from app.routes import create_app
+
+    app = create_app()
+    with app.app_context():
+        seed(
+            args.users, args.contacts, args.tasks, args.notes,
+            seed=args.seed, batch_size=args.batch_size, truncate=args.truncate,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Production-профиль: gunicorn -c gunicorn.conf.py
+# Все значения переопределяются через env (см. .env.example).
+import multiprocessing
+import os
+import signal
+
+from app import lifecycle
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# воркеров несколько: события и инвалидация кэшей — через LISTEN/NOTIFY
+# (как в docker-compose.yml); "local" допустим только при одном воркере
+os.environ.setdefault("EVENTS_BACKEND", "postgres")
+
+# /events здесь не отдаём: подписчик держал бы поток gthread всё подключение.
+# Поток событий — отдельный gevent-процесс, gunicorn -c gunicorn_events.conf.py
+os.environ.setdefault("EVENTS_STREAM", "false")
+
+# процессы x потоки; все потоки — API, их не больше пула
+# DB_POOL_SIZE + DB_MAX_OVERFLOW = 15, иначе запросы ждут соединение
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+
+# приложение загружается один раз в master, воркеры — fork; схема — только
+# миграциями (`flask db upgrade` до старта), при загрузке в базу не ходим
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# перезапуск воркеров против утечек памяти; jitter — чтобы не все сразу
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # master: вызывается до запуска первых воркеров
+    app = server.app.wsgi()
+    if server.cfg.workers > 1 and app.config["EVENTS_BACKEND"] != "postgres":
+        # каждый воркер видел бы только свои записи: кэши контактов
+        # устаревали бы до CACHE_TTL, подписчики теряли бы события
+        raise RuntimeError("EVENTS_BACKEND=local needs WEB_CONCURRENCY=1, use postgres")
+    lifecycle.before_fork(app)
+
+
+def post_fork(server, worker):
+    lifecycle.after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # gunicorn ставит свой обработчик SIGTERM в init_process — оборачиваем его
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        lifecycle.begin_shutdown(worker.wsgi)
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    lifecycle.shutdown(server.app.wsgi())
@@ -0,0 +1,60 @@
+# Поток событий GET /events: gunicorn -c gunicorn_events.conf.py
+# Отдельно от API (gunicorn.conf.py): на gevent подписчик — гринлет, а не
+# поток воркера, открытые вкладки не отнимают потоки у API. Остальные
+# маршруты этот процесс тоже отдаст, но балансировщик шлёт сюда только /events.
+import os
+import signal
+
+from app import lifecycle
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("EVENTS_BIND", "0.0.0.0:5001")
+
+# события из API-процессов приходят только через LISTEN/NOTIFY
+os.environ["EVENTS_BACKEND"] = "postgres"
+os.environ["EVENTS_STREAM"] = "true"
+
+workers = int(os.getenv("EVENTS_WEB_CONCURRENCY", "1"))
+worker_class = "gevent"
+# одновременных подключений на процесс; EVENTS_MAX_SUBSCRIBERS — не больше
+worker_connections = int(os.getenv("EVENTS_WORKER_CONNECTIONS", "1000"))
+
+# gevent патчит threading/socket при старте воркера — приложение должно
+# загружаться уже после этого, в самом воркере
+preload_app = False
+
+# поток живёт всё подключение: timeout gevent-воркера — только сердцебиение
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# токен может прийти в ?token= (EventSource не шлёт заголовки) — в лог
+# пишем путь без query string
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s %(D)s'
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # psycopg2 — C-расширение, monkey-patch gevent его не касается: без
+    # psycogreen запрос в базу (и LISTEN в events.py) блокировал бы весь процесс
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # SIGTERM: сразу отпускаем подписчиков, они переподключатся к другому процессу
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        lifecycle.begin_shutdown(worker.wsgi)
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    # без preload приложение есть только у воркера, который успел его загрузить
+    if worker.wsgi is not None:
+        lifecycle.shutdown(worker.wsgi)
@@ -0,0 +1,5 @@
+# Точка входа для production: gunicorn -c gunicorn.conf.py
+# (run.py — только dev-сервер Flask)
+from app.routes import create_app
+
+app = create_app()
@@ -2,7 +2,7 @@ import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable, tap } from 'rxjs';
 
-export type UserDto = { id: number; name: string; email: string };
+export type UserDto = { id: number; name: string; email: string; token: string; expiresIn: number };
 
 @Injectable({ providedIn: 'root' })
 export class AuthService {
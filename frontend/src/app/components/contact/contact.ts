@@ -1,10 +1,12 @@
 import { CommonModule } from '@angular/common';
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { FormsModule } from '@angular/forms';
 import { RouterModule } from '@angular/router';
 import { EditModal, ContactModel } from './edit-modal/edit-modal';
 import { ContactService, Contact as ApiContact } from '../../contact.service';
 import { ColorService } from '../../color.service';
+import { EventsService } from '../../events.service';
+import { Subscription, debounceTime } from 'rxjs';
 
 @Component({
   selector: 'app-contact',
@@ -13,7 +15,7 @@ import { ColorService } from '../../color.service';
   templateUrl: './contact.html',
   styleUrl: './contact.scss',
 })
-export class Contact implements OnInit {
+export class Contact implements OnInit, OnDestroy {
   contacts: ContactModel[] = [];
 
   isModalOpen = false;
@@ -23,13 +25,25 @@ export class Contact implements OnInit {
   loading = false;
   error = '';
 
+  // 🔔 свои контакты, изменённые в другой вкладке (SSE /events)
+  private changes?: Subscription;
+
   constructor(
     private contactService: ContactService,
-    private colors: ColorService
+    private colors: ColorService,
+    private events: EventsService
   ) { }
 
   ngOnInit(): void {
     this.loadContacts();
+    this.changes = this.events
+      .changesOf('contact')
+      .pipe(debounceTime(300))
+      .subscribe(() => this.loadContacts());
+  }
+
+  ngOnDestroy(): void {
+    this.changes?.unsubscribe();
   }
 
   private loadContacts() {
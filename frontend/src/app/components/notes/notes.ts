@@ -2,7 +2,7 @@ import { CommonModule } from '@angular/common';
 import { Component, OnInit } from '@angular/core';
 import { FormsModule } from '@angular/forms';
 import { RouterModule } from '@angular/router';
-import { NotesService, Note } from '../../notes.service';
+import { NotesService, Note, textPatch } from '../../notes.service';
 import { NotesCard } from './notes-card/notes-card';
 import { ColorService } from '../../color.service';
 
@@ -130,14 +130,40 @@ export class Notes implements OnInit {
 
   private updateExistingNote(title: string, content: string) {
     if (!this.selectedNote) return;
+    const base = this.selectedNote;
+    const patch = textPatch(base.content || '', content);
+    const titleChanged = title !== (base.title || '');
+    if (!patch.length && !titleChanged) {
+      this.saving = false;
+      return;
+    }
+    // шлём только изменённый кусок; сервер применит его к base.revision
     this.notesService
-      .updateNote(this.selectedNote.id, { title, content })
+      .patchNote(base.id, {
+        baseRevision: base.revision,
+        patch,
+        ...(titleChanged ? { title } : {}),
+      })
       .subscribe({
-        next: (updated) => this.onUpdateSuccess(updated),
-        error: (err) => this.handleSaveError(err, 'edit'),
+        next: (saved) => this.onUpdateSuccess({ ...base, ...saved, content }),
+        error: (err) =>
+          err?.status === 409 && err.error?.note
+            ? this.onSaveConflict(err.error.note)
+            : this.handleSaveError(err, 'edit'),
       });
   }
 
+  /** Заметку изменили в другом месте: текст в редакторе не трогаем */
+  private onSaveConflict(current: Note) {
+    const idx = this.notes.findIndex((n) => n.id === current.id);
+    if (idx >= 0) this.notes[idx] = current;
+    this.sortNotesByUpdated();
+    this.applyFilter();
+    this.selectedNote = current;
+    this.error = 'This note was changed elsewhere. Your text is kept: save again to overwrite.';
+    this.saving = false;
+  }
+
   private createNewNote(title: string, content: string) {
     this.notesService
       .createNote({ title, content })
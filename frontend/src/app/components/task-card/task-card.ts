@@ -2,7 +2,7 @@ import { CommonModule } from '@angular/common';
 import { Component, Input, Output, EventEmitter } from '@angular/core';
 import { FormsModule } from '@angular/forms';
 import { DragDropModule } from '@angular/cdk/drag-drop';
-import { Task, SubTask, TaskService, TaskAssignee } from '../../task.service';
+import { Task, SubTask, SubTaskResult, TaskService, TaskAssignee } from '../../task.service';
 import { EditCard } from './edit-card/edit-card';
 import { Contact } from '../../contact.service';
 import { ColorService } from '../../color.service'; // 🔹 добавили
@@ -32,8 +32,13 @@ export class TaskCard {
 
   get canMarkDone(): boolean {
     if (this.task.done) return true;
-    if (!this.task.subTasks || this.task.subTasks.length === 0) return true;
-    return this.task.subTasks.every((sub) => sub.done);
+    return (this.task.subTasksDone ?? 0) >= (this.task.subTasksTotal ?? 0);
+  }
+
+  // 🔹 счётчики подзадач считает backend и отдаёт в каждом ответе
+  private applyCounts(res: SubTaskResult) {
+    this.task.subTasksTotal = res.subTasksTotal;
+    this.task.subTasksDone = res.subTasksDone;
   }
 
   addSubTask() {
@@ -41,40 +46,41 @@ export class TaskCard {
     const title = this.newSubTaskTitle.trim();
     if (!title) return;
     if (!this.task.subTasks) this.task.subTasks = [];
-    const sub: SubTask = {
-      id: Date.now(),
-      title,
-      done: false,
-    };
-    this.task.subTasks.push(sub);
+    if (!this.task.id) return;
     this.newSubTaskTitle = '';
-    this.saveSubTasks();
-  }
-
-  updateProgress() {
-    if (this.task.done) return;
-    this.saveSubTasks();
+    this.taskService.addSubTask(this.task.id, title).subscribe({
+      next: (res) => {
+        if (res.subTask) this.task.subTasks!.push(res.subTask);
+        this.applyCounts(res);
+      },
+      error: () => console.error('Error adding subtask'),
+    });
   }
 
-  private saveSubTasks() {
-    if (!this.task.id) return;
-    this.taskService.updateTask(this.task.id, { subTasks: this.task.subTasks }).subscribe({
-      next: () => console.log('Subtasks updated on server'),
-      error: () => console.error('Error updating subtasks'),
+  updateProgress(sub: SubTask) {
+    if (this.task.done || !this.task.id) return;
+    // прогресс сразу, ответ сервера потом его уточнит
+    this.task.subTasksDone = (this.task.subTasksDone ?? 0) + (sub.done ? 1 : -1);
+    this.taskService.updateSubTask(this.task.id, sub.id, { done: sub.done }).subscribe({
+      next: (res) => this.applyCounts(res),
+      error: () => console.error('Error updating subtask'),
     });
   }
 
   get progress(): number {
-    if (!this.task.subTasks || this.task.subTasks.length === 0) return 0;
-    const doneCount = this.task.subTasks.filter((s) => s.done).length;
-    return Math.round((doneCount / this.task.subTasks.length) * 100);
+    const total = this.task.subTasksTotal ?? 0;
+    if (total === 0) return 0;
+    return Math.round(((this.task.subTasksDone ?? 0) / total) * 100);
   }
 
   deleteSubTask(index: number) {
     if (this.task.done) return;
-    if (!this.task.subTasks) return;
-    this.task.subTasks.splice(index, 1);
-    this.saveSubTasks();
+    if (!this.task.subTasks || !this.task.id) return;
+    const [sub] = this.task.subTasks.splice(index, 1);
+    this.taskService.deleteSubTask(this.task.id, sub.id).subscribe({
+      next: (res) => this.applyCounts(res),
+      error: () => console.error('Error deleting subtask'),
+    });
   }
 
   // 🔧 Edit modal handling
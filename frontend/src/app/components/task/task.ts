@@ -1,4 +1,4 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { TaskService, Task } from '../../task.service';
@@ -6,6 +6,8 @@ import { CreateTaskComponent } from '../create-task/create-task';
 import { DragDropModule, CdkDragDrop, moveItemInArray, transferArrayItem } from '@angular/cdk/drag-drop';
 import { TaskCard } from '../task-card/task-card';
 import { ContactService, Contact } from '../../contact.service';
+import { EventsService } from '../../events.service';
+import { Subscription, debounceTime } from 'rxjs';
 
 @Component({
   selector: 'app-task',
@@ -14,7 +16,7 @@ import { ContactService, Contact } from '../../contact.service';
   templateUrl: './task.html',
   styleUrl: './task.scss',
 })
-export class TaskComponent implements OnInit {
+export class TaskComponent implements OnInit, OnDestroy {
   tasks: Task[] = [];
   todoTasks: Task[] = [];
   inProgressTasks: Task[] = [];
@@ -25,9 +27,13 @@ export class TaskComponent implements OnInit {
   // 🔥 флаг: открыта ли где-то модалка редактирования
   isEditOpen = false;
 
+  // 🔔 изменения с сервера (SSE /events) вместо ручного обновления
+  private changes = new Subscription();
+
   constructor(
     private taskService: TaskService,
     private contactService: ContactService,
+    private events: EventsService,
   ) {}
 
   trackByTaskId(index: number, task: Task): string | number {
@@ -37,6 +43,18 @@ export class TaskComponent implements OnInit {
   ngOnInit() {
     this.loadContacts();
     this.loadTasks();
+
+    // пачка событий (импорт, правка контакта с задачами) — одна перезагрузка
+    this.changes.add(
+      this.events.changesOf('task').pipe(debounceTime(300)).subscribe(() => this.loadTasks())
+    );
+    this.changes.add(
+      this.events.changesOf('contact').pipe(debounceTime(300)).subscribe(() => this.loadContacts())
+    );
+  }
+
+  ngOnDestroy() {
+    this.changes.unsubscribe();
   }
 
   loadContacts() {
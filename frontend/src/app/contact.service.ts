@@ -1,8 +1,9 @@
 // frontend/src/app/contact.service.ts
 import { Injectable } from '@angular/core';
 import { HttpClient, HttpHeaders } from '@angular/common/http';
-import { Observable, throwError } from 'rxjs';
+import { Observable, map, throwError } from 'rxjs';
 import { AuthService } from './auth.service';
+import { Task } from './task.service';
 
 export interface Contact {
   id?: number;
@@ -14,11 +15,30 @@ export interface Contact {
   avatarColor?: string | null;
   createdAt?: Date;
   updatedAt?: Date;
-  // на будущее, если привяжем к пользователю:
+  // владелец: каждый видит только свои контакты
   userId?: number;
   user?: { id: number; name: string; email: string };
 }
 
+export interface ContactWorkload {
+  contactId: number;
+  total: number;
+  open: number;
+  overdue: number;
+}
+
+export interface ContactTasksPage extends ContactWorkload {
+  tasks: Task[];
+  nextCursor: string | null;
+}
+
+export interface ContactLookup {
+  id: number;
+  name: string;
+  email: string;
+  avatarColor?: string | null;
+}
+
 @Injectable({ providedIn: 'root' })
 export class ContactService {
   private apiUrl = 'http://127.0.0.1:5000/contacts';
@@ -28,26 +48,62 @@ export class ContactService {
     private auth: AuthService
   ) {}
 
-  /** Headers только для операций записи (create/update/delete) */
+  /** Bearer-токен: контакты у каждого пользователя свои, и на чтение тоже */
   private buildAuthHeaders() {
     const user = this.auth.currentUser;
-    if (!user?.id) return null;
+    if (!user?.token) return null;
 
     return {
       headers: new HttpHeaders({
-        'X-User-Id': String(user.id),
+        Authorization: `Bearer ${user.token}`,
       }),
     };
   }
 
-  // ✅ PUBLIC: все могут видеть список контактов
+  // ✅ PRIVATE: список своих контактов
   getContacts(): Observable<Contact[]> {
-    return this.http.get<Contact[]>(this.apiUrl);
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<Contact[]>(this.apiUrl, opts);
   }
 
-  // ✅ получить один контакт по id
+  // ✅ typeahead для выбора исполнителей (id, name, email, avatarColor)
+  lookupContacts(q: string, limit = 10): Observable<ContactLookup[]> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<ContactLookup[]>(`${this.apiUrl}/lookup`, {
+      ...opts,
+      params: { q, limit },
+    });
+  }
+
+  // ✅ получить один свой контакт по id
   getContact(id: number): Observable<Contact> {
-    return this.http.get<Contact>(`${this.apiUrl}/${id}`);
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<Contact>(`${this.apiUrl}/${id}`, opts);
+  }
+
+  // ✅ задачи исполнителя (страница) + счётчики total/open/overdue
+  getContactTasks(id: number, limit = 50, cursor?: string): Observable<ContactTasksPage> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    const params: Record<string, string | number> = { limit };
+    if (cursor) params['cursor'] = cursor;
+    return this.http
+      .get<Omit<ContactTasksPage, 'nextCursor'>>(`${this.apiUrl}/${id}/tasks`, {
+        ...opts,
+        params,
+        observe: 'response',
+      })
+      .pipe(map((res) => ({ ...res.body!, nextCursor: res.headers.get('X-Next-Cursor') })));
+  }
+
+  // ✅ нагрузка всех своих контактов одним запросом
+  getWorkload(): Observable<ContactWorkload[]> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<ContactWorkload[]>(`${this.apiUrl}/workload`, opts);
   }
 
   // ✅ PRIVATE: только залогиненный может создавать
@@ -0,0 +1,42 @@
+import { Injectable } from '@angular/core';
+import { Observable, filter, share } from 'rxjs';
+import { AuthService } from './auth.service';
+
+// GET /events — поток изменений (text/event-stream).
+// Контакты и заметки приходят только свои, задачи — вся доска.
+export interface ChangeEvent {
+  type: 'change' | 'resync';
+  entity?: 'task' | 'contact' | 'note';
+  id?: number;
+  op?: 'upsert' | 'delete';
+}
+
+@Injectable({ providedIn: 'root' })
+export class EventsService {
+  // отдельный gevent-процесс backend (gunicorn_events.conf.py)
+  private eventsUrl = 'http://127.0.0.1:5001/events';
+
+  /** Одно подключение на всех подписчиков; закрывается, когда отписались все. */
+  readonly changes$: Observable<ChangeEvent> = new Observable<ChangeEvent>(subscriber => {
+    const token = this.auth.currentUser?.token;
+    if (!token) {
+      subscriber.complete();
+      return;
+    }
+
+    // EventSource не умеет слать Authorization: токен в ?token=.
+    // После обрыва переподключается сам (retry из потока)
+    const source = new EventSource(`${this.eventsUrl}?token=${encodeURIComponent(token)}`);
+    const forward = (e: MessageEvent) => subscriber.next(JSON.parse(e.data));
+    source.addEventListener('change', forward);
+    source.addEventListener('resync', forward);
+    return () => source.close();
+  }).pipe(share());
+
+  constructor(private auth: AuthService) {}
+
+  /** Изменения одной сущности; resync — тоже повод перечитать. */
+  changesOf(entity: ChangeEvent['entity']): Observable<ChangeEvent> {
+    return this.changes$.pipe(filter(evt => evt.type === 'resync' || evt.entity === entity));
+  }
+}
@@ -7,12 +7,68 @@ export interface Note {
   id: number;
   title: string;
   content: string;
+  revision: number;
   createdAt: string;
   updatedAt: string;
   userId?: number;
   user?: { id: number; name: string; email: string } | null;
 }
 
+/** Правка против base: at/delete — в символах (code points), не в UTF-16 */
+export interface NoteEdit {
+  at: number;
+  delete: number;
+  insert: string;
+}
+
+export interface NotePatch {
+  baseRevision: number;
+  patch: NoteEdit[];
+  title?: string;
+}
+
+/** Ответ PATCH: content не возвращается — он уже есть у клиента */
+export interface NoteRevision {
+  id: number;
+  title: string;
+  revision: number;
+  updatedAt: string;
+}
+
+/** Одна правка: общий префикс и суффикс старого и нового текста */
+export function textPatch(base: string, next: string): NoteEdit[] {
+  if (base === next) return [];
+  // Array.from режет по code points: так же считает Postgres
+  const a = Array.from(base);
+  const b = Array.from(next);
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+  let endA = a.length;
+  let endB = b.length;
+  while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) {
+    endA--;
+    endB--;
+  }
+  return [{ at: start, delete: endA - start, insert: b.slice(start, endB).join('') }];
+}
+
+export interface NoteSearchResult {
+  id: number;
+  title: string;
+  titleHighlight: string;
+  snippet: string;
+  rank: number;
+  createdAt: string;
+  updatedAt: string;
+  userId?: number;
+  user?: { id: number; name: string; email: string } | null;
+}
+
+export interface NoteSearchPage {
+  results: NoteSearchResult[];
+  hasMore: boolean;
+}
+
 @Injectable({
   providedIn: 'root',
 })
@@ -24,25 +80,39 @@ export class NotesService {
     private auth: AuthService
   ) { }
 
-  /** Только для create/update/delete */
+  /** Bearer-токен: заметки у каждого пользователя свои, и на чтение тоже */
   private buildAuthHeaders() {
     const user = this.auth.currentUser;
-    if (!user?.id) return null;
+    if (!user?.token) return null;
 
     return {
       headers: new HttpHeaders({
-        'X-User-Id': String(user.id),
+        Authorization: `Bearer ${user.token}`,
       }),
     };
   }
 
-  // 🔓 PUBLIC: все могут смотреть заметки
+  // 🔐 PRIVATE: только свои заметки
   getNotes(): Observable<Note[]> {
-    return this.http.get<Note[]>(this.baseUrl);
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<Note[]>(this.baseUrl, opts);
+  }
+
+  // 🔎 Полнотекстовый поиск по своим заметкам на сервере
+  searchNotes(q: string, limit = 20, offset = 0): Observable<NoteSearchPage> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<NoteSearchPage>(`${this.baseUrl}/search`, {
+      ...opts,
+      params: { q, limit, offset },
+    });
   }
 
   getNote(id: number): Observable<Note> {
-    return this.http.get<Note>(`${this.baseUrl}/${id}`);
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<Note>(`${this.baseUrl}/${id}`, opts);
   }
 
   // 🔐 PRIVATE: создавать/редактировать может только залогиненный
@@ -58,6 +128,14 @@ export class NotesService {
     return this.http.put<Note>(`${this.baseUrl}/${id}`, payload, opts);
   }
 
+  // 🔐 сохранить только разницу; устаревшая baseRevision — HTTP 409
+  // с текущей версией в error.note
+  patchNote(id: number, payload: NotePatch): Observable<NoteRevision> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.patch<NoteRevision>(`${this.baseUrl}/${id}`, payload, opts);
+  }
+
   deleteNote(id: number): Observable<void> {
     const opts = this.buildAuthHeaders();
     if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
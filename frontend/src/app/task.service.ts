@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
 import { HttpClient, HttpHeaders } from '@angular/common/http';
-import { Observable, throwError } from 'rxjs';
+import { Observable, map, throwError } from 'rxjs';
 import { AuthService } from './auth.service';
 
 export interface SubTask {
@@ -27,6 +27,8 @@ export interface Task {
   dueDate?: Date;
   done: boolean;
   subTasks?: SubTask[];
+  subTasksTotal?: number;
+  subTasksDone?: number;
 
   // приходит с backend:
   assignedContacts?: TaskAssignee[];
@@ -39,6 +41,50 @@ export interface Task {
   user?: { id: number; name: string; email: string };
 }
 
+export interface SubTaskResult {
+  subTask: SubTask | null;
+  subTasksTotal: number;
+  subTasksDone: number;
+}
+
+// GET /tasks/summary — только счётчики, без строк задач
+export interface TaskSummary {
+  total: number;
+  done: number;
+  open: number;
+  byStatus: Partial<Record<'todo' | 'in-progress' | 'done', number>>;
+  byPriority: Partial<Record<'low' | 'medium' | 'urgent', number>>;
+  overdue: number;
+  dueSoon: number;
+  dueSoonDays: number;
+  noDueDate: number;
+  byAssignee: { contact: TaskAssignee | null; total: number; open: number }[];
+  unassigned: number;
+  subTasks: { total: number; done: number };
+  asOf: string;
+}
+
+// GET /tasks/due — открытые задачи: просроченные и со сроком в окне ?window=
+export interface DueTasks {
+  overdue: Task[];
+  upcoming: Task[];
+  asOf: string;
+  until: string;
+}
+
+// GET /tasks/calendar — ссылка на iCalendar-ленту для подписки
+export interface CalendarFeed {
+  url: string;
+  token: string;
+}
+
+// GET /tasks?shape=normalized — user и исполнители один раз, в строках только id
+interface NormalizedTasks {
+  tasks: (Omit<Task, 'user' | 'assignedContacts'> & { assignedContactIds: number[] })[];
+  users: Record<string, { id: number; name: string; email: string }>;
+  contacts: Record<string, TaskAssignee>;
+}
+
 @Injectable({ providedIn: 'root' })
 export class TaskService {
   private apiUrl = 'http://127.0.0.1:5000/tasks';
@@ -51,18 +97,57 @@ export class TaskService {
   /** Headers only for write-operations (create/update/delete) */
   private buildAuthHeaders() {
     const user = this.auth.currentUser;
-    if (!user?.id) return null;
+    if (!user?.token) return null;
 
     return {
       headers: new HttpHeaders({
-        'X-User-Id': String(user.id),
+        Authorization: `Bearer ${user.token}`,
       }),
     };
   }
 
   // ✅ PUBLIC: everyone can see all tasks
   getTasks(): Observable<Task[]> {
-    return this.http.get<Task[]>(this.apiUrl);
+    return this.http
+      .get<NormalizedTasks>(this.apiUrl, { params: { shape: 'normalized' } })
+      .pipe(
+        map(({ tasks, users, contacts }) =>
+          tasks.map(t => ({
+            ...t,
+            user: t.userId != null ? users[t.userId] : undefined,
+            assignedContacts: t.assignedContactIds
+              .map(id => contacts[id])
+              .filter(Boolean),
+          }))
+        )
+      );
+  }
+
+  // ✅ PRIVATE(ish): board counters for dashboards (no task rows), byAssignee — own contacts
+  getSummary(dueSoonDays = 3): Observable<TaskSummary> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<TaskSummary>(`${this.apiUrl}/summary`, {
+      ...opts,
+      params: { dueSoonDays },
+    });
+  }
+
+  // 🔹 Сроки: свои задачи или задачи исполнителя (assigneeId — свой контакт)
+  getDueTasks(window = '7d', assigneeId?: number): Observable<DueTasks> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    const params: Record<string, string | number> = { window };
+    if (assigneeId != null) params['assigneeId'] = assigneeId;
+    return this.http.get<DueTasks>(`${this.apiUrl}/due`, { ...opts, params });
+  }
+
+  // 🔹 Ссылка для подписки в календаре: токен в самой ссылке,
+  // календари не умеют слать Authorization
+  getCalendarFeed(): Observable<CalendarFeed> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.get<CalendarFeed>(`${this.apiUrl}/calendar`, opts);
   }
 
   // ✅ PRIVATE(ish): only logged-in user can create
@@ -83,4 +168,23 @@ export class TaskService {
     if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
     return this.http.delete(`${this.apiUrl}/${id}`, opts);
   }
+
+  // 🔹 Subtasks: меняем одну подзадачу, а не весь массив
+  addSubTask(taskId: number, title: string): Observable<SubTaskResult> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.post<SubTaskResult>(`${this.apiUrl}/${taskId}/subtasks`, { title }, opts);
+  }
+
+  updateSubTask(taskId: number, subId: number, data: Partial<SubTask>): Observable<SubTaskResult> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.patch<SubTaskResult>(`${this.apiUrl}/${taskId}/subtasks/${subId}`, data, opts);
+  }
+
+  deleteSubTask(taskId: number, subId: number): Observable<SubTaskResult> {
+    const opts = this.buildAuthHeaders();
+    if (!opts) return throwError(() => new Error('Not logged in: missing user id'));
+    return this.http.delete<SubTaskResult>(`${this.apiUrl}/${taskId}/subtasks/${subId}`, opts);
+  }
 }